@@ -0,0 +1,46 @@
+"""Compares get_latest with the bulk parse_revisions on a large listing.
+
+    python -m benchmarks.bench_latest [count]
+"""
+import random
+import string
+import sys
+import time
+from pathlib import Path
+
+from src import tools
+
+
+def listing(count: int) -> list[str]:
+    """Archive-like names, a few sheets and revisions per drawing number."""
+    random.seed(0)
+    names = []
+    while len(names) < count:
+        project = random.randint(0, 999999)
+        number = f"5300{project:0>6}-VWC-MS-DWG-{random.randint(0, 99999):0>5}"
+        for sheet in range(1, random.randint(2, 6)):
+            for rev in random.sample("0123" + string.ascii_uppercase[:4], 3):
+                names.append(f"{number}-{sheet:0>2}-R{rev}.dwg")
+    return names[:count]
+
+
+def main(count: int) -> None:
+    names = listing(count)
+    paths = [Path(name) for name in names]
+
+    start = time.perf_counter()
+    generator = list(tools.get_latest(paths))
+    generator_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    bulk = tools.parse_revisions(names).latest()
+    bulk_time = time.perf_counter() - start
+
+    assert sorted(str(path) for path in generator) == sorted(bulk)
+    print(f"{count} names, {len(bulk)} latest revisions")
+    print(f"get_latest:      {generator_time:.3f}s")
+    print(f"parse_revisions: {bulk_time:.3f}s ({generator_time / bulk_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
@@ -1,14 +1,20 @@
 import sys
 
-from src import cli
-from src.gui import MainApplication
-
 
 def main() -> None:
+    if getattr(sys, "frozen", False):
+        import multiprocessing
+
+        multiprocessing.freeze_support()  # Merge workers in the frozen build.
+    # Each mode imports only what it needs, the CLI never loads PySide6.
     if len(sys.argv) == 1:
+        from src.gui import MainApplication
+
         app = MainApplication()
         sys.exit(app.exec())
     else:
+        from src import cli
+
         cli.main()
 
 
@@ -1,4 +1,7 @@
+import os
 from pathlib import Path
 
 ROOT = Path(__file__).parent.absolute()
 CWD = Path.cwd()
+# Layout lists, timings and other state kept between runs.
+CACHE = Path(os.environ.get("DRAWING_PACK_CACHE", Path.home() / ".drawing_pack"))
@@ -1,7 +1,16 @@
+import contextlib
+import itertools
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Iterable, Optional
+from typing import Any, ContextManager, Iterable, Iterator, Optional, Union
 
-from src import layouts, model, tools
+from src import layouts, model
+from src import plan as planner
+from src import archive, preflight, scheduler, tools
+from src.records import PackResult
+
+# Packs run at once by batch, their sheets all share the scheduler's plot workers.
+PACKS = 4
 
 
 def main(
@@ -14,91 +23,219 @@ def main(
     keep: bool = False,
     del_source: bool = False,
     view: bool = False,
-) -> str:
+    queue: Optional[Path] = None,
+    strict: bool = False,
+) -> PackResult:
     """Creates PDF files of the specified drawings.
 
     Searches the <source> directory for any files matching the MATCH parameter.
+    <source> can also be a zip archive, only the drawings matched are extracted,
+    each just before it is plotted, and they are removed again when done.
 
     If a <dest> directory is specified that is where the created PDFs will be stored.
     Otherwise they will be placed in the same directory as the <source>.
 
     If <output> is specified this will be the name of the combined PDF otherwise the
     default naming will be used.
+
+    If a <queue> folder is specified the sheets are plotted by `drawing_pack worker`
+    processes watching that folder instead of on this machine.
+
+    Every drawing is checked as it is found, see preflight. Drawings that fail are
+    skipped and listed in the result. With <strict> they are all checked before
+    plotting starts and nothing is plotted if any fail.
+
+    The result lists the PDFs made, each sheet's status and times and the drawings
+    skipped, str() of it is the PDFs one per line or the error.
     """
-    if source.is_dir():
-        clean_match = tools.process_match(match)
-        matched_drawings = tools.get_files(clean_match, source)
-        if matched_drawings is None:
-            return f"Error: No matching files for '{match}' in '{source}'"
-        source_dir = source
+    if not source.is_dir() and not source.exists():
+        return PackResult.failed(f"Error: Could not find '{source}'")
+    matched_drawings, source_dir = get_drawings(match, source, latest)
+    if matched_drawings is None:
+        return PackResult.failed(
+            f"Error: No matching files for '{match}' in '{source}'"
+        )
+    skipped: dict[str, str] = {}
+    if strict:
+        drawings = list(matched_drawings)
+        checked = preflight.check_all(source_dir / drawing.name for drawing in drawings)
+        problems = [
+            f"{result.drawing.name}: {result.problem}"
+            for result in checked
+            if not result.ok
+        ]
+        if problems:
+            return PackResult.failed(
+                "\n  ".join(
+                    [f"Error: {len(problems)} drawings failed preflight"] + problems
+                )
+            )
+        matched_drawings = drawings
     else:
-        if not source.exists():
-            return f"Error: Could not find '{source}'"
-        matched_drawings = (source,)  # For the rest to work, this needs to be iterable.
-        source_dir = source.parent
+        matched_drawings = passing(matched_drawings, source_dir, skipped)
+    # Only the first drawing is checked before plotting starts, the rest as found.
+    matched_drawings = iter(matched_drawings)
+    first = next(matched_drawings, None)
+    if first is None:
+        error = f"Error: No drawings matching '{match}' in '{source}' passed preflight"
+        problems = [f"{name}: {problem}" for name, problem in skipped.items()]
+        return PackResult.failed("\n  ".join([error] + problems))
+    matched_drawings = itertools.chain([first], matched_drawings)
+    staging: ContextManager[None] = contextlib.nullcontext()
+    if archive.is_archive(source_dir):
+        # The PDFs go beside the archive, the extracted drawings only last the run.
+        dest = dest or source_dir.parent
+        staging = tools.staged(dest)
     if not dest:
         dest = source_dir
-    if latest:
-        matched_drawings = tools.get_latest(matched_drawings)
-    total_files, matched_drawings = get_total(matched_drawings)
-    if paper:
-        out_files = get_output_files(total_files, dest, output)
-        return "\n".join(
-            str(
-                layouts.main(
-                    source=source / matched,
-                    destination=dest,
-                    output=out,
-                    view=view,
-                    del_source=del_source,
-                    keep_individual=keep,
-                )
+    with staging:
+        if paper:
+            out_files = get_output_files(None, dest, output)
+            result = layouts.main_many(
+                drawings=(
+                    (source_dir / matched.name, out)
+                    for matched, out in zip(matched_drawings, out_files)
+                ),
+                destination=dest,
+                view=view,
+                del_source=del_source,
+                keep_individual=keep,
+                queue=queue,
             )
-            for matched, out in zip(matched_drawings, out_files)
-        )
-    else:
-        out = Path(output) if output else None
-        return str(
-            model.main(
+        else:
+            out = Path(output) if output else None
+            result = model.main(
                 drawings=matched_drawings,
-                source=source,
-                sht_count=total_files,
+                source=source_dir,
                 dest=dest,
                 output=out,
                 view=view,
                 remove_dwg=del_source,
+                queue=queue,
             )
-        )
+    result.skipped = skipped
+    return result
+
+
+def passing(
+    drawings: Iterable[Path], source_dir: Path, skipped: dict[str, str]
+) -> Iterator[Path]:
+    """The <drawings> that pass preflight, each checked as it is found. The others
+    are added to <skipped> with their problem."""
+    for drawing in drawings:
+        checked = preflight.check(source_dir / drawing.name)
+        if checked.ok:
+            yield drawing
+        else:
+            skipped[drawing.name] = checked.problem or "failed preflight"
+
+
+def batch(packs: Iterable[dict[str, Any]], workers: int = PACKS) -> list[PackResult]:
+    """Runs main with each set of arguments, <workers> packs at a time.
+
+    The sheets of every pack share the plot workers at the caller's priority. The
+    results are in the same order as <packs>, a pack that raised is a failed
+    result."""
+    level = scheduler.PRIORITY.get()
+
+    def run(kwargs: dict[str, Any]) -> PackResult:
+        try:
+            with scheduler.priority(level):
+                return main(**kwargs)
+        except Exception as error:
+            return PackResult.failed(f"Error: {error}")
 
+    with ThreadPoolExecutor(workers, thread_name_prefix="pack") as pool:
+        return list(pool.map(run, packs))
 
-def get_total(drawings: Iterable[Path]) -> tuple[int, Iterable[Path]]:
-    """Finds then length of the iterable and returns that and the iterable.
-    Example:
-        >>> a = get_total((Path() for _ in range(2)))
-        >>> a[0]
-        2
-        >>> [str(item) for item in a[1]]
-        ['.', '.']
+
+def plan(
+    match: str,
+    source: Path,
+    dest: Optional[Path] = None,
+    output: Optional[str] = None,
+    paper: bool = False,
+    latest: bool = True,
+) -> Union[planner.Plan, str]:
+    """Works out what main would do with the same arguments without plotting.
+
+    Sheet counts come from the layout cache and the time estimate from previous
+    runs, drawings that have never been opened are counted as one sheet.
     """
-    drawings = list(drawings)
-    return len(drawings), iter(drawings)
+    if not source.is_dir() and not source.exists():
+        return f"Error: Could not find '{source}'"
+    matched_drawings, source_dir = get_drawings(match, source, latest)
+    if matched_drawings is None:
+        return f"Error: No matching files for '{match}' in '{source}'"
+    if not dest:
+        dest = source_dir
+    drawings = [Path(drawing.name) for drawing in matched_drawings]
+    result = planner.Plan(
+        match, source, dest, paper, sheet_time=planner.sheet_time(paper)
+    )
+    if paper:
+        out_files = get_output_files(len(drawings), dest, output)
+        for drawing, out in zip(drawings, out_files):
+            result.drawings.append(
+                planner.PlannedDrawing(
+                    drawing=source_dir / drawing,
+                    output=out or (dest / drawing).with_suffix(".pdf"),
+                    layouts=layouts.cached_layouts(source_dir / drawing),
+                )
+            )
+    else:
+        out = model.output_name(
+            drawings, len(drawings), dest, Path(output) if output else None
+        )
+        result.drawings = [
+            planner.PlannedDrawing(
+                drawing=source_dir / drawing, output=out, layouts=["Model"]
+            )
+            for drawing in drawings
+        ]
+    return result
+
+
+def get_drawings(
+    match: str, source: Path, latest: bool
+) -> tuple[Optional[Iterable[Path]], Path]:
+    """Finds the drawings to plot and the folder they are in.
+    A <source> file is used as is, otherwise the folder or zip archive is searched
+    for <match>."""
+    matched_drawings: Optional[Iterable[Path]]
+    if source.is_dir() or archive.is_archive(source):
+        matched_drawings = tools.get_files(tools.process_match(match), source)
+        source_dir = source
+    else:
+        # For the rest to work, this needs to be iterable.
+        matched_drawings = (source,)
+        source_dir = source.parent
+    if matched_drawings is None:
+        return None, source_dir
+    if latest:
+        matched_drawings = tools.get_latest(matched_drawings)
+    return matched_drawings, source_dir
 
 
 def get_output_files(
-    total: int, destination: Path, name: Optional[str]
+    total: Optional[int], destination: Path, name: Optional[str]
 ) -> Iterable[Optional[Path]]:
-    """Generate an output file name for each match.
+    """Generate an output file name for each match, without end if <total> is None.
     Examples:
         >>> list(get_output_files(3, Path(), None))
         [None, None, None]
         >>> [str(file) for file in get_output_files(3, Path(), "file")]
         ['file.pdf', 'file(1).pdf', 'file(2).pdf']
+        >>> files = get_output_files(None, Path(), "a")
+        >>> [str(file) for file in itertools.islice(files, 2)]
+        ['a.pdf', 'a(1).pdf']
     """
+    indexes = range(total) if total is not None else itertools.count()
     if name is None:
-        for _ in range(total):
+        for _ in indexes:
             yield None
     else:
-        for idx in range(total):
+        for idx in indexes:
             if idx == 0:
                 yield (destination / name).with_suffix(".pdf")
             else:
@@ -0,0 +1,112 @@
+import fnmatch
+import os
+import shutil
+import threading
+import time
+import zipfile
+from pathlib import Path, PurePosixPath
+from typing import Iterable
+
+# Files a drawing can use, extracted with it and removed again by tools.staged.
+SUPPORT_SUFFIXES = (".dwg", ".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp")
+# Bytes read from the archive at a time while extracting.
+CHUNK = 1024 * 1024
+# Archive listings by path, reread only when the archive changes, see members. Each
+# is the files by name and the paths of every name used more than once.
+_listings: dict[Path, tuple[int, dict[str, zipfile.ZipInfo], dict[str, list[str]]]] = {}
+_listings_lock = threading.Lock()
+
+
+def is_archive(source: Path) -> bool:
+    return source.suffix.lower() == ".zip" and source.is_file()
+
+
+def members(archive: Path) -> dict[str, zipfile.ZipInfo]:
+    """The files in <archive> by name, whatever folder they are in. Only the central
+    directory at the end of the archive is read. Where folders have files with the
+    same name the first is listed, see unique."""
+    return listing(archive)[0]
+
+
+def listing(
+    archive: Path,
+) -> tuple[dict[str, zipfile.ZipInfo], dict[str, list[str]]]:
+    """members of <archive> and the paths of each name used more than once."""
+    mtime = archive.stat().st_mtime_ns
+    with _listings_lock:
+        cached = _listings.get(archive)
+    if cached is None or cached[0] != mtime:
+        files: dict[str, zipfile.ZipInfo] = {}
+        paths: dict[str, list[str]] = {}
+        with zipfile.ZipFile(archive) as zf:
+            for info in zf.infolist():
+                if info.is_dir():
+                    continue
+                name = PurePosixPath(info.filename).name
+                files.setdefault(name, info)
+                paths.setdefault(name, []).append(info.filename)
+        clashes = {name: found for name, found in paths.items() if len(found) > 1}
+        cached = (mtime, files, clashes)
+        with _listings_lock:
+            _listings[archive] = cached
+    return cached[1], cached[2]
+
+
+def unique(archive: Path, names: Iterable[str]) -> None:
+    """Raises FileExistsError if any of <names> is more than one file in <archive>,
+    they would all be extracted to the same place."""
+    clashes = listing(archive)[1]
+    for name in names:
+        if name in clashes:
+            raise FileExistsError(
+                f"'{archive}' has more than one '{name}': {', '.join(clashes[name])}"
+            )
+
+
+def member(drawing: Path) -> zipfile.ZipInfo:
+    """The entry for <drawing>, a path in an archive like project.zip/name.dwg."""
+    try:
+        return members(drawing.parent)[drawing.name]
+    except KeyError:
+        raise FileNotFoundError(f"'{drawing.name}' is not in '{drawing.parent}'")
+
+
+def glob(match: str, archive: Path) -> list[Path]:
+    """Paths in <archive> whose name matches <match>, like Path.glob."""
+    return [archive / name for name in members(archive) if fnmatch.fnmatch(name, match)]
+
+
+def mtime_ns(info: zipfile.ZipInfo) -> int:
+    """The modified time an entry is extracted with. Zip times are local time."""
+    return int(time.mktime(info.date_time + (0, 0, -1))) * 1_000_000_000
+
+
+def read(drawing: Path, size: int) -> bytes:
+    """The first <size> bytes of <drawing> in an archive, only what's needed of it
+    is decompressed."""
+    info = member(drawing)
+    with zipfile.ZipFile(drawing.parent) as zf, zf.open(info) as file:
+        return file.read(size)
+
+
+def extract(archive: Path, name: str, dest: Path) -> Path:
+    """Streams <name> from <archive> to <dest> unless an identical copy (size and
+    mtime) exists. Like tools.copy_drawing it is written to a temporary name first."""
+    info = members(archive)[name]
+    mtime = mtime_ns(info)
+    if dest.exists():
+        current = dest.stat()
+        if (current.st_size, current.st_mtime_ns) == (info.file_size, mtime):
+            return dest
+    partial = dest.with_name(f".{dest.name}.{os.getpid()}-{threading.get_ident()}")
+    try:
+        with zipfile.ZipFile(archive) as zf, zf.open(info) as fsrc, partial.open(
+            "wb"
+        ) as fdst:
+            shutil.copyfileobj(fsrc, fdst, CHUNK)
+        os.utime(partial, ns=(mtime, mtime))
+        partial.replace(dest)
+    finally:
+        if partial.exists():
+            partial.unlink()
+    return dest
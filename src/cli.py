@@ -1,12 +1,41 @@
+import contextlib
+import functools
 from pathlib import Path
-from typing import Optional
+from typing import ContextManager, Optional
 
 import click
 
-from src import app
+# The rest of the package is imported by the command that needs it, so --help
+# and the thin client stay quick to start.
+from src import client, scheduler
 
 
-@click.command(context_settings=dict(help_option_names=["-h", "--help"]))
+class PackGroup(click.Group):
+    """Runs the pack command unless the first argument names another command."""
+
+    def parse_args(self, ctx: click.Context, args: list[str]) -> list[str]:
+        if args and args[0] not in self.commands and args[0] not in ("-h", "--help"):
+            args.insert(0, "pack")
+        return super().parse_args(ctx, args)
+
+
+# Shared by the commands that plot, for node-exporter's textfile collector.
+metrics_option = click.option(
+    "--metrics",
+    "metrics_file",
+    type=click.Path(dir_okay=False, path_type=Path),
+    envvar="DRAWING_PACK_METRICS",
+    metavar="<file>",
+    help="Write plot, merge and copy metrics to this .prom file while running.",
+)
+
+
+@click.group(cls=PackGroup, context_settings=dict(help_option_names=["-h", "--help"]))
+def main() -> None:
+    """Creates PDF packs of drawings, see `pack --help` for the default command."""
+
+
+@main.command()
 @click.argument(
     "match",
 )
@@ -60,7 +89,59 @@ from src import app
     is_flag=True,
     help="Flag to open the combined PDF when finished.",
 )
-def main(
+@click.option(
+    "-q",
+    "--queue",
+    type=click.Path(file_okay=False, path_type=Path),
+    metavar="<queue>",
+    help=(
+        "Shared folder to send the sheets to `worker` processes instead of "
+        "plotting here."
+    ),
+)
+@click.option(
+    "-s",
+    "--server",
+    "server_url",
+    envvar="DRAWING_PACK_SERVER",
+    metavar="<url>",
+    help=f"Send the pack to a running `serve` process, e.g. {client.URL}.",
+)
+@click.option(
+    "-b",
+    "--batch",
+    is_flag=True,
+    help="Flag to plot at batch priority, behind interactive packs.",
+)
+@click.option(
+    "--strict",
+    is_flag=True,
+    help=(
+        "Flag to plot nothing if any drawing is locked, damaged or unsupported, "
+        "instead of skipping it."
+    ),
+)
+@click.option(
+    "--autotune",
+    is_flag=True,
+    help=(
+        "Flag to tune the number of sheets plotted at once during the run and keep "
+        "the best for this machine."
+    ),
+)
+@click.option(
+    "--plan",
+    is_flag=True,
+    help="Flag to list what would be created and an estimated time without plotting.",
+)
+@click.option(
+    "--json",
+    "as_json",
+    is_flag=True,
+    help="Flag to print the plan as JSON (plan option only).",
+)
+@metrics_option
+def pack(
     match: str,
     source: Path,
     dest: Optional[Path],
@@ -70,10 +151,20 @@ def main(
     keep: bool,
     del_source: bool,
     view: bool,
+    queue: Optional[Path],
+    server_url: Optional[str],
+    batch: bool,
+    strict: bool,
+    autotune: bool,
+    plan: bool,
+    as_json: bool,
+    metrics_file: Optional[Path],
 ) -> None:
     """Creates PDF files of the specified drawings.
 
     Searches the <source> directory for any files matching the MATCH parameter.
+    <source> can also be a zip archive of the project, only the drawings needed
+    are extracted.
 
     If a <dest> directory is specified that is where the created PDFs will be stored.
     Otherwise they will be placed in the same directory as the <source>.
@@ -81,18 +172,265 @@ def main(
     If <output> is specified this will be the name of the combined PDF otherwise the
     default naming will be used.
     """
-    result = app.main(
+    from src import app, metrics, tune
+
+    if plan:
+        planned = app.plan(
+            match=match,
+            source=source,
+            dest=dest,
+            output=output,
+            paper=paper,
+            latest=latest,
+        )
+        if isinstance(planned, str):
+            print(planned)
+        else:
+            print(planned.to_json() if as_json else planned.table())
+        return
+    level = scheduler.BATCH if batch else scheduler.INTERACTIVE
+    run = app.main
+    tuning: ContextManager[Optional[tune.Autotuner]] = contextlib.nullcontext()
+    if server_url:
+        run = functools.partial(client.run, server_url, priority=level)
+    elif autotune:
+        tuning = tune.autotune(source)
+    else:
+        scheduler.configure(tune.best_workers(source) or scheduler.WORKERS)
+    with metrics.exporting(metrics_file), scheduler.priority(level), tuning as tuner:
+        result = run(
+            match=match,
+            source=source,
+            dest=dest,
+            output=output,
+            paper=paper,
+            latest=latest,
+            keep=keep,
+            del_source=del_source,
+            view=view,
+            queue=queue,
+            strict=strict,
+        )
+    print(result)
+    if result.usage is not None:
+        print(f"Plotting used {result.usage}")
+    if tuner is not None:
+        print(tuner.summary())
+
+
+@main.command()
+@click.argument(
+    "queue",
+    type=click.Path(file_okay=False, path_type=Path),
+    metavar="<queue>",
+)
+@click.option(
+    "-i",
+    "--idle",
+    type=float,
+    metavar="<seconds>",
+    help="Stop after this long without a job instead of running until stopped.",
+)
+@metrics_option
+def worker(queue: Path, idle: Optional[float], metrics_file: Optional[Path]) -> None:
+    """Plots sheets sent to the shared <queue> folder by `pack --queue`."""
+    from src import metrics, workqueue
+
+    with metrics.exporting(metrics_file):
+        count = workqueue.work(queue, idle=idle)
+    print(f"Plotted {count} sheets.")
+
+
+@main.command()
+@click.option("--host", default=client.HOST, help="Address to listen on.")
+@click.option("--port", default=client.PORT, type=int, help="Port to listen on.")
+@click.option(
+    "-w",
+    "--workers",
+    default=scheduler.WORKERS,
+    type=int,
+    help="Sheets plotted at once across every job.",
+)
+@metrics_option
+def serve(host: str, port: int, workers: int, metrics_file: Optional[Path]) -> None:
+    """Runs packs sent by `pack --server` and the GUI on one shared pool."""
+    from src import metrics, server
+
+    with metrics.exporting(metrics_file):
+        server.serve(host, port, workers)
+
+
+@main.command()
+@click.argument("match")
+@click.argument(
+    "source",
+    type=click.Path(exists=True, file_okay=False, path_type=Path),
+    metavar="<source>",
+)
+@click.option(
+    "-d",
+    "--dest",
+    type=click.Path(file_okay=False, path_type=Path),
+    metavar="<dest>",
+    help="Path to destination folder. New folders will be created.",
+)
+@click.option(
+    "-o",
+    "--output",
+    type=click.Path(dir_okay=False, path_type=Path),
+    metavar="<output>",
+    help="Filename of combined PDF.",
+)
+@click.option(
+    "-p",
+    "--paper",
+    is_flag=True,
+    help="Flag to select paperspace sheets instead of modelspace.",
+)
+@click.option(
+    "-k",
+    "--keep",
+    is_flag=True,
+    help=(
+        "Flag to keep the individual sheets created along with the combined PDF "
+        "(layout option only)."
+    ),
+)
+@click.option(
+    "-i",
+    "--interval",
+    default=10.0,
+    metavar="<seconds>",
+    help="Seconds between scans of <source>.",
+)
+@click.option(
+    "--debounce",
+    default=5.0,
+    metavar="<seconds>",
+    help="Seconds <source> must be unchanged before rebuilding.",
+)
+@click.option(
+    "--poll",
+    is_flag=True,
+    help="Flag to only scan <source> on the interval, for shares without file events.",
+)
+@metrics_option
+def watch(
+    match: str,
+    source: Path,
+    dest: Optional[Path],
+    output: Optional[str],
+    paper: bool,
+    keep: bool,
+    interval: float,
+    debounce: float,
+    poll: bool,
+    metrics_file: Optional[Path],
+) -> None:
+    """Keeps the latest revision pack of MATCH in <source> up to date.
+
+    The pack is built straight away and rebuilt when a drawing it uses is saved,
+    only the changed drawings are plotted again.
+    """
+    from src import app, metrics
+    from src import watch as watcher
+
+    build = functools.partial(
+        app.main,
         match=match,
         source=source,
         dest=dest,
         output=output,
         paper=paper,
-        latest=latest,
+        latest=True,
         keep=keep,
-        del_source=del_source,
-        view=view,
     )
-    print(result)
+    try:
+        with metrics.exporting(metrics_file):
+            watcher.watch(match, source, build, interval, debounce, events=not poll)
+    except KeyboardInterrupt:
+        pass
+
+
+@main.command()
+@click.argument("number")
+@click.option(
+    "-r",
+    "--root",
+    type=click.Path(file_okay=False, path_type=Path),
+    metavar="<root>",
+    help="Folder holding the project folders, defaults to DRAWING_PACK_ROOT.",
+)
+@click.option(
+    "-c",
+    "--cached",
+    is_flag=True,
+    help="Flag to search the index as it is without checking for changed projects.",
+)
+def find(number: str, root: Optional[Path], cached: bool) -> None:
+    """Finds which project folders hold drawing NUMBER, e.g. 205.
+
+    Prints each project's source path and the latest revision of each sheet.
+    """
+    from src import index
+
+    root = root or index.CONTRACT
+    if not cached:
+        index.refresh(root)
+    found = index.search(number, root)
+    if not found:
+        print(f"Error: No drawings matching '{number}' under '{root}'")
+    for project in found:
+        print(project.source)
+        for name in project.latest:
+            print(f"  {name}")
+
+
+@main.command()
+@click.option(
+    "-n",
+    "--limit",
+    default=10,
+    metavar="<count>",
+    help="Number of slowest sheets to list.",
+)
+@click.option(
+    "-f",
+    "--factor",
+    default=3.0,
+    metavar="<times>",
+    help="Flag sheets whose last plot took this many times their usual time.",
+)
+def stats(limit: int, factor: float) -> None:
+    """Lists the slowest sheets plotted on this machine and those that have
+    suddenly become slower to plot."""
+    from src import history
+    from src.plan import format_seconds
+
+    slowest = history.slowest(limit)
+    if not slowest:
+        print("No plots recorded yet.")
+        return
+    rows = [("Drawing", "Sheet", "Plots", "Average", "Last")]
+    for sheet in slowest:
+        rows.append(
+            (
+                sheet.drawing,
+                sheet.sheet,
+                str(sheet.runs),
+                format_seconds(sheet.mean),
+                format_seconds(sheet.latest),
+            )
+        )
+    widths = [max(len(row[idx]) for row in rows) for idx in range(len(rows[0]))]
+    for row in rows:
+        print("  ".join(col.ljust(width) for col, width in zip(row, widths)).rstrip())
+    for sheet in history.regressions(factor):
+        print(
+            f"Slower: {sheet.drawing} {sheet.sheet} took "
+            f"{format_seconds(sheet.latest)}, "
+            f"usually {format_seconds(sheet.usual or 0)} ({sheet.slowdown:.1f}x)"
+        )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,60 @@
+import json
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+from src.records import PackResult
+
+# The client only needs the standard library so it stays quick to start.
+HOST = "127.0.0.1"
+PORT = 8765
+URL = f"http://{HOST}:{PORT}"
+POLL = 0.5
+
+
+def request(url: str, data: Optional[dict[str, Any]] = None) -> Any:
+    import urllib.request
+
+    body = None if data is None else json.dumps(data, default=str).encode()
+    req = urllib.request.Request(
+        url, data=body, headers={"Content-Type": "application/json"}
+    )
+    with urllib.request.urlopen(req) as response:
+        return json.loads(response.read())
+
+
+def submit(url: str, **kwargs: Any) -> str:
+    """Queues a pack on the server, the arguments are those of app.main."""
+    args = {
+        key: str(value) if isinstance(value, Path) else value
+        for key, value in kwargs.items()
+    }
+    return request(f"{url}/jobs", args)["id"]
+
+
+def status(url: str, job_id: str) -> dict[str, Any]:
+    return request(f"{url}/jobs/{job_id}")
+
+
+def run(url: str, **kwargs: Any) -> PackResult:
+    """Same as app.main but done by the server at <url>. A job the server refuses
+    or can't be reached for is a failed pack, like app.main's errors."""
+    import urllib.error
+
+    try:
+        job_id = submit(url, **kwargs)
+        while True:
+            job = status(url, job_id)
+            if job["status"] in ("done", "failed"):
+                if job["pack"] is None:
+                    return PackResult.failed(job["result"])
+                return PackResult.from_dict(job["pack"])
+            time.sleep(POLL)
+    except urllib.error.HTTPError as error:
+        try:
+            reason = json.loads(error.read())["error"]
+        except (ValueError, KeyError, TypeError):
+            reason = str(error)
+        return PackResult.failed(f"Error: {reason}")
+    except urllib.error.URLError as error:
+        return PackResult.failed(f"Error: Could not reach '{url}': {error.reason}")
@@ -0,0 +1,86 @@
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Iterable, Optional
+
+from src import CACHE
+
+# Xrefs and images of each drawing, by drawing fingerprint (see tools.fingerprint).
+DEPS = CACHE / "deps"
+# Written next to the drawing by the plot scripts, one resolved path per line.
+# Each script writes its own, the sheets of a drawing are plotted at once.
+SIDECAR = ".deps"
+
+
+def sidecar(drawing: Path, scr: Path) -> Path:
+    """Where <scr> writes the list for <drawing>, see named."""
+    return drawing.with_name(f"{drawing.name}.{scr.stem}{SIDECAR}")
+
+
+def named(lines: list[str], scr: Path) -> list[str]:
+    """The <lines> of a plot script with its list named after <scr>."""
+    return [line.replace(f'"{SIDECAR}"', f'".{scr.stem}{SIDECAR}"') for line in lines]
+
+
+def load(key: str) -> Optional[list[str]]:
+    """Files the drawing with fingerprint <key> uses, None if it hasn't been plotted."""
+    try:
+        return json.loads((DEPS / f"{key}.json").read_text())["deps"]
+    except (OSError, ValueError):
+        return None
+
+
+def store(key: str, drawing: Path, names: list[str]) -> None:
+    DEPS.mkdir(parents=True, exist_ok=True)
+    file = DEPS / f"{key}.json"
+    temp = file.with_name(f".{file.name}.{os.getpid()}-{threading.get_ident()}")
+    temp.write_text(json.dumps({"drawing": str(drawing), "deps": names}))
+    temp.replace(file)
+
+
+def collect(drawing: Path, scr: Path, key: str) -> Optional[list[str]]:
+    """Moves the list <scr> wrote next to <drawing> into the index.
+    Returns the files found, None if the script didn't write a list."""
+    file = sidecar(drawing, scr)
+    try:
+        lines = file.read_text(errors="replace").splitlines()
+    except OSError:
+        return None
+    names = sorted({line.strip() for line in lines if line.strip()})
+    store(key, drawing, names)
+    file.unlink(missing_ok=True)
+    return names
+
+
+def stamp(name: str) -> str:
+    """Size and modified time of a dependency, it is changed when either is."""
+    try:
+        stat = Path(name).stat()
+    except OSError:
+        return f"{name}|missing"
+    return f"{name}|{stat.st_size}|{stat.st_mtime_ns}"
+
+
+def digest(names: Iterable[str]) -> str:
+    """Changes whenever any of the files changes, appears or goes missing.
+    >>> digest([]) == digest([])
+    True
+    """
+    joined = "\n".join(stamp(name) for name in sorted(names))
+    return hashlib.sha1(joined.encode()).hexdigest()
+
+
+def dependents(changed: Iterable[str], graph: dict[str, list[str]]) -> set[str]:
+    """Drawings in <graph> (drawing -> files it uses) that use a <changed> file.
+    >>> graph = {"a.dwg": ["tb.dwg"], "b.dwg": ["tb.dwg", "logo.png"], "c.dwg": []}
+    >>> sorted(dependents(["tb.dwg"], graph))
+    ['a.dwg', 'b.dwg']
+    """
+    changed = {os.path.normcase(os.path.normpath(name)) for name in changed}
+    return {
+        drawing
+        for drawing, names in graph.items()
+        if any(os.path.normcase(os.path.normpath(name)) in changed for name in names)
+    }
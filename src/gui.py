@@ -1,35 +1,165 @@
 # pyright: reportUnknownMemberType=false, reportGeneralTypeIssues=false
 
 import ctypes
+import fnmatch
+import functools
 import os
 import sys
+import threading
+import time
+from collections import deque
 from pathlib import Path
-from typing import Any
+from typing import Any, Optional
 
-from PySide6.QtCore import QObject, Qt, Signal
+from PySide6.QtCore import QObject, QStringListModel, Qt, QTimer, Signal
 from PySide6.QtGui import QIcon
 from PySide6.QtWidgets import (
     QApplication,
     QCheckBox,
+    QComboBox,
+    QCompleter,
     QFileDialog,
     QGridLayout,
+    QHBoxLayout,
     QLabel,
     QLineEdit,
     QMainWindow,
+    QPlainTextEdit,
     QPushButton,
-    QTextEdit,
+    QTableWidget,
+    QTableWidgetItem,
     QToolButton,
     QWidget,
 )
 
-from src import app
+from src import app, client, index, tools
+from src.jobs import Job, JobQueue
+
+
+# Lines kept in the status box, older lines are dropped.
+LOG_LINES = 5000
+# Milliseconds between writing buffered stderr to the status box.
+FLUSH_MS = 100
+# Message severities, the status box shows those at or above the chosen one.
+INFO, WARNING, ERROR = range(3)
+LEVELS = {"All": INFO, "Warnings": WARNING, "Errors": ERROR}
+LEVEL_NAMES = ("INFO", "WARNING", "ERROR")
+# Milliseconds between updates of the job status and times.
+JOB_MS = 500
+JOB_COLUMNS = ("Drawings", "Source", "Status", "Time", "")
+
+
+def severity(line: str, default: int = INFO) -> int:
+    """ERROR for error lines, otherwise <default>.
+    >>> severity("Error: No matching files")
+    2
+    >>> severity("Source Folder: Q:/")
+    0
+    """
+    if line.startswith(("Error", "Traceback")) or "Error:" in line:
+        return ERROR
+    return default
 
 
 class emitter(QObject):
+    """File-like stand in for stderr. Writes are buffered and sent on in batches by
+    emit_pending so chatty output doesn't redraw the window for every write."""
+
     textWritten = Signal(str)
 
+    def __init__(self) -> None:
+        super().__init__()
+        self.buffer: list[str] = []
+        self.lock = threading.Lock()  # Written to from the plot threads.
+
     def write(self, text: Any) -> None:
-        self.textWritten.emit(str(text))
+        with self.lock:
+            self.buffer.append(str(text))
+
+    def flush(self) -> None:
+        pass  # Sent on by emit_pending on the window's timer instead.
+
+    def emit_pending(self) -> None:
+        with self.lock:
+            text, self.buffer = "".join(self.buffer), []
+        if text.strip():
+            self.textWritten.emit(text.rstrip("\n"))
+
+
+class LogView(QPlainTextEdit):
+    """Read only status box keeping the last LOG_LINES messages, filtered by
+    severity."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.setReadOnly(True)
+        self.setMaximumBlockCount(LOG_LINES)
+        self.records: deque[tuple[int, str]] = deque(maxlen=LOG_LINES)
+        self.level = INFO
+
+    def append(self, text: str, level: int = INFO) -> None:
+        """Adds the lines of <text> at <level>, error lines are always errors."""
+        records = [
+            (max(level, severity(line)), line) for line in text.split("\n")[-LOG_LINES:]
+        ]
+        self.records.extend(records)
+        shown = [line for level, line in records if level >= self.level]
+        if shown:
+            self.appendPlainText("\n".join(shown))
+
+    def set_level(self, level: int) -> None:
+        self.level = level
+        self.setPlainText(
+            "\n".join(line for level, line in self.records if level >= self.level)
+        )
+        self.verticalScrollBar().setValue(self.verticalScrollBar().maximum())
+
+    def save(self, file: Path) -> None:
+        """Writes every kept message, whatever the filter, to <file>."""
+        file.write_text(
+            "".join(f"{LEVEL_NAMES[level]}: {line}\n" for level, line in self.records)
+        )
+
+
+class Listing(QObject):
+    """Lists the drawings in a folder off the UI thread, share folders can be slow."""
+
+    loaded = Signal(str, list)
+
+    def load(self, folder: str) -> None:
+        threading.Thread(target=self.run, args=(folder,), daemon=True).start()
+
+    def run(self, folder: str) -> None:
+        try:
+            with os.scandir(folder) as entries:
+                names = [
+                    entry.name
+                    for entry in entries
+                    if entry.name.lower().endswith(".dwg")
+                ]
+        except OSError:
+            names = []
+        try:
+            self.loaded.emit(folder, names)
+        except RuntimeError:
+            pass  # The window was closed while listing.
+
+
+class Finder(QObject):
+    """Searches the project index off the UI thread, it may have to list projects
+    that haven't been indexed yet."""
+
+    found = Signal(str, list)
+
+    def find(self, number: str) -> None:
+        threading.Thread(target=self.run, args=(number,), daemon=True).start()
+
+    def run(self, number: str) -> None:
+        found = index.search(number, index.CONTRACT)
+        try:
+            self.found.emit(number, found)
+        except RuntimeError:
+            pass  # The window was closed while searching.
 
 
 class MainApplication(QApplication):
@@ -39,7 +169,6 @@ class MainApplication(QApplication):
         if os.name == "nt":
             app_id = "DrawingPack"
             ctypes.windll.shell32.SetCurrentProcessExplicitAppUserModelID(app_id)
-        self.latest_file = Path()
         self.window = QMainWindow()
         self.window.setWindowTitle("Drawing Pack Tool")
         self.window.setWindowIcon(
@@ -50,6 +179,12 @@ class MainApplication(QApplication):
         self.match_label = QLabel("Enter Drawing Number\n[e.g. 205, blank for all]")
         self.match = QLineEdit()
         self.match.setFixedWidth(133)
+        # Drawing numbers in the source folder, offered as the number is typed.
+        self.numbers = QStringListModel()
+        completer = QCompleter(self.numbers)
+        completer.setFilterMode(Qt.MatchContains)
+        completer.setCaseSensitivity(Qt.CaseInsensitive)
+        self.match.setCompleter(completer)
 
         self.rev_label = QLabel("Rev")
         self.rev = QLineEdit()
@@ -61,11 +196,19 @@ class MainApplication(QApplication):
         self.source_picker = QToolButton()
         self.source_picker.setArrowType(Qt.RightArrow)
         self.source_picker.clicked.connect(
-            lambda: self.get_directory(self.source, "Q:/CAD_Drawings/Contract")
+            lambda: self.get_directory(self.source, str(index.CONTRACT))
         )
         self.source.editingFinished.connect(
             lambda: self.path_change(self.source, "Source")
         )
+        self.source.editingFinished.connect(self.load_listing)
+        # Drawings in the source folder, so the preview doesn't list the share.
+        self.names: list[str] = []
+        self.listing = Listing()
+        self.listing.loaded.connect(self.listed)
+        self.preview = QLabel("")
+        self.match.textChanged.connect(self.update_preview)
+        self.rev.textChanged.connect(self.update_preview)
 
         self.dest_label = QLabel("Enter Destination Path\n[if not source]")
         self.dest = QLineEdit()
@@ -90,28 +233,63 @@ class MainApplication(QApplication):
         self.keep_sheets_label = QLabel("Keep individual sheets also")
         self.keep_sheets = QCheckBox()
 
-        self.status = QTextEdit("Ready")
+        self.status = LogView()
+        self.status.append("Ready")
         self.status.append("Leave Rev blank to get the latest revision of each file")
         self.status.append(
             "Leave output blank to get a file name of 5300XXXXXX-VWC-MS-DWG-XXXXX-01_ZZ-RX"
         )
-        self.status.setReadOnly(True)
         self.status.setMinimumWidth(400)
+        self.log_level = QComboBox()
+        self.log_level.addItems(list(LEVELS))
+        self.log_level.currentTextChanged.connect(
+            lambda name: self.status.set_level(LEVELS[name])
+        )
+        self.save_log = QPushButton("Save Log")
+        self.save_log.clicked.connect(self.save_status)
         self.go = QPushButton("Go")
-        self.open = QPushButton("Open File")
+        self.find = QPushButton("Find")
         self.match.returnPressed.connect(self.process)
         self.rev.returnPressed.connect(self.process)
         self.source.returnPressed.connect(self.process)
         self.dest.returnPressed.connect(self.process)
         self.output.returnPressed.connect(self.process)
         self.go.clicked.connect(self.process)
-        self.open.clicked.connect(self.open_file)
-
-        sys.stderr = emitter()
-        sys.stderr.textWritten.connect(self.console)
+        self.find.clicked.connect(lambda: self.find_drawing())
+        self.finder = Finder()
+        self.finder.found.connect(self.found_drawing)
+        # Whether to pack the drawing once its source folder is found.
+        self.pack_found = False
+        # Keep the project index current so Find doesn't have to list every project.
+        index.start_refresh(index.CONTRACT)
+
+        self.stderr = emitter()
+        self.stderr.textWritten.connect(self.console)
+        sys.stderr = self.stderr
+        self.log_timer = QTimer()
+        self.log_timer.setInterval(FLUSH_MS)
+        self.log_timer.timeout.connect(self.stderr.emit_pending)
+        self.log_timer.start()
+
+        # Packs run at the same time, their sheets share the scheduler's plot workers.
+        # Hand them to a running `drawing_pack serve` if there is one.
+        server_url = os.environ.get("DRAWING_PACK_SERVER")
+        runner = functools.partial(client.run, server_url) if server_url else None
+        self.jobs = JobQueue(runner=runner)
+        self.job_rows: list[Job] = []
+        self.reported: set[str] = set()  # Finished jobs already written to status.
+        self.job_table = QTableWidget(0, len(JOB_COLUMNS))
+        self.job_table.setHorizontalHeaderLabels(JOB_COLUMNS)
+        self.job_table.horizontalHeader().setStretchLastSection(True)
+        self.job_table.verticalHeader().hide()
+        self.job_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.job_timer = QTimer()
+        self.job_timer.setInterval(JOB_MS)
+        self.job_timer.timeout.connect(self.update_jobs)
+        self.job_timer.start()
 
         self.grid.setColumnStretch(4, 1)
-        self.window.setFixedHeight(250)
+        self.window.setFixedHeight(420)
         self.window.setMinimumWidth(830)
 
         self.initUI()
@@ -146,9 +324,15 @@ class MainApplication(QApplication):
         self.keep_sheets.hide()
 
         self.grid.addWidget(self.status, 0, 4, 6, 1)
+        log_buttons = QHBoxLayout()
+        log_buttons.addWidget(self.log_level)
+        log_buttons.addWidget(self.save_log)
+        log_buttons.addStretch()
+        self.grid.addLayout(log_buttons, 6, 4)
         self.grid.addWidget(self.go, 6, 0)
-        self.grid.addWidget(self.open, 6, 1)
-        self.open.hide()
+        self.grid.addWidget(self.find, 6, 1)
+        self.grid.addWidget(self.preview, 7, 0, 1, 5)
+        self.grid.addWidget(self.job_table, 8, 0, 1, 5)
 
         self.window.setCentralWidget(central_widget)
 
@@ -157,7 +341,39 @@ class MainApplication(QApplication):
         entry.setText(source_picker)
         entry.editingFinished.emit()
 
-    def process(self) -> None:
+    def find_drawing(self, pack: bool = False) -> None:
+        """Looks up the source folder of the drawing number in the project index,
+        found_drawing fills it in. With <pack> the drawing is packed once found."""
+        number = self.match.text()
+        if not number:
+            self.status.append("Enter a drawing number to find")
+            return
+        self.pack_found = pack
+        self.finder.find(number)
+
+    def found_drawing(self, number: str, found: list[index.Found]) -> None:
+        """Fills in the source folder if the drawing is in exactly one project."""
+        if number != self.match.text():
+            return  # The number was changed while it was being found.
+        pack, self.pack_found = self.pack_found, False
+        if not found:
+            self.status.append(
+                f"Error: No drawings matching '{number}' under '{index.CONTRACT}'"
+            )
+            return
+        for project in found:
+            self.status.append(f"{project.source}: {', '.join(project.latest)}")
+        if len(found) > 1:
+            self.status.append("Found in more than one project, pick the source")
+            return
+        self.source.setText(str(found[0].source))
+        self.source.editingFinished.emit()
+        if pack:
+            self.process()
+
+    def get_match(self) -> tuple[str, bool]:
+        """The match string and whether to get the latest revisions, from the
+        drawing number and rev boxes."""
         if self.match.text():
             match = self.match.text().zfill(5)
         else:
@@ -168,45 +384,126 @@ class MainApplication(QApplication):
         else:
             latest = True
         match = match.replace("RR", "R")  # If rev was input as R0 instead of 0 only.
+        return match, latest
+
+    def load_listing(self) -> None:
+        self.names = []
+        self.update_preview()
+        if self.source.text():
+            self.listing.load(self.source.text())
+
+    def listed(self, folder: str, names: list[str]) -> None:
+        """Keeps the listing of the source folder for the preview."""
+        if folder != self.source.text():
+            return  # The source was changed while it was being listed.
+        self.names = names
+        bases = tools.parse_revisions(names).bases
+        self.numbers.setStringList(sorted({base.split("-")[4] for base in bases}))
+        self.update_preview()
+
+    def update_preview(self) -> None:
+        """Shows how many drawings match and which would be used, as it is typed."""
+        if not self.names:
+            self.preview.setText("")
+            return
+        match, latest = self.get_match()
+        matched = fnmatch.filter(self.names, tools.process_match(match))
+        used = sorted(tools.parse_revisions(matched).latest()) if latest else matched
+        if not used:
+            self.preview.setText("No matching files")
+        else:
+            more = f" and {len(used) - 1} more" if len(used) > 1 else ""
+            self.preview.setText(
+                f"{len(matched)} matching, {len(used)} used: {used[0]}{more}"
+            )
+        self.preview.setToolTip("\n".join(used))
+
+    def process(self) -> Optional[Job]:
+        """Queues a pack of the drawings entered, it runs alongside any others.
+        Without a source folder the drawing is found first and packed after."""
+        if self.match.text() and not self.source.text():
+            self.find_drawing(pack=True)
+            return None
+        match, latest = self.get_match()
         dest = Path(self.dest.text()) if self.dest.text() else None
         output = self.output.text() if self.output.text() else None
-        result: str = app.main(
-            match=match,
-            source=Path(self.source.text()),
-            dest=dest,
-            output=output,
-            paper=self.layouts.isChecked(),
-            latest=latest,
-            keep=self.keep_sheets.isChecked(),
-            del_source=False,
-            view=False,
+        job = self.jobs.submit(
+            dict(
+                match=match,
+                source=Path(self.source.text()),
+                dest=dest,
+                output=output,
+                paper=self.layouts.isChecked(),
+                latest=latest,
+                keep=self.keep_sheets.isChecked(),
+                del_source=False,
+                view=False,
+            )
         )
-        if result.startswith("Error"):
-            self.status.append(result)
-        else:
-            self.set_latest(result)
-            self.open.show()
-            self.match.setText("")
-            self.rev.setText("")
-            self.output.setText("")
-            self.status.append(f"Success! {self.latest_file} created.")
+        self.add_job(job)
+        self.match.setText("")
+        self.rev.setText("")
+        self.output.setText("")
+        return job
+
+    def add_job(self, job: Job) -> None:
+        row = self.job_table.rowCount()
+        self.job_table.insertRow(row)
+        self.job_rows.append(job)
+        drawings = job.args["match"] or "All"
+        self.job_table.setItem(row, 0, QTableWidgetItem(drawings))
+        self.job_table.setItem(row, 1, QTableWidgetItem(str(job.args["source"])))
+        self.update_job(row, job)
+
+    def update_jobs(self) -> None:
+        for row, job in enumerate(self.job_rows):
+            if job.id not in self.reported:
+                self.update_job(row, job)
+
+    def update_job(self, row: int, job: Job) -> None:
+        """Shows the status and time taken of <job>, and reports it once finished."""
+        elapsed = ""
+        if job.started is not None:
+            elapsed = f"{(job.finished or time.time()) - job.started:.0f}s"
+        self.job_table.setItem(row, 2, QTableWidgetItem(job.status))
+        self.job_table.setItem(row, 3, QTableWidgetItem(elapsed))
+        if job.finished is None or job.pack is None:
+            return
+        self.reported.add(job.id)
+        if not job.pack.ok or not job.pack.outputs:
+            self.status.append(str(job.pack))
+            return
+        file = job.pack.outputs[0]
+        self.status.append(f"Success! {file} created.")
+        if job.pack.usage is not None:
+            self.status.append(f"Plotting used {job.pack.usage}")
+        button = QPushButton("Open")
+        button.clicked.connect(functools.partial(self.open_file, file))
+        self.job_table.setCellWidget(row, 4, button)
+        if Path(self.source.text()) == Path(job.args["source"]):
+            self.load_listing()
 
     def __del__(self) -> None:
         """Restore stderr"""
         sys.stderr = sys.__stderr__
 
     def console(self, text: Any) -> None:
-        """Append to status box"""
-        self.status.append(text)
+        """Append stderr to status box"""
+        self.status.append(str(text), WARNING)
+
+    def save_status(self) -> None:  # pragma: no cover
+        file, _ = QFileDialog.getSaveFileName(
+            dir=str(Path.home() / "drawing_pack.log"), filter="Log files (*.log *.txt)"
+        )
+        if file:
+            self.status.save(Path(file))
 
     def path_change(self, textbox: QLineEdit, loc: str) -> None:
         """Print new path to output"""
         self.status.append(f"{loc} Folder: {textbox.text()}")
 
-    def open_file(self) -> None:
-        """Opens the file and removes the button."""
-        os.startfile(self.latest_file)
-        self.open.hide()
+    def open_file(self, file: Path) -> None:
+        os.startfile(file)
 
     def sheets(self) -> None:
         """Checks the box to keep individual sheets when selecting layout only"""
@@ -218,10 +515,6 @@ class MainApplication(QApplication):
             self.keep_sheets_label.hide()
             self.keep_sheets.hide()
 
-    def set_latest(self, file: str) -> None:
-        files = file.split("\n")
-        self.latest_file = Path(files[0])
-
 
 if __name__ == "__main__":
     app = MainApplication()
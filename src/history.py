@@ -0,0 +1,135 @@
+import sqlite3
+import statistics
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from src import CACHE
+
+# Every accoreconsole run, kept to find drawings that have become slow to plot.
+HISTORY = CACHE / "history.sqlite3"
+# A plot this many times slower than the drawing's usual time is flagged.
+SLOWER = 3.0
+# Earlier plots of a sheet needed before its latest one is compared to them.
+MIN_RUNS = 3
+# Seconds to wait for another process writing to the history.
+BUSY_TIMEOUT = 10.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS plots (
+    drawing TEXT NOT NULL,
+    sheet TEXT NOT NULL,
+    started REAL NOT NULL,
+    duration REAL NOT NULL,
+    status INTEGER,
+    dwg_size INTEGER,
+    pdf_size INTEGER
+);
+CREATE INDEX IF NOT EXISTS plots_drawing ON plots (drawing, sheet);
+"""
+
+
+@dataclass
+class SheetStats:
+    """Plot times of one sheet of a drawing, in seconds."""
+
+    drawing: str
+    sheet: str
+    runs: int
+    mean: float
+    latest: float
+    usual: Optional[float] = None  # Median of the runs before the latest.
+
+    @property
+    def slowdown(self) -> Optional[float]:
+        if not self.usual:
+            return None
+        return self.latest / self.usual
+
+
+def connect() -> sqlite3.Connection:
+    HISTORY.parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(HISTORY, timeout=BUSY_TIMEOUT)
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def record(
+    drawing: str,
+    sheet: str,
+    duration: float,
+    status: Optional[int],
+    dwg_size: Optional[int],
+    pdf_size: Optional[int],
+) -> None:
+    """Adds a plot to the history. The history is only a record, if it can't be
+    written the plot carries on without it."""
+    try:
+        connection = connect()
+        try:
+            with connection:
+                connection.execute(
+                    "INSERT INTO plots VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        drawing,
+                        sheet,
+                        time.time() - duration,
+                        duration,
+                        status,
+                        dwg_size,
+                        pdf_size,
+                    ),
+                )
+        finally:
+            connection.close()
+    except sqlite3.Error:
+        pass
+
+
+def durations() -> dict[tuple[str, str], list[float]]:
+    """Plot times of every sheet in the history, in the order they finished."""
+    if not HISTORY.exists():
+        return {}
+    connection = connect()
+    try:
+        rows = connection.execute(
+            "SELECT drawing, sheet, duration FROM plots ORDER BY rowid"
+        ).fetchall()
+    finally:
+        connection.close()
+    found: dict[tuple[str, str], list[float]] = {}
+    for drawing, sheet, duration in rows:
+        found.setdefault((drawing, sheet), []).append(duration)
+    return found
+
+
+def sheet_stats() -> list[SheetStats]:
+    stats = []
+    for (drawing, sheet), times in durations().items():
+        earlier = times[:-1]
+        stats.append(
+            SheetStats(
+                drawing,
+                sheet,
+                runs=len(times),
+                mean=statistics.fmean(times),
+                latest=times[-1],
+                usual=statistics.median(earlier) if len(earlier) >= MIN_RUNS else None,
+            )
+        )
+    return stats
+
+
+def slowest(limit: int = 10) -> list[SheetStats]:
+    """Sheets with the longest average plot time, slowest first."""
+    return sorted(sheet_stats(), key=lambda stats: stats.mean, reverse=True)[:limit]
+
+
+def regressions(factor: float = SLOWER) -> list[SheetStats]:
+    """Sheets whose latest plot took <factor> times their usual time or more."""
+    found = [
+        stats
+        for stats in sheet_stats()
+        if stats.slowdown is not None and stats.slowdown >= factor
+    ]
+    return sorted(found, key=lambda stats: stats.slowdown or 0, reverse=True)
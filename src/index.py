@@ -0,0 +1,107 @@
+import fnmatch
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Optional
+
+from src import CACHE
+from src import tools as tools
+
+# Folder holding one folder per project, searched when no source is given.
+CONTRACT = Path(os.environ.get("DRAWING_PACK_ROOT", "Q:/CAD_Drawings/Contract"))
+# One shard per project folder so a change only rewrites that folder's listing.
+INDEX = CACHE / "index"
+# Project folders listed at once, listing a share waits on the network not the CPU.
+SCANNERS = 8
+
+Shard = dict[str, Any]
+
+
+@dataclass
+class Found:
+    """A project folder holding drawings that matched a search."""
+
+    project: str
+    source: Path
+    latest: list[str]  # Latest revision of each matching sheet.
+
+
+def shard_path(folder: Path) -> Path:
+    return INDEX / f"{hashlib.sha1(str(folder).encode()).hexdigest()}.json"
+
+
+def load_shard(folder: Path) -> Optional[Shard]:
+    try:
+        return json.loads(shard_path(folder).read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def projects(root: Path) -> list[Path]:
+    """Project folders directly under <root>, none if it can't be read."""
+    try:
+        return sorted(entry for entry in root.iterdir() if entry.is_dir())
+    except OSError:
+        return []
+
+
+def refresh_folder(folder: Path) -> bool:
+    """Relists <folder> if it changed since its shard was written.
+    Returns True if the shard was rewritten."""
+    try:
+        mtime = folder.stat().st_mtime_ns
+        shard = load_shard(folder)
+        if shard is not None and shard["mtime"] == mtime:
+            return False
+        names = sorted(
+            entry.name
+            for entry in os.scandir(folder)
+            if entry.name.lower().endswith(".dwg") and entry.is_file()
+        )
+    except OSError:
+        return False  # Gone or unreadable, try again on the next refresh.
+    INDEX.mkdir(parents=True, exist_ok=True)
+    file = shard_path(folder)
+    temp = file.with_name(f".{file.name}.{os.getpid()}-{threading.get_ident()}")
+    temp.write_text(json.dumps({"folder": str(folder), "mtime": mtime, "names": names}))
+    temp.replace(file)
+    return True
+
+
+def refresh(root: Path = CONTRACT) -> int:
+    """Brings the shard of every project under <root> up to date.
+    Returns the number of projects that were listed again."""
+    with ThreadPoolExecutor(SCANNERS, thread_name_prefix="index") as pool:
+        return sum(pool.map(refresh_folder, projects(root)))
+
+
+def start_refresh(root: Path = CONTRACT) -> threading.Thread:
+    """Refreshes the index in a background thread."""
+    thread = threading.Thread(target=refresh, args=(root,), daemon=True)
+    thread.name = "index-refresh"
+    thread.start()
+    return thread
+
+
+def search(number: str, root: Path = CONTRACT) -> list[Found]:
+    """Projects under <root> with drawings matching <number>, from the index.
+    Projects that have not been indexed yet are listed now."""
+    if number.isdigit():
+        number = number.zfill(5)
+    match = tools.process_match(number)
+    found = []
+    for folder in projects(root):
+        shard = load_shard(folder)
+        if shard is None and refresh_folder(folder):
+            shard = load_shard(folder)
+        if shard is None:
+            continue
+        names = fnmatch.filter(shard["names"], match)
+        if names:
+            latest = sorted(tools.parse_revisions(names).latest()) or names
+            found.append(Found(folder.name, folder, latest))
+    return found
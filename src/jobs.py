@@ -0,0 +1,116 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+from src import app, scheduler
+from src.records import PackResult
+
+# Packs worked on at once, their sheets all share the scheduler's plot workers.
+PACKS = 4
+# Arguments of app.main a client may send, and the ones that are paths.
+JOB_ARGS = {
+    "match",
+    "source",
+    "dest",
+    "output",
+    "paper",
+    "latest",
+    "keep",
+    "del_source",
+    "view",
+    "queue",
+    "strict",
+}
+PATH_ARGS = {"source", "dest", "queue"}
+
+
+@dataclass
+class Job:
+    args: dict[str, Any]
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    priority: str = scheduler.INTERACTIVE
+    status: str = "queued"  # queued, running, done or failed
+    result: Optional[str] = None  # str() of pack, the PDFs made or the error.
+    pack: Optional[PackResult] = None
+    submitted: float = field(default_factory=time.time)
+    started: Optional[float] = None
+    finished: Optional[float] = None
+
+    @property
+    def queue_wait(self) -> Optional[float]:
+        if self.started is None:
+            return None
+        return self.started - self.submitted
+
+    def to_dict(self) -> dict[str, Any]:
+        pack = None if self.pack is None else self.pack.to_dict()
+        return dict(asdict(self), pack=pack, queue_wait=self.queue_wait)
+
+
+class JobQueue:
+    """Runs submitted packs in the background and keeps their status.
+
+    Batch packs wait for one of the <packs> slots, interactive packs start at once
+    and their sheets are plotted ahead of the batch sheets. Packs are made by
+    <runner>, app.main unless given."""
+
+    def __init__(
+        self, packs: int = PACKS, runner: Optional[Callable[..., PackResult]] = None
+    ) -> None:
+        self.jobs: dict[str, Job] = {}
+        self.lock = threading.Lock()
+        self.finished = threading.Condition()
+        self.runner = runner
+        self.executor = ThreadPoolExecutor(max_workers=packs, thread_name_prefix="pack")
+
+    def submit(self, args: dict[str, Any]) -> Job:
+        args = dict(args)
+        level = args.pop("priority", scheduler.INTERACTIVE)
+        unknown = set(args) - JOB_ARGS
+        if unknown or "match" not in args or "source" not in args:
+            raise ValueError(f"Bad job arguments: {sorted(unknown) or args}")
+        if level not in scheduler.PRIORITIES:
+            raise ValueError(f"Unknown priority '{level}'")
+        job = Job(args, priority=level)
+        with self.lock:
+            self.jobs[job.id] = job
+        if level == scheduler.BATCH:
+            self.executor.submit(self.run, job)
+        else:
+            threading.Thread(target=self.run, args=(job,), daemon=True).start()
+        return job
+
+    def run(self, job: Job) -> None:
+        job.status = "running"
+        job.started = time.time()
+        kwargs = {
+            key: Path(value) if key in PATH_ARGS and value is not None else value
+            for key, value in job.args.items()
+        }
+        try:
+            with scheduler.priority(job.priority):
+                job.pack = (self.runner or app.main)(**kwargs)
+        except Exception as error:
+            job.pack = PackResult.failed(f"Error: {error}")
+        job.result = str(job.pack)
+        job.status = "done" if job.pack.ok else "failed"
+        with self.finished:
+            job.finished = time.time()
+            self.finished.notify_all()
+
+    def wait(self, job: Job, timeout: Optional[float] = None) -> bool:
+        """Waits for <job> to finish, False if it is still going after <timeout>."""
+        with self.finished:
+            return self.finished.wait_for(lambda: job.finished is not None, timeout)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def all(self) -> list[Job]:
+        with self.lock:
+            return list(self.jobs.values())
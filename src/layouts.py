@@ -1,18 +1,38 @@
+import json
 import os
 import re
-import shutil
 import subprocess
 import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Iterable, Optional
+from typing import Iterable, Optional, Sequence
 
-from PyPDF3 import PdfFileMerger, PdfFileReader
-
-from src import ROOT
-from src import tools as tools
+from src import CACHE, ROOT, archive, deps, plan, scheduler, tools, workqueue
+from src import merge as merger
+from src.records import PackResult, SheetJob
 
 # Matches sheets (See clean_sheet_name) to get the sheet and rev. 1-R0 -> (1)(-R0)
 SHEET_NAME = re.compile(r"-?(\d+)(.*)")
+# Layout names of drawings already opened, see cached_layouts.
+LAYOUT_CACHE = CACHE / "layouts"
+# Drawings of one run merged at once while the other drawings' sheets plot.
+MERGERS = 4
+
+
+@dataclass
+class Pack:
+    """One drawing of a paperspace run, from its copy to its merged PDF."""
+
+    original: Path  # The drawing the layouts are read from.
+    source: Path  # The drawing plotted, a copy in the destination if there is one.
+    destination: Path
+    output: Path
+    del_source: bool
+    copy: Optional["Future[Path]"] = None
+    sheets: list[str] = field(default_factory=list)
+    jobs: list[SheetJob] = field(default_factory=list)
 
 
 def main(
@@ -22,37 +42,213 @@ def main(
     view: bool = False,
     del_source: bool = False,
     keep_individual: bool = False,
+    queue: Optional[Path] = None,
 ) -> Path:
     """Convert the <source> file to pdfs."""
+    started = time.perf_counter()
+    pack = prepare(source, destination, output, del_source)
+    sheets, qty = read_layouts(pack)
+    pack.sheets = list(sheets)
+
+    base_scr = (ROOT / "pdfgen11x17layout.scr").read_text().splitlines()
+
+    pack.jobs = process_sheets(
+        sheets, pack.source, pack.destination, base_scr, pack.copy, queue
+    )
+    finish(pack, keep_individual, view)
+    tools.remove_plot_logs()
+    plan.record_timing(True, qty, started)
+    if pack.copy is not None:
+        pack.copy.result()  # Raises if the drawing could not be copied.
+    return pack.output
+
+
+def main_many(
+    drawings: Iterable[tuple[Path, Optional[Path]]],
+    destination: Optional[Path],
+    view: bool = False,
+    del_source: bool = False,
+    keep_individual: bool = False,
+    queue: Optional[Path] = None,
+) -> PackResult:
+    """Converts each (drawing, output) pair like main does.
+
+    The layouts of each drawing are read as soon as it is found and all of the
+    sheets go in the one plot queue, so no worker waits while a drawing is read or
+    merged. Each drawing is merged as soon as its own sheets are plotted, see
+    merge_when_plotted."""
+    started = time.perf_counter()
+    result = PackResult()
+    base_scr = (ROOT / "pdfgen11x17layout.scr").read_text().splitlines()
+    packs: list[Pack] = []
+    listings: dict["Future[tuple[Iterable[str], int]]", Pack] = {}
+    for source, output in drawings:
+        packs.append(prepare(source, destination, output, del_source))
+        # Reading the layouts opens the drawing in accoreconsole, like plotting does.
+        listings[scheduler.submit(read_layouts, packs[-1])] = packs[-1]
+    finished: list["Future[Optional[Path]]"] = []
+    with ThreadPoolExecutor(MERGERS, thread_name_prefix="merge") as mergers:
+        for listing in as_completed(listings):
+            pack = listings[listing]
+            if listing.exception() is not None and not copied(pack):
+                # Read from a copy that failed, reported by copy_errors.
+                finished.append(mergers.submit(finish, pack))
+                continue
+            pack.sheets = list(listing.result()[0])
+            pack.jobs = write_scripts(
+                pack.sheets, pack.source, pack.destination, base_scr
+            )
+            if queue:
+                continue
+            plotted = [scheduler.submit(plot, job, pack.copy) for job in pack.jobs]
+            finished.append(
+                merge_when_plotted(mergers, pack, plotted, keep_individual, view)
+            )
+        if queue:
+            jobs = [job for pack in packs if copied(pack) for job in pack.jobs]
+            errors = workqueue.plot(queue, ((job.drawing, job.scr) for job in jobs))
+            for job in jobs:
+                job.collected(errors.get(job.pdf))
+            finished = [
+                mergers.submit(finish, pack, keep_individual, view) for pack in packs
+            ]
+        merged = {future.result() for future in finished}
+    tools.remove_plot_logs()
+    plan.record_timing(True, sum(len(pack.sheets) for pack in packs), started)
+    result.outputs = [pack.output for pack in packs if pack.output in merged]
+    result.sheets = [job for pack in packs for job in pack.jobs]
+    result.error = copy_errors(packs)
+    return result.done()
+
+
+def merge_when_plotted(
+    mergers: ThreadPoolExecutor,
+    pack: Pack,
+    plotted: list[scheduler.PlotFuture],
+    keep_individual: bool,
+    view: bool,
+) -> "Future[Optional[Path]]":
+    """Submits finish of <pack> to <mergers> when the last of its <plotted> sheets
+    is done, so no merge thread sits waiting on sheets still to be plotted.
+    Returns the future of the merged PDF."""
+    merged: "Future[Optional[Path]]" = Future()
+    left = len(plotted) + 1  # Until the callbacks are all added too.
+    left_lock = threading.Lock()
+
+    def done(future: "Future[Optional[Path]]") -> None:
+        error = future.exception()
+        if error is not None:
+            merged.set_exception(error)
+        else:
+            merged.set_result(future.result())
+
+    def plotted_one(_: object = None) -> None:
+        nonlocal left
+        with left_lock:
+            left -= 1
+            if left:
+                return
+        mergers.submit(finish, pack, keep_individual, view, plotted).add_done_callback(
+            done
+        )
+
+    for future in plotted:
+        future.add_done_callback(plotted_one)
+    plotted_one()
+    return merged
+
+
+def finish_plots(jobs: list[SheetJob], plotted: Sequence[scheduler.PlotFuture]) -> None:
+    """Waits for the <plotted> futures of <jobs>, noting how long each queued."""
+    scheduler.wait(plotted)
+    for job, future in zip(jobs, plotted):
+        job.queue_wait = future.queue_wait
+
+
+def copied(pack: Pack) -> bool:
+    """Waits for the drawing's copy, if any, and returns False if it failed."""
+    return pack.copy is None or pack.copy.exception() is None
+
+
+def copy_errors(packs: Iterable[Pack]) -> Optional[str]:
+    """Why drawings could not be copied to the destination, None if they all were."""
+    errors = [
+        f"{pack.original.name}: {pack.copy.exception()}"
+        for pack in packs
+        if pack.copy is not None and not copied(pack)
+    ]
+    if not errors:
+        return None
+    return "\n  ".join([f"Error: Could not copy {len(errors)} drawings"] + errors)
+
+
+def prepare(
+    source: Path, destination: Optional[Path], output: Optional[Path], del_source: bool
+) -> Pack:
+    """Works out where <source> is plotted and its PDF written, starting the copy
+    to <destination> if it is somewhere else."""
+    copy: Optional["Future[Path]"] = None
+    original = source
     if destination is None:
         destination = source.parent
     elif destination != source.parent:
-        shutil.copyfile(source, destination / source.name)
+        # Copy in the background, the layouts can be read from the original
+        # unless it is in an archive, see read_layouts.
+        tools.claim_file(destination / source.name)
+        copy = tools.COPY_POOL.submit(
+            tools.copy_drawing, source, destination / source.name
+        )
         source = destination / source.name
         del_source = True
     if output is None:
         output = source.with_suffix(".pdf")
     else:
         output = destination / output.with_suffix(".pdf")
-    sheets, qty = get_layouts(source)
-    fill = max((2, len(str(qty))))
+    return Pack(original, source, destination, output, del_source, copy)
 
-    base_scr = (ROOT / "pdfgen11x17layout.scr").read_text().splitlines()
 
-    scrs = process_sheets(sheets, source, destination, base_scr)
-    temp_files = [rename_file(source, scr, fill) for scr in scrs]
-    merge(temp_files, output)
+def read_layouts(pack: Pack) -> tuple[Iterable[str], int]:
+    """get_layouts of the original, or of the copy once it is made if the original
+    is in an archive accoreconsole can't open."""
+    if pack.copy is not None and archive.is_archive(pack.original.parent):
+        return get_layouts(pack.copy.result())
+    return get_layouts(pack.original)
+
+
+def finish(
+    pack: Pack,
+    keep_individual: bool = False,
+    view: bool = False,
+    plotted: Sequence[scheduler.PlotFuture] = (),
+) -> Optional[Path]:
+    """Merges the sheets of <pack> once <plotted> are done and cleans up. Sheets
+    that failed are left out, they are in the result with their error. Returns the
+    merged PDF, None if the drawing could not be copied (see copy_errors) or no
+    sheet was plotted."""
+    finish_plots(pack.jobs, plotted)
+    failed = [job for job in pack.jobs if job.status == "failed"]
+    if not copied(pack) or len(failed) == len(pack.jobs):
+        remove_temp([job.pdf for job in pack.jobs] + [job.scr for job in pack.jobs])
+        tools.release_file(pack.source)
+        return None
+    for job in failed:
+        tools.release_file(job.pdf)  # Claimed by plot, if it got that far.
+    fill = max((2, len(str(len(pack.sheets)))))
+    temp_files = [rename_file(job, fill) for job in pack.jobs if job.status != "failed"]
+    merge(temp_files, pack.output)
 
-    if del_source:
-        remove_temp((source,))
+    if pack.del_source:
+        tools.release_file(pack.source)
     if not keep_individual:
         remove_temp(temp_files)
+    else:
+        for file in temp_files:
+            tools.release_file(file, delete=False)
 
-    remove_temp(list(scrs))
+    remove_temp([job.scr for job in pack.jobs])
     if view:
-        os.startfile(output)
-    tools.remove_plot_logs()
-    return output
+        os.startfile(pack.output)
+    return pack.output
 
 
 def get_base_name(source: Path, sheet_count: int) -> str:
@@ -64,63 +260,95 @@ def get_base_name(source: Path, sheet_count: int) -> str:
 
 
 def process_sheets(
+    sheets: Iterable[str],
+    source: Path,
+    dest: Path,
+    base_scr: list[str],
+    copy: Optional["Future[Path]"] = None,
+    queue: Optional[Path] = None,
+) -> list[SheetJob]:
+    """Creates the PDFs for all sheets, waiting for <copy> to land if given.
+    The sheets are plotted by the workers reading <queue> if given."""
+    jobs = write_scripts(sheets, source, dest, base_scr)
+    if queue:
+        if copy is not None:
+            copy.result()
+        errors = workqueue.plot(queue, ((job.drawing, job.scr) for job in jobs))
+        for job in jobs:
+            job.collected(errors.get(job.pdf))
+    else:
+        plotted = [scheduler.submit(plot, job, copy) for job in jobs]
+        finish_plots(jobs, plotted)
+    return jobs
+
+
+def write_scripts(
     sheets: Iterable[str], source: Path, dest: Path, base_scr: list[str]
-) -> list[Path]:
-    """Creates the PDFs for all sheets"""
-    scrs: list[Path] = []
-    threads: list[threading.Thread] = []
+) -> list[SheetJob]:
+    """Writes the plot script of each sheet, named after <source> so drawings
+    plotted at the same time into <dest> don't share scripts. Each script writes
+    its own list of the files the drawing uses, see deps.sidecar."""
+    jobs: list[SheetJob] = []
     for idx, sheet in enumerate(sheets):
-        scrs.append(dest / f"scr{idx}.scr")
-        scr = base_scr[:]
+        job = SheetJob(source, dest / f"{source.stem}-scr{idx}.scr", sheet)
+        scr = deps.named(base_scr, job.scr)
         scr[2] = f'"{sheet}"'
-        (dest / f"scr{idx}.scr").write_text("\n".join(scr) + "\n")
-        t = threading.Thread(target=tools.make_pdf, args=(source, dest / f"scr{idx}"))
-        t.start()
-        threads.append(t)
-    for t in threads:
-        t.join()
+        jobs.append(job)
+        job.scr.write_text("\n".join(scr) + "\n")
+    return jobs
+
 
-    return scrs
+def plot(job: SheetJob, copy: Optional["Future[Path]"] = None) -> None:
+    """Plots the sheet once the drawing's copy (if any) has landed. The PDF is
+    claimed until rename_file releases it, another run may plot the same sheet."""
+    with job.running():
+        if copy is not None:
+            copy.result()
+        tools.claim_file(job.pdf)
+        job.usage = tools.make_pdf(job.drawing, job.scr)
 
 
-def rename_file(source: Path, scr: Path, fill: int = 2) -> Path:
-    """Renames the PDF to remove extra sheet references"""
-    parent = source.parent
-    orig_name = source.stem
-    with scr.open() as f:
-        sheet = f.readlines()[2].strip().replace('"', "")
-    pdf = source.with_name(f"{orig_name}-{sheet}.pdf")
-    sheet = clean_sheet_name(sheet, fill)
-    new_name = f"{pdf.stem[:27]}{sheet}.pdf"
-    return pdf.replace(parent / new_name)
+def rename_file(job: SheetJob, fill: int = 2) -> Path:
+    """Renames the PDF to remove extra sheet references. Another run plotting the
+    same sheet here may still need either name, so the PDF is copied and both are
+    claimed as shared files, see tools.claim_file."""
+    sheet = clean_sheet_name(job.sheet, fill)
+    renamed = job.drawing.parent / f"{job.pdf.stem[:27]}{sheet}.pdf"
+    tools.claim_file(renamed)
+    try:
+        tools.copy_drawing(job.pdf, renamed)
+    except OSError:
+        tools.release_file(renamed)
+        raise
+    finally:
+        tools.release_file(job.pdf)
+    return renamed
 
 
 def merge(files: Iterable[Path], output: Path) -> None:  # pragma: no cover
     """Merges the individual PDFs into one."""
-    merged = PdfFileMerger(strict=False)
-    for file in sorted(files):
-        title = file.stem
-        merged.append(PdfFileReader(str(file)), title)
-    merged.write(str(output))
+    merger.merge([(file, file.stem) for file in sorted(files)], output)
 
 
 def remove_temp(files: Iterable[Path]) -> None:  # pragma: no cover
-    """Deletes all temp files"""
+    """Deletes all temp files, those another run still uses once it is done with
+    them, see tools.release_file."""
     for file in files:
-        try:
-            file.unlink()
-        except FileNotFoundError:
-            continue
+        tools.release_file(file)
 
 
 def get_layouts(drawing: Path) -> tuple[Iterable[str], int]:
     """Opens the drawing and returns a list of all sheet names"""
+    cached = cached_layouts(drawing)
+    if cached is not None:
+        return iter(cached), len(cached)
     # odafc.win_exec_path = "./ODA/ODAFileConverter.exe"
     # doc = odafc.readfile(str(drawing))
     # return doc.layout_names_in_taborder()[1:]
+    # Named per thread as several drawings' layouts may be read at once.
     base = Path(__file__).parent
-    layouts = base / "layouts.txt"
-    scr = base / "sheetlist.scr"
+    layouts = base / f"layouts-{threading.get_ident()}.txt"
+    scr = base / f"sheetlist-{threading.get_ident()}.scr"
     scr.write_text(
         f"""
 (if (setq des (open "{layouts.as_posix()}" "w"))
@@ -139,12 +367,29 @@ def get_layouts(drawing: Path) -> tuple[Iterable[str], int]:
     )
     subprocess.run(f'"{tools.get_accore()}" /i "{str(drawing)}" /s "{scr}" /l "en-US"')
     with open(layouts) as f:
-        sheets = (line.strip() for line in f.readlines() if line.strip() != "Model")
-        f.seek(0)
-        qty = sum(1 for line in f if line.strip() != "Model")
+        sheets = [line.strip() for line in f.readlines() if line.strip() != "Model"]
     layouts.unlink()
     scr.unlink()
-    return sheets, qty
+    store_layouts(drawing, sheets)
+    return iter(sheets), len(sheets)
+
+
+def cached_layouts(drawing: Path) -> Optional[list[str]]:
+    """The sheet names found by an earlier get_layouts of the same drawing."""
+    try:
+        cache = LAYOUT_CACHE / f"{tools.fingerprint(drawing)}.json"
+        return json.loads(cache.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def store_layouts(drawing: Path, sheets: list[str]) -> None:
+    try:
+        cache = LAYOUT_CACHE / f"{tools.fingerprint(drawing)}.json"
+    except OSError:
+        return
+    LAYOUT_CACHE.mkdir(parents=True, exist_ok=True)
+    cache.write_text(json.dumps(sheets))
 
 
 def clean_sheet_name(sheet: str, fill: int = 2) -> str:
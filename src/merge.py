@@ -0,0 +1,123 @@
+import mmap
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterator, Optional, Sequence
+
+from src import metrics
+
+if TYPE_CHECKING:  # PyPDF3 is slow to import, only load it once merging starts.
+    from PyPDF3 import PdfFileReader
+
+# Number of sheets merged by a single worker before the partial PDFs are combined.
+CHUNK_SIZE = 50
+# Most input PDFs held open at once, more are merged in groups first.
+MAX_OPEN = 64
+
+# A sheet to merge and the bookmark title to give it.
+Sheet = tuple[Path, str]
+# A bookmark title and the page it points to.
+Bookmark = tuple[str, int]
+
+
+def merge(
+    sheets: Sequence[Sheet],
+    output: Path,
+    chunk_size: int = CHUNK_SIZE,
+    workers: Optional[int] = None,
+) -> Path:
+    """Merges the sheets, in order, into <output>.
+
+    Packs larger than <chunk_size> are split into chunks which are merged in a
+    process pool, the partial PDFs are then combined and the bookmarks restored.
+    """
+    with metrics.MERGE_SECONDS.time():
+        return merge_sheets(sheets, output, chunk_size, workers)
+
+
+def merge_sheets(
+    sheets: Sequence[Sheet], output: Path, chunk_size: int, workers: Optional[int]
+) -> Path:
+    if len(sheets) <= chunk_size:
+        merge_chunk(sheets, output)
+        return output
+    chunks = [
+        sheets[idx : idx + chunk_size] for idx in range(0, len(sheets), chunk_size)
+    ]
+    with tempfile.TemporaryDirectory(dir=output.parent) as temp:
+        partials = [Path(temp) / f"part{idx:0>5}.pdf" for idx in range(len(chunks))]
+        workers = min(workers or os.cpu_count() or 1, len(chunks))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            bookmarks = list(pool.map(merge_chunk, chunks, partials))
+        combine(partials, bookmarks, output)
+    return output
+
+
+def merge_chunk(sheets: Sequence[Sheet], output: Path) -> list[Bookmark]:
+    """Merges the sheets into <output> in a single pass.
+
+    Returns the bookmarks that were added so they can be restored by combine."""
+    return write_merged([(file, [(title, 0)]) for file, title in sheets], output)
+
+
+def combine(
+    partials: Sequence[Path], bookmarks: Sequence[list[Bookmark]], output: Path
+) -> None:
+    """Joins the partial merges keeping each chunk's bookmarks."""
+    write_merged(list(zip(partials, bookmarks)), output)
+
+
+def write_merged(
+    parts: Sequence[tuple[Path, Sequence[Bookmark]]],
+    output: Path,
+    max_open: int = MAX_OPEN,
+) -> list[Bookmark]:
+    """Copies the pages of each part into <output>, offsetting the part's bookmarks
+    by the page it starts on. The pages are read from the inputs as <output> is
+    written, so every input is open until then. More than <max_open> parts are
+    merged in groups into partial PDFs first, which are then merged the same way.
+    Empty files, from plots that failed part way, have no pages to add."""
+    from PyPDF3 import PdfFileWriter
+
+    if len(parts) > max_open:
+        with tempfile.TemporaryDirectory(dir=output.parent) as temp:
+            groups = [
+                parts[idx : idx + max_open] for idx in range(0, len(parts), max_open)
+            ]
+            partials = [
+                Path(temp) / f"group{idx:0>5}.pdf" for idx in range(len(groups))
+            ]
+            marks = [
+                write_merged(group, partial, max_open)
+                for group, partial in zip(groups, partials)
+            ]
+            return write_merged(list(zip(partials, marks)), output, max_open)
+    writer = PdfFileWriter()
+    bookmarks: list[Bookmark] = []
+    with ExitStack() as inputs:
+        for file, marks in parts:
+            if file.stat().st_size == 0:
+                continue
+            reader = inputs.enter_context(open_pdf(file))
+            start = writer.getNumPages()
+            for idx in range(reader.getNumPages()):
+                writer.addPage(reader.getPage(idx))
+            bookmarks.extend((title, start + page) for title, page in marks)
+        for title, page in bookmarks:
+            writer.addBookmark(title, page)
+        with output.open("wb") as f:
+            writer.write(f)
+    return bookmarks
+
+
+@contextmanager
+def open_pdf(file: Path) -> Iterator["PdfFileReader"]:
+    """Reads the PDF through a read only memory map instead of copying it in."""
+    from PyPDF3 import PdfFileReader
+
+    with file.open("rb") as f, mmap.mmap(
+        f.fileno(), 0, access=mmap.ACCESS_READ
+    ) as buffer:
+        yield PdfFileReader(buffer, strict=False)
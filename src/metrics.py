@@ -0,0 +1,217 @@
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterator, Optional, Sequence
+
+from src import scheduler
+
+# Seconds between writes of the metrics file by long running commands.
+EXPORT_INTERVAL = 15.0
+
+
+class Metric:
+    """A value exported in the Prometheus text format read by node-exporter's
+    textfile collector."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str) -> None:
+        self.name = name
+        self.help = help
+        self.lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def samples(self) -> list[tuple[str, float]]:
+        raise NotImplementedError
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(f"{name} {format_value(value)}" for name, value in self.samples())
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str) -> None:
+        super().__init__(name, help)
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self.lock:
+            self.value += amount
+
+    def samples(self) -> list[tuple[str, float]]:
+        return [(self.name, self.value)]
+
+
+class Gauge(Metric):
+    """A value that goes up and down, or is read from <read> when exported."""
+
+    kind = "gauge"
+
+    def __init__(
+        self, name: str, help: str, read: Optional[Callable[[], float]] = None
+    ) -> None:
+        super().__init__(name, help)
+        self.value = 0.0
+        self.read = read
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self.lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.inc(-amount)
+
+    @contextmanager
+    def tracking(self) -> Iterator[None]:
+        """Counts the block as in progress while it runs."""
+        self.inc()
+        try:
+            yield
+        finally:
+            self.dec()
+
+    def samples(self) -> list[tuple[str, float]]:
+        return [(self.name, self.read() if self.read else self.value)]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: Sequence[float]) -> None:
+        super().__init__(name, help)
+        self.buckets = sorted(buckets) + [math.inf]
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        with self.lock:
+            self.sum += value
+            for idx, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[idx] += 1
+                    break
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        """Observes how long the block took in seconds."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def samples(self) -> list[tuple[str, float]]:
+        with self.lock:
+            counts, total = list(self.counts), self.sum
+        samples = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, counts):
+            cumulative += count
+            samples.append(
+                (f'{self.name}_bucket{{le="{format_value(bound)}"}}', cumulative)
+            )
+        samples.append((f"{self.name}_sum", total))
+        samples.append((f"{self.name}_count", cumulative))
+        return samples
+
+
+def format_value(value: float) -> str:
+    """
+    >>> [format_value(value) for value in (3.0, 0.5, math.inf)]
+    ['3', '0.5', '+Inf']
+    """
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return str(int(value)) if value == int(value) else repr(value)
+
+
+REGISTRY: list[Metric] = []
+
+PLOT_SECONDS = Histogram(
+    "drawing_pack_plot_seconds",
+    "Time accoreconsole took to plot a sheet.",
+    (1, 2, 5, 10, 20, 30, 60, 120, 300, 600),
+)
+MERGE_SECONDS = Histogram(
+    "drawing_pack_merge_seconds",
+    "Time taken to merge the sheets of a pack into one PDF.",
+    (0.1, 0.5, 1, 2, 5, 10, 30, 60, 120),
+)
+COPY_SECONDS = Histogram(
+    "drawing_pack_copy_seconds",
+    "Time taken to copy a drawing to the destination folder.",
+    (0.05, 0.1, 0.5, 1, 2, 5, 10, 30, 60),
+)
+SHEETS_PLOTTED = Counter(
+    "drawing_pack_sheets_plotted_total", "Sheets plotted by accoreconsole."
+)
+SHEETS_FAILED = Counter(
+    "drawing_pack_sheets_failed_total", "Plots that did not write a PDF."
+)
+SHEETS_RETRIED = Counter(
+    "drawing_pack_sheets_retried_total",
+    "Queued sheets put back for another worker after theirs went quiet.",
+)
+SHEETS_SHARED = Counter(
+    "drawing_pack_sheets_shared_total",
+    "Sheets copied from an identical plot running at the same time.",
+)
+SHEETS_KEPT = Counter(
+    "drawing_pack_sheets_kept_total",
+    "Sheets reused from an earlier build of a watched pack.",
+)
+ACTIVE_CONSOLES = Gauge(
+    "drawing_pack_active_consoles", "accoreconsole processes running now."
+)
+
+
+QUEUE_DEPTH = Gauge(
+    "drawing_pack_queue_depth",
+    "Jobs waiting for a plot worker.",
+    lambda: scheduler.get_scheduler().queued,
+)
+
+
+def render() -> str:
+    return "".join(f"{line}\n" for metric in REGISTRY for line in metric.render())
+
+
+def write(file: Path) -> None:
+    """Writes every metric to <file>, replacing it in one step so the collector
+    never reads half a file."""
+    file.parent.mkdir(parents=True, exist_ok=True)
+    temp = file.with_name(f".{file.name}.{os.getpid()}-{threading.get_ident()}")
+    temp.write_text(render())
+    temp.replace(file)
+
+
+@contextmanager
+def exporting(
+    file: Optional[Path], interval: float = EXPORT_INTERVAL
+) -> Iterator[None]:
+    """Writes <file> every <interval> seconds while the block runs, and once more
+    at the end. Does nothing if <file> is None."""
+    if file is None:
+        yield
+        return
+    stop = threading.Event()
+
+    def export() -> None:
+        while not stop.wait(interval):
+            write(file)
+
+    thread = threading.Thread(target=export, daemon=True)
+    thread.name = "metrics"
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+        write(file)
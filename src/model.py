@@ -1,82 +1,160 @@
 import os
-import shutil
+import time
+from concurrent.futures import Future
 from pathlib import Path
-from threading import Thread
-from typing import Iterable, List, Optional, Union
-
-from PyPDF3 import PdfFileMerger, PdfFileReader
+from typing import Iterable, Iterator, List, Optional
 
 from src import ROOT
+from src import merge as merger
+from src import plan, scheduler
+from src.records import PackResult, SheetJob
 from src import tools as tools
+from src import workqueue
 
 
 def main(
     drawings: Iterable[Path],
     source: Path,
-    sht_count: int,
+    sht_count: Optional[int] = None,
     dest: Optional[Path] = None,
     output: Optional[Path] = None,
     view: bool = False,
     remove_dwg: bool = False,
-) -> Union[Path, str]:
-    drawings = [Path(drawing.name) for drawing in drawings]
+    queue: Optional[Path] = None,
+) -> PackResult:
+    """Plots and merges <drawings>, starting each as soon as it is found.
+    <sht_count> is the count in the output name, the number of drawings if None."""
+    started = time.perf_counter()
+    result = PackResult()
+    copy_from: Optional[Path] = None
     if dest:
-        create_temp_files(drawings, source, dest)
+        copy_from = source
         remove_dwg = True
     else:
         dest = source
-    if not output:
-        basename = drawings[0].stem  # Name of the first drawing
-        # 5300XXXXXX-VWC-MS-DWG-XXXXX-R?-ALL
-        output = dest / f"{basename[:27]}-01_{sht_count:0>2}{basename[30:]}.pdf"
-    else:
-        output = dest / output.with_suffix(".pdf")
-    process_sheets(drawings, dest)
-    merge_pdf(drawings, dest, output)
-    remove_temp(drawings, dest, remove_dwg)
+    try:
+        result.sheets = process_sheets(
+            (Path(drawing.name) for drawing in drawings), dest, copy_from, queue
+        )
+    except OSError as error:
+        return PackResult.failed(f"Error: {error}")
+    found = [Path(job.drawing.name) for job in result.sheets]
+    output = output_name(found, sht_count or len(found), dest, output)
+    merge_pdf(found, dest, output)
+    remove_temp(found, dest, remove_dwg)
     if view:
         os.startfile(output)
     tools.remove_plot_logs()
-    return output
+    plan.record_timing(False, len(found), started)
+    result.outputs = [output]
+    return result.done()
 
 
-def process_sheets(drawings: Iterable[Path], dest: Path) -> None:
-    threads: list[Thread] = []
-    scr = str(ROOT / "pdfgen11x17model.scr")
-    for drawing in drawings:
-        t = Thread(target=tools.make_pdf, args=(dest / drawing, scr))
-        t.start()
-        threads.append(t)
-    for t in threads:
-        t.join()
+def output_name(
+    drawings: List[Path], sht_count: int, dest: Path, output: Optional[Path]
+) -> Path:
+    """Name of the combined PDF.
+    >>> drawings = [Path("5300221014-VWC-MS-DWG-00200-01-R0.dwg")]
+    >>> str(output_name(drawings, 3, Path(), None))
+    '5300221014-VWC-MS-DWG-00200-01_03-R0.pdf'
+    """
+    if output:
+        return dest / output.with_suffix(".pdf")
+    basename = drawings[0].stem  # Name of the first drawing
+    # 5300XXXXXX-VWC-MS-DWG-XXXXX-R?-ALL
+    return dest / f"{basename[:27]}-01_{sht_count:0>2}{basename[30:]}.pdf"
 
 
-def create_temp_files(files: List[Path], source: Path, dest: Path) -> None:
-    for file in files:
-        shutil.copy(source / file.with_suffix(".dwg").name, dest)
+def process_sheets(
+    drawings: Iterable[Path],
+    dest: Path,
+    source: Optional[Path] = None,
+    queue: Optional[Path] = None,
+) -> list[SheetJob]:
+    """Plots each drawing as soon as it is taken from <drawings>, on the workers
+    reading <queue> if given. The drawings are copied from <source> to <dest>
+    first if <source> is given. Returns a sheet for each drawing.
+
+    A copy that fails stops the run: the copies and PDFs made are removed and
+    the error is raised once the sheets already started are done."""
+    scr = ROOT / "pdfgen11x17model.scr"
+    jobs: list[SheetJob] = []
+    copies: list["Future[Path]"] = []
+
+    def discovered() -> Iterator[tuple[SheetJob, Optional["Future[Path]"]]]:
+        for drawing in drawings:
+            jobs.append(SheetJob(dest / drawing, scr, "Model"))
+            copy = None if source is None else start_copy(drawing, source, dest)
+            if copy is not None:
+                copies.append(copy)
+            yield jobs[-1], copy
+
+    def staged() -> Iterator[tuple[Path, Path]]:
+        for job, copy in discovered():
+            if copy is not None:
+                copy.result()  # The workers read the drawing from <dest>.
+            yield job.drawing, job.scr
+
+    try:
+        if queue:
+            errors = workqueue.plot(queue, staged())
+            for job in jobs:
+                job.collected(errors.get(job.pdf))
+        else:
+            plotted = {
+                scheduler.submit(plot, job, copy): job for job, copy in discovered()
+            }
+            scheduler.wait(plotted)
+            for future, job in plotted.items():
+                job.queue_wait = future.queue_wait
+        for copy in copies:
+            copy.result()
+    except OSError:
+        for job in jobs:
+            tools.release_file(job.pdf)
+            if source is not None:
+                tools.release_file(job.drawing)
+        raise
+    return jobs
+
+
+def plot(job: SheetJob, copy: Optional["Future[Path]"] = None) -> None:
+    """Plots the drawing once its copy (if any) has landed. The PDF is claimed
+    until remove_temp releases it, another run may plot the same sheet here."""
+    with job.running():
+        if copy is not None:
+            copy.result()
+        tools.claim_file(job.pdf)
+        job.usage = tools.make_pdf(job.drawing, job.scr)
+
+
+def start_copy(drawing: Path, source: Path, dest: Path) -> "Future[Path]":
+    """Starts copying the drawing to <dest> without waiting for it to finish.
+    The copy is claimed until remove_temp releases it, see tools.claim_file."""
+    name = drawing.with_suffix(".dwg").name
+    tools.claim_file(dest / name)
+    return tools.COPY_POOL.submit(tools.copy_drawing, source / name, dest / name)
 
 
 def merge_pdf(
     files: List[Path], source: Path, output: Path
 ) -> None:  # pragma: no cover
-    merged = PdfFileMerger(strict=False)
+    sheets: list[merger.Sheet] = []
     for pdf in files:
         title = str(pdf)
         pdf = pdf.with_name(pdf.stem + "-Model.pdf")
-        try:
-            merged.append(PdfFileReader(str(source / pdf)), title)
-        except FileNotFoundError:
+        if (source / pdf).exists():
+            sheets.append((source / pdf, title))
+        else:
             print(f"Could not find {pdf}. File skipped")
-    merged.write(str(output.with_suffix(".pdf")))
+    merger.merge(sheets, output.with_suffix(".pdf"))
 
 
 def remove_temp(files: List[Path], source: Path, remove_dwg: bool) -> None:
     for file in files:
         pdf = source / f"{file.stem}-Model.pdf"
-        try:
-            pdf.unlink()
-        except FileNotFoundError:
+        if not pdf.exists():
             print(f"Could not find {pdf} to delete.")
+        tools.release_file(pdf)
         if remove_dwg:
-            dwg = source / file.name
-            dwg.unlink()
+            tools.release_file(source / file.name)
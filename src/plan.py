@@ -0,0 +1,130 @@
+import json
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Optional
+
+from src import CACHE
+
+TIMINGS = CACHE / "timings.json"
+# Weight given to the latest run when updating the average seconds per sheet.
+SMOOTHING = 0.3
+
+
+@dataclass
+class PlannedDrawing:
+    drawing: Path
+    output: Optional[Path]
+    # Layout names from the cache, None if the drawing has not been seen before.
+    layouts: Optional[list[str]] = None
+
+    @property
+    def sheets(self) -> int:
+        """Sheets this drawing adds to the pack, unknown layouts count as one."""
+        return 1 if self.layouts is None else len(self.layouts)
+
+
+@dataclass
+class Plan:
+    match: str
+    source: Path
+    dest: Path
+    paper: bool
+    drawings: list[PlannedDrawing] = field(default_factory=list)
+    # Seconds per sheet from previous runs, None if there are none.
+    sheet_time: Optional[float] = None
+
+    @property
+    def sheets(self) -> int:
+        return sum(drawing.sheets for drawing in self.drawings)
+
+    @property
+    def exact(self) -> bool:
+        """True if every layout list came from the cache."""
+        return all(drawing.layouts is not None for drawing in self.drawings)
+
+    @property
+    def estimate(self) -> Optional[float]:
+        if self.sheet_time is None:
+            return None
+        return self.sheet_time * self.sheets
+
+    @property
+    def outputs(self) -> list[Path]:
+        """The combined PDFs the run will create."""
+        return sorted(
+            {drawing.output for drawing in self.drawings if drawing.output is not None}
+        )
+
+    def to_dict(self) -> dict[str, Any]:
+        data = asdict(self)
+        data.update(
+            sheets=self.sheets,
+            exact=self.exact,
+            estimate=self.estimate,
+            outputs=self.outputs,
+        )
+        return data
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), default=str, indent=2)
+
+    def table(self) -> str:
+        """Plain text summary of the plan, one row per drawing."""
+        rows = [("Drawing", "Sheets", "Output")]
+        for drawing in self.drawings:
+            sheets = "?" if drawing.layouts is None else str(drawing.sheets)
+            output = "" if drawing.output is None else drawing.output.name
+            rows.append((drawing.drawing.name, sheets, output))
+        widths = [max(len(row[idx]) for row in rows) for idx in range(3)]
+        lines = ["  ".join(col.ljust(w) for col, w in zip(row, widths)) for row in rows]
+        total = f"{self.sheets}" if self.exact else f"~{self.sheets}"
+        lines.append(f"{len(self.drawings)} drawings, {total} sheets")
+        if self.estimate is None:
+            lines.append("Estimated time: unknown (no previous runs)")
+        else:
+            lines.append(f"Estimated time: {format_seconds(self.estimate)}")
+        return "\n".join(lines)
+
+
+def format_seconds(seconds: float) -> str:
+    """Short human readable duration.
+    >>> format_seconds(75)
+    '1m 15s'
+    >>> format_seconds(3.2)
+    '3s'
+    """
+    minutes, secs = divmod(round(seconds), 60)
+    return f"{minutes}m {secs}s" if minutes else f"{secs}s"
+
+
+def load_timings() -> dict[str, float]:
+    try:
+        return json.loads(TIMINGS.read_text())
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def sheet_time(paper: bool) -> Optional[float]:
+    """Average seconds per sheet from previous runs of the same kind."""
+    return load_timings().get("paper" if paper else "model")
+
+
+def record_timing(paper: bool, sheets: int, started: float) -> None:
+    """Folds a finished run (started at time.perf_counter() <started>) into the
+    average seconds per sheet."""
+    if sheets < 1:
+        return
+    sample = (time.perf_counter() - started) / sheets
+    timings = load_timings()
+    kind = "paper" if paper else "model"
+    previous = timings.get(kind)
+    timings[kind] = (
+        sample if previous is None else previous + SMOOTHING * (sample - previous)
+    )
+    TIMINGS.parent.mkdir(parents=True, exist_ok=True)
+    temp = TIMINGS.with_name(f".timings.{os.getpid()}-{threading.get_ident()}")
+    temp.write_text(json.dumps(timings))
+    temp.replace(TIMINGS)
@@ -0,0 +1,105 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Optional
+
+from src import archive
+
+# Drawings checked at once, reading a header waits on the share not the CPU.
+CHECKERS = 8
+# DWG version strings accoreconsole (AutoCAD 2019) can open.
+VERSIONS = {
+    "AC1009": "AutoCAD R11/R12",
+    "AC1012": "AutoCAD R13",
+    "AC1014": "AutoCAD R14",
+    "AC1015": "AutoCAD 2000",
+    "AC1018": "AutoCAD 2004",
+    "AC1021": "AutoCAD 2007",
+    "AC1024": "AutoCAD 2010",
+    "AC1027": "AutoCAD 2013",
+    "AC1032": "AutoCAD 2018",
+}
+# Versions with the R2004 file header, whose section map address shows whether
+# the file was cut short.
+R2004 = {"AC1018", "AC1024", "AC1027", "AC1032"}
+# Every DWG starts with a header at least this long.
+HEADER_SIZE = 0x100
+# Where the encrypted R2004 file header starts, and its length.
+R2004_HEADER = slice(0x80, 0xEC)
+R2004_MAGIC = b"AcFssFcAJMB\0"
+# Files AutoCAD keeps next to a drawing while it is open.
+LOCK_SUFFIXES = (".dwl", ".dwl2")
+
+
+@dataclass
+class Checked:
+    """Result of checking a drawing before it is plotted."""
+
+    drawing: Path
+    version: Optional[str] = None  # AutoCAD release that saved it.
+    problem: Optional[str] = None  # Why it can't be plotted, None if it can.
+
+    @property
+    def ok(self) -> bool:
+        return self.problem is None
+
+
+def decrypt_header(data: bytes) -> bytes:
+    """Undoes the XOR stream AutoCAD applies to the R2004 file header.
+    >>> decrypt_header(decrypt_header(b"AcFssFcAJMB"))
+    b'AcFssFcAJMB'
+    """
+    seed = 1
+    out = bytearray(len(data))
+    for idx, byte in enumerate(data):
+        seed = (seed * 0x343FD + 0x269EC3) & 0xFFFFFFFF
+        out[idx] = byte ^ ((seed >> 16) & 0xFF)
+    return bytes(out)
+
+
+def section_map_end(header: bytes) -> Optional[int]:
+    """Address the R2004 section map ends at, None if the header is not one."""
+    decrypted = decrypt_header(header[R2004_HEADER])
+    if not decrypted.startswith(R2004_MAGIC):
+        return None
+    return int.from_bytes(decrypted[0x54:0x5C], "little") + 0x100
+
+
+def check(drawing: Path) -> Checked:
+    """Checks <drawing> is a whole DWG that accoreconsole can open and that nobody
+    has open in AutoCAD, from its header and size alone. A drawing in an archive is
+    checked without extracting it."""
+    try:
+        if archive.is_archive(drawing.parent):
+            size = archive.member(drawing).file_size
+            header = archive.read(drawing, HEADER_SIZE)
+        else:
+            size = drawing.stat().st_size
+            with drawing.open("rb") as file:
+                header = file.read(HEADER_SIZE)
+    except OSError as error:
+        return Checked(drawing, problem=f"can't be read ({error.strerror})")
+    locks = [drawing.with_suffix(suffix) for suffix in LOCK_SUFFIXES]
+    if any(lock.exists() for lock in locks):
+        return Checked(drawing, problem="open in AutoCAD (.dwl lock file)")
+    if size == 0:
+        return Checked(drawing, problem="empty file")
+    code = header[:6].decode("ascii", "replace")
+    if not code.startswith("AC"):
+        return Checked(drawing, problem="not a DWG file")
+    if code not in VERSIONS:
+        return Checked(drawing, problem=f"unsupported DWG version {code}")
+    result = Checked(drawing, VERSIONS[code])
+    if size < HEADER_SIZE:
+        result.problem = "truncated, shorter than its header"
+    elif code in R2004:
+        end = section_map_end(header)
+        if end is not None and end > size:
+            result.problem = f"truncated, {size} bytes of at least {end}"
+    return result
+
+
+def check_all(drawings: Iterable[Path], workers: int = CHECKERS) -> list[Checked]:
+    """Checks every drawing at once, the results are in the same order."""
+    with ThreadPoolExecutor(workers, thread_name_prefix="preflight") as pool:
+        return list(pool.map(check, drawings))
@@ -0,0 +1,202 @@
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Iterable, Iterator, Optional
+
+MB = 1024 * 1024
+
+
+@dataclass(slots=True)
+class Usage:
+    """Resources used by accoreconsole, None for anything that wasn't measured."""
+
+    cpu: Optional[float] = None  # User plus system seconds.
+    peak_rss: Optional[int] = None  # Most memory in use at once, in bytes.
+    read_bytes: Optional[int] = None
+    write_bytes: Optional[int] = None
+
+    @classmethod
+    def total(cls, usages: Iterable["Usage"]) -> "Usage":
+        """CPU time and I/O summed, the peak is that of the hungriest process.
+        >>> str(Usage.total([Usage(1.5, 100 * MB), Usage(2, 300 * MB, 5 * MB)]))
+        'CPU 3.5s, peak memory 300 MB, read 5 MB'
+        """
+        usages = list(usages)
+
+        def values(name: str) -> list[Any]:
+            return [getattr(u, name) for u in usages if getattr(u, name) is not None]
+
+        def added(name: str) -> Any:
+            return sum(values(name)) if values(name) else None
+
+        peaks = values("peak_rss")
+        return cls(
+            cpu=added("cpu"),
+            peak_rss=max(peaks) if peaks else None,
+            read_bytes=added("read_bytes"),
+            write_bytes=added("write_bytes"),
+        )
+
+    def __str__(self) -> str:
+        parts = []
+        if self.cpu is not None:
+            parts.append(f"CPU {self.cpu:.1f}s")
+        if self.peak_rss is not None:
+            parts.append(f"peak memory {self.peak_rss / MB:.0f} MB")
+        if self.read_bytes is not None:
+            parts.append(f"read {self.read_bytes / MB:.0f} MB")
+        if self.write_bytes is not None:
+            parts.append(f"written {self.write_bytes / MB:.0f} MB")
+        return ", ".join(parts)
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+
+@dataclass(slots=True)
+class SheetJob:
+    """One sheet of a pack, from its plot script to its PDF."""
+
+    drawing: Path  # The drawing plotted.
+    scr: Path  # Its plot script.
+    sheet: str  # Layout plotted, "Model" for modelspace.
+    status: str = "queued"  # queued, running, done or failed
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    error: Optional[str] = None
+    usage: Optional[Usage] = None  # None if not plotted here, or shared by a plot.
+    queue_wait: Optional[float] = None  # Seconds it waited for a plot worker.
+
+    @property
+    def pdf(self) -> Path:
+        """Where accoreconsole writes the sheet."""
+        return self.drawing.with_name(f"{self.drawing.stem}-{self.sheet}.pdf")
+
+    @property
+    def elapsed(self) -> Optional[float]:
+        if self.started is None or self.finished is None:
+            return None
+        return self.finished - self.started
+
+    @contextmanager
+    def running(self) -> Iterator[None]:
+        """Records the status and times of the plot done inside the block. It failed
+        if the block raises or no PDF was written."""
+        self.status = "running"
+        self.started = time.time()
+        try:
+            yield
+        except Exception as error:
+            self.status = "failed"
+            self.error = str(error)
+            raise
+        finally:
+            self.finished = time.time()
+        self.collected("No PDF was written")
+
+    def collected(self, error: Optional[str] = None) -> None:
+        """Sets the status of a sheet plotted by another process from its PDF.
+        <error> is why it wasn't plotted, if the other process said."""
+        self.status = "done" if self.pdf.exists() else "failed"
+        if self.status == "failed":
+            self.error = error or "No PDF was returned"
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "drawing": str(self.drawing),
+            "scr": str(self.scr),
+            "sheet": self.sheet,
+            "status": self.status,
+            "started": self.started,
+            "finished": self.finished,
+            "error": self.error,
+            "usage": None if self.usage is None else self.usage.to_dict(),
+            "queue_wait": self.queue_wait,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "SheetJob":
+        usage = data.get("usage")
+        return cls(
+            **dict(
+                data,
+                drawing=Path(data["drawing"]),
+                scr=Path(data["scr"]),
+                usage=None if usage is None else Usage(**usage),
+            )
+        )
+
+
+@dataclass(slots=True)
+class PackResult:
+    """What a pack made: its PDFs and sheets, or the error that stopped it.
+    str() gives the text app.main used to return, the PDFs one per line, followed
+    by the drawings skipped and the sheets that failed."""
+
+    outputs: list[Path] = field(default_factory=list)
+    sheets: list[SheetJob] = field(default_factory=list)
+    error: Optional[str] = None
+    started: float = field(default_factory=time.time)
+    finished: Optional[float] = None
+    skipped: dict[str, str] = field(default_factory=dict)  # Drawing name: problem.
+
+    @classmethod
+    def failed(cls, error: str) -> "PackResult":
+        started = time.time()
+        return cls(error=error, started=started, finished=started)
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    @property
+    def elapsed(self) -> Optional[float]:
+        if self.finished is None:
+            return None
+        return self.finished - self.started
+
+    @property
+    def usage(self) -> Optional[Usage]:
+        """Resources used by the sheets plotted for this pack, None if none were."""
+        usages = [sheet.usage for sheet in self.sheets if sheet.usage is not None]
+        return Usage.total(usages) if usages else None
+
+    def done(self) -> "PackResult":
+        self.finished = time.time()
+        return self
+
+    def __str__(self) -> str:
+        if self.error is not None:
+            return self.error
+        lines = [str(output) for output in self.outputs]
+        lines += [
+            f"Skipped {name}: {problem}" for name, problem in self.skipped.items()
+        ]
+        lines += [
+            f"Failed {sheet.pdf.name}: {sheet.error}"
+            for sheet in self.sheets
+            if sheet.status == "failed"
+        ]
+        return "\n".join(lines)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "outputs": [str(output) for output in self.outputs],
+            "sheets": [sheet.to_dict() for sheet in self.sheets],
+            "error": self.error,
+            "started": self.started,
+            "finished": self.finished,
+            "skipped": self.skipped,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "PackResult":
+        return cls(
+            outputs=[Path(output) for output in data["outputs"]],
+            sheets=[SheetJob.from_dict(sheet) for sheet in data["sheets"]],
+            error=data["error"],
+            started=data["started"],
+            finished=data["finished"],
+            skipped=data.get("skipped", {}),
+        )
@@ -0,0 +1,160 @@
+import os
+import threading
+import time
+import traceback
+from collections import deque
+from concurrent.futures import Future
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+# Number of accoreconsole processes allowed to run at once across every pack.
+WORKERS = os.cpu_count() or 4
+
+# Priority classes, interactive sheets are started before queued batch sheets.
+INTERACTIVE = "interactive"
+BATCH = "batch"
+PRIORITIES = (INTERACTIVE, BATCH)
+# While both are waiting, every this many sheets started one is a batch sheet.
+BATCH_EVERY = 4
+
+# Priority of the sheets submitted from the current thread, see priority().
+PRIORITY: ContextVar[str] = ContextVar("priority", default=INTERACTIVE)
+
+
+@contextmanager
+def priority(level: str) -> Iterator[None]:
+    """Submits the sheets plotted inside the block with the <level> priority."""
+    if level not in PRIORITIES:
+        raise ValueError(f"Unknown priority '{level}'")
+    token = PRIORITY.set(level)
+    try:
+        yield
+    finally:
+        PRIORITY.reset(token)
+
+
+class PlotFuture(Future):  # type: ignore[type-arg]
+    """Future that also records how long the job waited for a worker."""
+
+    def __init__(self, priority: str) -> None:
+        super().__init__()
+        self.priority = priority
+        self.submitted = time.perf_counter()
+        self.started: Optional[float] = None
+
+    @property
+    def queue_wait(self) -> Optional[float]:
+        if self.started is None:
+            return None
+        return self.started - self.submitted
+
+
+Job = tuple[PlotFuture, Callable[..., Any], tuple[Any, ...]]
+
+
+class Scheduler:
+    """Fixed set of worker threads shared by every pack in the process."""
+
+    def __init__(self, workers: int = WORKERS) -> None:
+        self.workers = workers
+        self.queues: dict[str, deque[Job]] = {level: deque() for level in PRIORITIES}
+        self.condition = threading.Condition()
+        self.threads: list[threading.Thread] = []
+        # Interactive sheets started in a row while batch sheets were waiting.
+        self.since_batch = 0
+        # Jobs being run now and finished so far, read by the autotuner.
+        self.running = 0
+        self.completed = 0
+
+    def submit(
+        self, fn: Callable[..., Any], *args: Any, priority: Optional[str] = None
+    ) -> PlotFuture:
+        future = PlotFuture(priority or PRIORITY.get())
+        with self.condition:
+            self.queues[future.priority].append((future, fn, args))
+            self.start_workers()
+            self.condition.notify()
+        return future
+
+    def start_workers(self) -> None:
+        """Worker threads are only started once there is work for them."""
+        while len(self.threads) < self.workers:
+            thread = threading.Thread(target=self.run, daemon=True)
+            thread.name = f"plot-{len(self.threads)}"
+            thread.start()
+            self.threads.append(thread)
+
+    def next_job(self) -> Job:
+        with self.condition:
+            while not self.queued or self.running >= self.workers:
+                self.condition.wait()
+            self.running += 1
+            interactive, batch = self.queues[INTERACTIVE], self.queues[BATCH]
+            if interactive and (not batch or self.since_batch < BATCH_EVERY - 1):
+                self.since_batch = self.since_batch + 1 if batch else 0
+                return interactive.popleft()
+            self.since_batch = 0
+            return batch.popleft()
+
+    def run(self) -> None:
+        while True:
+            future, fn, args = self.next_job()
+            if not future.set_running_or_notify_cancel():
+                self.finished(completed=False)
+                continue
+            future.started = time.perf_counter()
+            try:
+                future.set_result(fn(*args))
+            except BaseException as error:
+                future.set_exception(error)
+            finally:
+                self.finished()
+
+    def finished(self, completed: bool = True) -> None:
+        """Frees the worker's slot for the next job."""
+        with self.condition:
+            self.running -= 1
+            self.completed += completed
+            self.condition.notify()
+
+    @property
+    def queued(self) -> int:
+        return sum(len(jobs) for jobs in self.queues.values())
+
+
+_scheduler: Optional[Scheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> Scheduler:
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = Scheduler()
+        return _scheduler
+
+
+def configure(workers: int) -> Scheduler:
+    """Sets the number of plot workers. If it is lowered the jobs already running
+    finish, the workers over the limit then wait until it is raised again."""
+    scheduler = get_scheduler()
+    with scheduler.condition:
+        scheduler.workers = workers
+        if scheduler.threads:
+            scheduler.start_workers()
+        scheduler.condition.notify_all()
+    return scheduler
+
+
+def submit(fn: Callable[..., Any], *args: Any) -> PlotFuture:
+    """Runs fn(*args) on the shared plot workers at the current priority."""
+    return get_scheduler().submit(fn, *args)
+
+
+def wait(futures: Iterable["Future[Any]"]) -> None:
+    """Waits for every job, reporting failures the way a crashed thread would."""
+    for future in futures:
+        error = future.exception()
+        if error is not None:
+            traceback.print_exception(type(error), error, error.__traceback__)
@@ -0,0 +1,79 @@
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+from src import scheduler, tools
+from src.client import HOST, PORT
+from src.jobs import PACKS, JobQueue
+
+
+class Handler(BaseHTTPRequestHandler):
+    """POST /jobs to queue a pack, GET /jobs or /jobs/<id> for their status."""
+
+    server: "PackServer"
+
+    def do_GET(self) -> None:
+        parts = self.path.strip("/").split("/")
+        if parts == ["jobs"]:
+            self.reply(200, [job.to_dict() for job in self.server.jobs.all()])
+        elif len(parts) == 2 and parts[0] == "jobs":
+            job = self.server.jobs.get(parts[1])
+            if job is None:
+                self.reply(404, {"error": f"No job {parts[1]}"})
+            else:
+                self.reply(200, job.to_dict())
+        else:
+            self.reply(404, {"error": f"Unknown path {self.path}"})
+
+    def do_POST(self) -> None:
+        if self.path.strip("/") != "jobs":
+            self.reply(404, {"error": f"Unknown path {self.path}"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            job = self.server.jobs.submit(json.loads(self.rfile.read(length)))
+        except (ValueError, TypeError) as error:
+            self.reply(400, {"error": str(error)})
+            return
+        self.reply(202, job.to_dict())
+
+    def reply(self, code: int, data: Any) -> None:
+        body = json.dumps(data).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        return  # Job status is available from /jobs, skip the request log.
+
+
+class PackServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host: str = HOST, port: int = PORT, packs: int = PACKS) -> None:
+        super().__init__((host, port), Handler)
+        self.jobs = JobQueue(packs)
+
+
+def warm_up() -> None:
+    """Does the slow one off lookups now instead of on the first job."""
+    tools.cache_listings(True)
+    try:
+        tools.get_accore()
+    except FileNotFoundError:
+        print("AutoCAD was not found, plots will fail until it is installed.")
+
+
+def serve(
+    host: str = HOST,
+    port: int = PORT,
+    workers: int = scheduler.WORKERS,
+    packs: int = PACKS,
+) -> None:
+    scheduler.configure(workers)
+    warm_up()
+    with PackServer(host, port, packs) as server:
+        print(f"Serving on http://{host}:{server.server_address[1]}")
+        server.serve_forever()
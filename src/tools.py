@@ -1,10 +1,20 @@
+import fnmatch
+import functools
+import hashlib
 import itertools
+import os
 import re
-import subprocess
-from pathlib import Path
-from typing import Iterable, Optional
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path, PurePosixPath, PureWindowsPath
+from typing import Any, BinaryIO, Iterable, Iterator, Optional
 
-from src import CWD
+from src import CWD, archive, deps, history, metrics, usage
+from src.records import Usage
 
 # Grab the drawing "number" and revision
 # 5300600002-VWC-MS-SPC-00001-00-R34
@@ -12,6 +22,43 @@ from src import CWD
 # ?: = non-caputuring group, thrown away
 # rev: 34
 DWG = re.compile(r"(?P<base>\w{10}-\w{3}-\w{2}-\w{3}-\w{5}.*)(?:-R)(?P<rev>\w+)")
+# DWG for a newline separated listing, one match per drawing line.
+# sheet: whatever follows the drawing number in the base, e.g. -01
+REVISIONS = re.compile(
+    r"^(?P<name>.*?(?P<base>\w{10}-\w{3}-\w{2}-\w{3}-\w{5}(?P<sheet>.*))"
+    r"-R(?P<rev>\w+).*)$",
+    re.MULTILINE,
+)
+
+# Folder listings kept between calls by long running processes, see cache_listings.
+LISTINGS: Optional[dict[Path, tuple[int, list[Path]]]] = None
+
+# Sheets plotted by long running processes, by drawing and plot key, see keep_sheets.
+SHEETS: Optional[Path] = None
+# Where identical plots running at the same time find each other, see make_pdf.
+# Next to the drawing plotted unless set, so runs plotting in the same folder share
+# them. Runs that copy to different folders share them through a folder they can
+# all reach.
+INFLIGHT = os.environ.get("DRAWING_PACK_INFLIGHT")
+# Seconds between touches of the lock files this process holds, see touched.
+HEARTBEAT = 30.0
+# Lock files untouched for this long are from a run that died and are taken over.
+STALE_LOCK = 5 * 60
+# Threads of this process waiting for or holding each plot key, see inflight.
+_inflight: dict[str, tuple[threading.Lock, int]] = {}
+_inflight_lock = threading.Lock()
+_held: set[Path] = set()
+_held_lock = threading.Lock()
+_heartbeat: Optional[threading.Thread] = None
+
+# Copies are I/O bound, a few at a time is enough to keep the share busy.
+COPY_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="copy")
+# Runs in this process using each shared file, see claim_file.
+_claims: dict[Path, int] = {}
+_claims_lock = threading.Lock()
+# Runs staging each folder and the support files claimed there, see staged.
+_staged: dict[Path, tuple[int, list[Path]]] = {}
+_staged_lock = threading.Lock()
 
 
 def process_match(match: str) -> str:
@@ -43,7 +90,7 @@ WindowsPath('5300221014-VWC-MS-DWG-00205-05-R0.dwg'), WindowsPath('5300221014-VW
     >>> list(get_files('*245*R0*.dwg', Path('Q:/cad_drawings/contract/5300221014 SPP3 Caustic Ph 2')))
     []
     """
-    files = source.glob(match)
+    files = iter(glob(match, source))
     try:
         first = next(files)
     except StopIteration:
@@ -58,7 +105,44 @@ def get_file_count(match: str, source: Path) -> int:
     >>> get_file_count('*245*R0*.dwg', Path('Q:/cad_drawings/contract/5300221014 SPP3 Caustic Ph 2'))
     0
     """
-    return sum(1 for _ in source.glob(match))
+    return sum(1 for _ in glob(match, source))
+
+
+def cache_listings(enabled: bool = True) -> None:
+    """Keep folder listings in memory, reread only when the folder changes."""
+    global LISTINGS
+    LISTINGS = {} if enabled else None
+
+
+def keep_sheets(folder: Optional[Path]) -> None:
+    """Keep a copy of every sheet plotted in <folder>, reused by make_pdf while
+    its plot key is unchanged and until forget_sheets drops its drawing. None stops
+    keeping them."""
+    global SHEETS
+    SHEETS = folder
+
+
+def forget_sheets(names: Iterable[str]) -> None:
+    """Drops the kept sheets of the drawings <names>, so they are plotted again."""
+    if SHEETS is None:
+        return
+    for name in names:
+        shutil.rmtree(SHEETS / name, ignore_errors=True)
+
+
+def glob(match: str, source: Path) -> Iterable[Path]:
+    """source.glob(match), from the cached listing of <source> if enabled.
+    A zip <source> is matched against the names of the files in it."""
+    if archive.is_archive(source):
+        return archive.glob(match, source)
+    if LISTINGS is None:
+        return source.glob(match)
+    mtime = source.stat().st_mtime_ns
+    cached = LISTINGS.get(source)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, [file for file in source.iterdir() if file.is_file()])
+        LISTINGS[source] = cached
+    return [file for file in cached[1] if fnmatch.fnmatch(file.name, match)]
 
 
 def get_latest(files: Iterable[Path]) -> Iterable[Path]:
@@ -88,13 +172,256 @@ def get_latest(files: Iterable[Path]) -> Iterable[Path]:
         yield Path(f"{k}-R{v[0]}").with_suffix(v[1])
 
 
-def make_pdf(source: Path, scr: Path) -> None:
-    """Creates the layout pdf of based on the sheet listed in the SRC file."""
-    exe = get_accore()
+def fingerprint(file: Path) -> str:
+    """Identifies a drawing by name, size and modified time so copies match.
+    A drawing in an archive matches the copy extract_drawing makes of it."""
+    if archive.is_archive(file.parent):
+        info = archive.member(file)
+        key = f"{file.name}|{info.file_size}|{archive.mtime_ns(info)}"
+        return hashlib.sha1(key.encode()).hexdigest()
+    stat = file.stat()
+    key = f"{file.name}|{stat.st_size}|{stat.st_mtime_ns}"
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+@dataclass
+class Revisions:
+    """Drawing names split into columns, row i of each list is names[i].
+    Names that are not drawings (see DWG) are left out."""
+
+    names: tuple[str, ...] = ()
+    bases: tuple[str, ...] = ()  # Drawing number and sheet.
+    sheets: tuple[str, ...] = ()
+    revs: tuple[str, ...] = ()
+    numeric: list[bool] = field(default_factory=list)  # Numeric beats letter revs.
+    values: list[int] = field(default_factory=list)  # Numeric revs as numbers.
+
+    def sorted_rows(self, reverse: bool = False) -> list[tuple[Any, ...]]:
+        """(base, numeric, value, rev, row) sorted by base then revision."""
+        rows = zip(
+            self.bases, self.numeric, self.values, self.revs, range(len(self.names))
+        )
+        return sorted(rows, reverse=reverse)
+
+    def latest(self) -> list[str]:
+        """Name of the latest revision of each base, same rules as get_latest."""
+        # Later rows overwrite earlier ones so each base keeps its last (highest).
+        best = {row[0]: row[-1] for row in self.sorted_rows()}
+        return [self.names[idx] for idx in best.values()]
+
+    def ranks(self) -> list[int]:
+        """Rank of every row within its base, 1 is the latest revision."""
+        ranks = [0] * len(self.names)
+        for _, group in itertools.groupby(
+            self.sorted_rows(True), key=lambda row: row[0]
+        ):
+            for rank, row in enumerate(group, 1):
+                ranks[row[-1]] = rank
+        return ranks
+
+
+def parse_revisions(names: Iterable[str]) -> Revisions:
+    """Parses a whole listing of file names in one pass of the regex.
+    >>> revs = parse_revisions(["5300221014-VWC-MS-DWG-00205-01-RA.dwg",
+    ...                         "5300221014-VWC-MS-DWG-00205-01-R0.dwg", "notes.txt"])
+    >>> revs.latest()
+    ['5300221014-VWC-MS-DWG-00205-01-R0.dwg']
+    >>> revs.ranks()
+    [2, 1]
+    """
+    found = REVISIONS.findall("\n".join(names))
+    if not found:
+        return Revisions()
+    names, bases, sheets, revs = zip(*found)
+    numeric = [rev.isdigit() for rev in revs]
+    values = [int(rev) if digit else 0 for rev, digit in zip(revs, numeric)]
+    return Revisions(names, bases, sheets, revs, numeric, values)
+
+
+def make_pdf(source: Path, scr: Path) -> Optional[Usage]:
+    """Creates the layout pdf of based on the sheet listed in the SRC file.
+
+    Identical requests running at the same time, in this or another process, are
+    plotted once. The others wait and copy the first one's PDF, which it leaves
+    in the in-flight folder (see INFLIGHT) until the last of them has it. One that
+    only starts waiting after the plot finished reuses its PDF while that run still
+    claims it, instead of plotting over it. A sheet kept from an earlier build (see
+    keep_sheets) is copied instead of plotted.
+    Returns the resources accoreconsole used, None if the PDF was copied."""
     source = source.with_suffix(".dwg")
-    subprocess.run(f'"{exe}" /i "{source}" /s "{scr}" /l "en-US"')
+    try:
+        key = plot_key(source, scr)
+    except OSError:
+        return run_accore(source, scr)
+    kept = SHEETS / source.name if SHEETS is not None else None
+    if kept is not None and (kept / f"{key}.pdf").exists():
+        copy_drawing(kept / f"{key}.pdf", pdf_name(source, scr))
+        metrics.SHEETS_KEPT.inc()
+        return None
+    folder = Path(INFLIGHT) if INFLIGHT else source.parent
+    shared = folder / f".{key}.pdf"
+    waiting = folder / f".{key}.{os.getpid()}-{threading.get_ident()}.wait"
+    waiting.touch()
+    try:
+        with inflight(key, folder):
+            waiting.unlink()
+            if shared.exists():
+                copy_drawing(shared, pdf_name(source, scr))
+                if not any(folder.glob(f".{key}.*.wait")):
+                    shared.unlink()
+                metrics.SHEETS_SHARED.inc()
+                return None
+            pdf = pdf_name(source, scr)
+            # Plotted by a run that finished before this one started waiting.
+            if claimed_elsewhere(pdf) and modified_since(pdf, source):
+                metrics.SHEETS_SHARED.inc()
+                return None
+            used = run_accore(source, scr)
+            deps.collect(source, scr, fingerprint(source))
+            if pdf.exists() and any(folder.glob(f".{key}.*.wait")):
+                copy_drawing(pdf, shared)
+            if pdf.exists() and kept is not None:
+                kept.mkdir(parents=True, exist_ok=True)
+                # Keyed again, the plot may have found new xrefs.
+                copy_drawing(pdf, kept / f"{plot_key(source, scr)}.pdf")
+            return used
+    finally:
+        waiting.unlink(missing_ok=True)
+
+
+def run_accore(source: Path, scr: Path) -> Optional[Usage]:
+    """Plots with accoreconsole and adds how it went to the plot history and the
+    metrics."""
+    exe = get_accore()
+    started = time.perf_counter()
+    with metrics.ACTIVE_CONSOLES.tracking():
+        process, used = usage.run(f'"{exe}" /i "{source}" /s "{scr}" /l "en-US"')
+    duration = time.perf_counter() - started
+    metrics.PLOT_SECONDS.observe(duration)
+    try:
+        pdf: Optional[Path] = pdf_name(source, scr)
+    except (OSError, IndexError):
+        pdf = None
+    if pdf is not None and pdf.exists():
+        metrics.SHEETS_PLOTTED.inc()
+    else:
+        metrics.SHEETS_FAILED.inc()
+    match = DWG.match(source.stem)
+    history.record(
+        drawing=match["base"] if match else source.stem,
+        sheet=pdf.stem[len(source.stem) + 1 :] if pdf else script_path(scr).stem,
+        duration=duration,
+        status=process.returncode,
+        dwg_size=file_size(source),
+        pdf_size=file_size(pdf) if pdf else None,
+    )
+    return used
+
+
+def file_size(file: Path) -> Optional[int]:
+    try:
+        return file.stat().st_size
+    except OSError:
+        return None
+
+
+def plot_key(source: Path, scr: Path) -> str:
+    """Drawing fingerprint plus a digest of the plot script (which has the layout)
+    and of the xrefs and images the drawing used when it was last plotted, so a
+    changed xref replots only the drawings that use it."""
+    script = hashlib.sha1(script_path(scr).read_bytes()).hexdigest()
+    drawing = fingerprint(source.with_suffix(".dwg"))
+    names = deps.load(drawing)
+    if not names:
+        return f"{drawing}-{script[:16]}"
+    return f"{drawing}-{script[:16]}-{deps.digest(names)[:16]}"
+
+
+@contextmanager
+def inflight(key: str, folder: Path) -> Iterator[None]:
+    """Only one thread, and one process through a lock file in <folder>, holds
+    <key> at a time."""
+    with _inflight_lock:
+        lock, users = _inflight.get(key, (threading.Lock(), 0))
+        _inflight[key] = (lock, users + 1)
+    try:
+        with lock, locked(folder / f".{key}.lock"):
+            yield
+    finally:
+        with _inflight_lock:
+            lock, users = _inflight[key]
+            if users == 1:
+                del _inflight[key]
+            else:
+                _inflight[key] = (lock, users - 1)
+
+
+@contextmanager
+def locked(lock_file: Path) -> Iterator[None]:
+    """Holds <lock_file>, which only one process can create at a time. It is
+    touched every HEARTBEAT seconds while held, a lock untouched for STALE_LOCK is
+    from a run that died and is taken over."""
+    while True:
+        try:
+            os.close(os.open(lock_file, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            break
+        except FileExistsError:
+            try:
+                if time.time() - lock_file.stat().st_mtime > STALE_LOCK:
+                    lock_file.unlink()
+            except FileNotFoundError:
+                pass
+            time.sleep(0.2)
+    try:
+        with touched(lock_file):
+            yield
+    finally:
+        lock_file.unlink(missing_ok=True)
+
+
+@contextmanager
+def touched(file: Path) -> Iterator[None]:
+    """Touches <file> every HEARTBEAT seconds inside the block, so a lock or claim
+    held by a long plot doesn't look like it was left by a process that died."""
+    global _heartbeat
+    with _held_lock:
+        _held.add(file)
+        if _heartbeat is None:
+            _heartbeat = threading.Thread(target=heartbeat, daemon=True)
+            _heartbeat.name = "lock-heartbeat"
+            _heartbeat.start()
+    try:
+        yield
+    finally:
+        with _held_lock:
+            _held.discard(file)
+
+
+def heartbeat() -> None:
+    """Touches every file this process holds so none of them goes stale."""
+    while True:
+        time.sleep(HEARTBEAT)
+        with _held_lock:
+            held = list(_held)
+        for file in held:
+            try:
+                os.utime(file)
+            except OSError:
+                continue  # Released since.
 
 
+def script_path(scr: Path) -> Path:
+    """accoreconsole takes scripts with or without the suffix, the file has it."""
+    return Path(scr).with_suffix(".scr")
+
+
+def pdf_name(source: Path, scr: Path) -> Path:
+    """Where accoreconsole writes the PDF of the layout plotted by <scr>."""
+    layout = script_path(scr).read_text().splitlines()[2].strip().replace('"', "")
+    return source.with_name(f"{source.stem}-{layout}.pdf")
+
+
+@functools.lru_cache(maxsize=None)
 def get_accore() -> str:
     base = Path("C:/Program Files/Autodesk")
     temp = ""
@@ -108,3 +435,170 @@ def remove_plot_logs() -> None:
     for plot in (CWD / "plot.log", CWD / "hardcopy.log"):
         if plot.exists():
             plot.unlink()
+
+
+def claim_file(file: Path) -> None:
+    """Records that a run in this process uses <file>, a drawing copy or sheet PDF
+    that other runs in the same folder may share, so release_file in those runs
+    leaves it in place."""
+    with _claims_lock:
+        _claims[file] = _claims.get(file, 0) + 1
+        if _claims[file] == 1:
+            with locked(file.with_name(f".{file.name}.lock")):
+                own_claim(file).parent.mkdir(exist_ok=True)
+                own_claim(file).touch()
+
+
+def release_file(file: Path, delete: bool = True) -> None:
+    """Drops this run's claim on <file> and deletes it, if <delete>, once no run
+    here or in another process claims it. Unclaimed files are simply deleted."""
+    with _claims_lock, locked(file.with_name(f".{file.name}.lock")):
+        count = _claims.pop(file, 0) - 1
+        if count > 0:
+            _claims[file] = count
+            return
+        own_claim(file).unlink(missing_ok=True)
+        try:
+            own_claim(file).parent.rmdir()
+        except FileNotFoundError:
+            pass
+        except OSError:
+            return  # Claimed by another process.
+        if delete:
+            file.unlink(missing_ok=True)
+
+
+def claimed_elsewhere(file: Path) -> bool:
+    """Whether a run besides the caller, here or in another process, claims <file>.
+    The caller is taken to have claimed it too."""
+    with _claims_lock:
+        if _claims.get(file, 0) > 1:
+            return True
+    try:
+        claims = own_claim(file).parent.iterdir()
+        return any(claim.name != str(os.getpid()) for claim in claims)
+    except FileNotFoundError:
+        return False
+
+
+def modified_since(file: Path, source: Path) -> bool:
+    """Whether <file> exists and was written after <source> last changed."""
+    try:
+        return file.stat().st_mtime_ns >= source.stat().st_mtime_ns
+    except OSError:
+        return False
+
+
+def own_claim(file: Path) -> Path:
+    return file.with_name(f".{file.name}.claims") / str(os.getpid())
+
+
+def copy_drawing(source: Path, dest: Path) -> Path:
+    """Copies <source> to <dest> unless an identical copy (size and mtime) exists.
+    The copy is written to a temporary name first so concurrent runs never see a
+    partial file. A <source> in an archive is extracted, see extract_drawing."""
+    if archive.is_archive(source.parent):
+        return extract_drawing(source, dest)
+    stat = source.stat()
+    if dest.exists():
+        current = dest.stat()
+        if (current.st_size, current.st_mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+            return dest
+    partial = dest.with_name(f".{dest.name}.{os.getpid()}-{threading.get_ident()}")
+    try:
+        with metrics.COPY_SECONDS.time(), source.open("rb") as fsrc, partial.open(
+            "wb"
+        ) as fdst:
+            fast_copy(fsrc, fdst, stat.st_size)
+        os.utime(partial, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        partial.replace(dest)
+    finally:
+        if partial.exists():
+            partial.unlink()
+    return dest
+
+
+def extract_drawing(source: Path, dest: Path) -> Path:
+    """Extracts <source>, a drawing in a zip archive, to <dest> with the xrefs and
+    images it used the last time it was plotted. AutoCAD looks for xrefs it can't
+    find at their saved path next to the drawing, so they are put beside it. A
+    drawing that has never been plotted gets the support files in its own folder of
+    the archive that aren't drawings to plot themselves. Raises FileExistsError if
+    the archive has more than one of a file it needs, see archive.unique."""
+    members = archive.members(source.parent)
+    names = deps.load(fingerprint(source))
+    if names is None:
+        folder = PurePosixPath(archive.member(source).filename).parent
+        needed = [
+            name
+            for name, info in members.items()
+            if PurePosixPath(info.filename).parent == folder
+            and name.lower().endswith(archive.SUPPORT_SUFFIXES)
+            and not DWG.search(name)
+        ]
+    else:
+        needed = [PureWindowsPath(name).name for name in names]
+    archive.unique(source.parent, [source.name, *needed])
+    with metrics.COPY_SECONDS.time():
+        for name in needed:
+            if name in members and name != source.name:
+                stage(dest.parent / name)
+                archive.extract(source.parent, name, dest.parent / name)
+        return archive.extract(source.parent, source.name, dest)
+
+
+@contextmanager
+def staged(dest: Path) -> Iterator[None]:
+    """Removes the support files extract_drawing puts in <dest> during the block,
+    once no run here or in another process still uses them. Files that were
+    already in <dest> are left alone."""
+    with _staged_lock:
+        users, files = _staged.get(dest, (0, []))
+        _staged[dest] = (users + 1, files)
+    try:
+        yield
+    finally:
+        with _staged_lock:
+            users, files = _staged.pop(dest)
+            if users > 1:
+                _staged[dest] = (users - 1, files)
+                files = []
+        for file in files:
+            release_file(file)
+
+
+def stage(file: Path) -> None:
+    """Claims a support file about to be extracted for the staged block of its
+    folder, unless it is there already and no other run claims it."""
+    with _staged_lock:
+        if file.parent not in _staged or file in _staged[file.parent][1]:
+            return
+        if file.exists() and not own_claim(file).parent.exists():
+            return
+        claim_file(file)
+        _staged[file.parent][1].append(file)
+
+
+def fast_copy(fsrc: BinaryIO, fdst: BinaryIO, size: int) -> None:
+    """Copies using copy_file_range or sendfile where the OS has them."""
+    for name in ("copy_file_range", "sendfile"):
+        kernel_copy = getattr(os, name, None)
+        if kernel_copy is None:
+            continue
+        copied = 0
+        try:
+            while copied < size:
+                if name == "sendfile":
+                    sent = kernel_copy(
+                        fdst.fileno(), fsrc.fileno(), copied, size - copied
+                    )
+                else:
+                    sent = kernel_copy(fsrc.fileno(), fdst.fileno(), size - copied)
+                if sent == 0:
+                    break
+                copied += sent
+            return
+        except OSError:
+            if copied:  # Only fall back if nothing was written yet.
+                raise
+    shutil.copyfileobj(fsrc, fdst)
@@ -0,0 +1,136 @@
+import json
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional
+
+from src import CACHE, scheduler
+
+# Best number of plot workers found for each machine and drive or share.
+TUNING = CACHE / "tuning.json"
+# Most plot workers the autotuner will try.
+CEILING = 2 * (os.cpu_count() or 4)
+# Seconds the plot rate is measured for before the worker count is changed again.
+WINDOW = 60.0
+
+
+def tuning_key(source: Path) -> str:
+    """This machine and the drive or share <source> is on, a network share and a
+    local disk want different worker counts."""
+    source = source.absolute()
+    return f"{socket.gethostname()} {source.anchor or source.parts[0]}"
+
+
+def load_tuning() -> dict[str, int]:
+    try:
+        return json.loads(TUNING.read_text())
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def best_workers(source: Path) -> Optional[int]:
+    """Worker count kept by the last autotuned run on <source> from this machine."""
+    return load_tuning().get(tuning_key(source))
+
+
+def save_workers(source: Path, workers: int) -> None:
+    tuning = load_tuning()
+    tuning[tuning_key(source)] = workers
+    TUNING.parent.mkdir(parents=True, exist_ok=True)
+    temp = TUNING.with_name(f".tuning.{os.getpid()}-{threading.get_ident()}")
+    temp.write_text(json.dumps(tuning))
+    temp.replace(TUNING)
+
+
+class Autotuner:
+    """Hill-climbs the number of plot workers on the jobs finished per minute.
+
+    Every <window> seconds the rate is measured and the worker count moved one
+    step, the step is reversed when the rate drops. Windows where the workers ran
+    out of queued sheets are skipped, they measure the supply and not the pool."""
+
+    def __init__(
+        self,
+        pool: scheduler.Scheduler,
+        workers: int,
+        ceiling: int = CEILING,
+        window: float = WINDOW,
+    ) -> None:
+        self.pool = pool
+        self.ceiling = max(ceiling, 1)
+        self.workers = min(max(workers, 1), self.ceiling)
+        self.window = window
+        self.step = 1
+        self.last_rate: Optional[float] = None
+        # Jobs finished per minute at each worker count tried, latest window.
+        self.rates: dict[int, float] = {}
+        self.stopped = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def best(self) -> int:
+        """Worker count with the highest rate, the starting count if none."""
+        if not self.rates:
+            return self.workers
+        return max(self.rates, key=lambda workers: self.rates[workers])
+
+    def adjust(self, rate: float) -> int:
+        """Records the rate at the current count and picks the next count."""
+        self.rates[self.workers] = rate
+        if self.last_rate is not None and rate < self.last_rate:
+            self.step = -self.step
+        self.last_rate = rate
+        workers = min(max(self.workers + self.step, 1), self.ceiling)
+        if workers == self.workers:  # At a bound, head back the other way.
+            self.step = -self.step
+            workers = min(max(self.workers + self.step, 1), self.ceiling)
+        self.workers = workers
+        return workers
+
+    def run(self) -> None:
+        completed, started = self.pool.completed, time.perf_counter()
+        while not self.stopped.wait(self.window):
+            done, now = self.pool.completed, time.perf_counter()
+            busy = self.pool.queued > 0
+            if busy and done > completed:
+                rate = (done - completed) * 60 / (now - started)
+                scheduler.configure(self.adjust(rate))
+            completed, started = done, now
+
+    def start(self) -> None:
+        scheduler.configure(self.workers)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.name = "autotune"
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+        scheduler.configure(self.best)
+
+    def summary(self) -> str:
+        if not self.rates:
+            return f"Plot workers: {self.best} (run too short to tune)"
+        rate = self.rates[self.best]
+        return f"Plot workers: {self.best} (autotuned, {rate:.1f} sheets/min)"
+
+
+@contextmanager
+def autotune(
+    source: Path, ceiling: int = CEILING, window: float = WINDOW
+) -> Iterator[Autotuner]:
+    """Tunes the plot workers during the block, starting from the count kept for
+    <source>, and keeps the best count found for the next run."""
+    pool = scheduler.get_scheduler()
+    tuner = Autotuner(pool, best_workers(source) or pool.workers, ceiling, window)
+    tuner.start()
+    try:
+        yield tuner
+    finally:
+        tuner.stop()
+        if tuner.rates:
+            save_workers(source, tuner.best)
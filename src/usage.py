@@ -0,0 +1,73 @@
+import os
+import subprocess
+from typing import Any, Optional, Union
+
+from src.records import Usage
+
+# Seconds between readings of a running process when psutil is used.
+SAMPLE = 0.2
+
+
+def run(
+    command: Union[str, list[str]]
+) -> tuple["subprocess.CompletedProcess[bytes]", Optional[Usage]]:
+    """Runs <command> like subprocess.run and measures what the process used.
+
+    With psutil (in requirements.txt) the process is read while it runs, which also
+    works on Windows. Otherwise the kernel's own totals are read when it is reaped,
+    where the platform has wait4. The usage is None if neither is available."""
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+    process = subprocess.Popen(command)
+    if psutil is not None:
+        usage: Optional[Usage] = sample(process, psutil)
+    elif hasattr(os, "wait4"):
+        usage = reap(process)
+    else:  # pragma: no cover
+        process.wait()
+        usage = None
+    return subprocess.CompletedProcess(command, process.returncode), usage
+
+
+def sample(process: "subprocess.Popen[bytes]", psutil: Any) -> Optional[Usage]:
+    """Reads the CPU time, memory and I/O of <process> until it exits. The last
+    reading before it exits is kept, peak_wset is the true peak on Windows. None if
+    it exited before the first reading."""
+    usage: Optional[Usage] = None
+    try:
+        child = psutil.Process(process.pid)
+        while True:
+            with child.oneshot():
+                times = child.cpu_times()
+                memory = child.memory_info()
+                io = child.io_counters()
+            usage = usage or Usage()
+            usage.cpu = times.user + times.system
+            peak = getattr(memory, "peak_wset", memory.rss)
+            usage.peak_rss = max(usage.peak_rss or 0, peak)
+            usage.read_bytes, usage.write_bytes = io.read_bytes, io.write_bytes
+            try:
+                process.wait(SAMPLE)
+                break
+            except subprocess.TimeoutExpired:
+                continue
+    except (psutil.Error, AttributeError):
+        pass  # Exited between readings, or the platform has no I/O counters.
+    process.wait()
+    return usage
+
+
+def reap(process: "subprocess.Popen[bytes]") -> Usage:
+    """Waits for <process> with wait4 to get the kernel's totals for it. Linux
+    gives the peak in kilobytes and I/O in 512 byte blocks actually read from or
+    written to disk."""
+    _, status, rusage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    return Usage(
+        cpu=rusage.ru_utime + rusage.ru_stime,
+        peak_rss=rusage.ru_maxrss * 1024,
+        read_bytes=rusage.ru_inblock * 512,
+        write_bytes=rusage.ru_oublock * 512,
+    )
@@ -0,0 +1,145 @@
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Callable, Iterable, Optional
+
+from src import deps
+from src import tools as tools
+
+# Seconds between scans of the source folder when there are no file events.
+INTERVAL = 10.0
+# Seconds the folder has to stay unchanged before a burst of saves is acted on.
+DEBOUNCE = 5.0
+
+Snapshot = dict[str, tuple[int, int]]
+
+
+def snapshot(match: str, source: Path) -> Snapshot:
+    """Size and modified time of every drawing matching <match> in <source>."""
+    found: Snapshot = {}
+    for file in source.glob(tools.process_match(match)):
+        try:
+            stat = file.stat()
+        except FileNotFoundError:
+            continue  # Deleted while scanning.
+        found[file.name] = (stat.st_size, stat.st_mtime_ns)
+    return found
+
+
+def picked(files: Snapshot) -> set[str]:
+    """The drawings a pack would be built from, the latest revision of each."""
+    return {file.name for file in tools.get_latest(Path(name) for name in files)}
+
+
+def affected(before: Snapshot, after: Snapshot) -> set[str]:
+    """Drawings whose sheets need plotting again after the folder changed.
+    >>> name = "5300221014-VWC-MS-DWG-00200-01-R0.dwg"
+    >>> sorted(affected({name: (1, 1)}, {name: (1, 2)}))
+    ['5300221014-VWC-MS-DWG-00200-01-R0.dwg']
+    >>> sorted(affected({name: (1, 1)}, {name: (1, 1), "old-R0.dwg": (1, 1)}))
+    []
+    """
+    old, new = picked(before), picked(after)
+    changed = {name for name in after if before.get(name) != after[name]}
+    return (old ^ new) | (changed & new)
+
+
+def dependencies(source: Path, names: Iterable[str]) -> dict[str, list[str]]:
+    """Xrefs and images of each drawing in <source>, from when it was last plotted."""
+    graph = {}
+    for name in names:
+        try:
+            graph[name] = deps.load(tools.fingerprint(source / name)) or []
+        except OSError:
+            continue
+    return graph
+
+
+def used_files(graph: dict[str, list[str]]) -> Snapshot:
+    """Size and modified time of every file the drawings use, -1 if missing."""
+    found: Snapshot = {}
+    for name in {name for names in graph.values() for name in names}:
+        try:
+            stat = Path(name).stat()
+            found[name] = (stat.st_size, stat.st_mtime_ns)
+        except OSError:
+            found[name] = (-1, -1)
+    return found
+
+
+def start_events(source: Path, wake: threading.Event) -> Optional[Any]:
+    """Wakes the watcher on file system events if watchdog is installed.
+    Returns the observer, None if only polling is available."""
+    try:
+        from watchdog.events import FileSystemEventHandler
+        from watchdog.observers import Observer
+    except ImportError:
+        return None
+
+    class Handler(FileSystemEventHandler):  # type: ignore[misc]
+        def on_any_event(self, event: Any) -> None:
+            wake.set()
+
+    observer = Observer()
+    observer.schedule(Handler(), str(source))
+    observer.start()
+    return observer
+
+
+def watch(
+    match: str,
+    source: Path,
+    build: Callable[[], object],
+    interval: float = INTERVAL,
+    debounce: float = DEBOUNCE,
+    stop: Optional[threading.Event] = None,
+    events: bool = True,
+) -> None:
+    """Builds the pack, then rebuilds it whenever the drawings it uses change.
+
+    Polls <source> every <interval> seconds (sooner on file events if <events>)
+    and waits for it to be quiet for <debounce> seconds before rebuilding. The xrefs
+    and images the drawings use are polled too, a change to one rebuilds the pack
+    for the drawings that use it. The sheets are kept between builds (see
+    tools.keep_sheets), only those of the changed drawings and the drawings using a
+    changed file (see deps.dependents) are plotted again."""
+    stop = stop or threading.Event()
+    wake = threading.Event()
+    observer = start_events(source, wake) if events else None
+    kept = tempfile.TemporaryDirectory(prefix="drawing-pack-sheets-")
+    tools.keep_sheets(Path(kept.name))
+    current = snapshot(match, source)
+    try:
+        print(build())
+        graph = dependencies(source, picked(current))
+        used = used_files(graph)
+        while not stop.is_set():
+            wake.wait(interval)
+            wake.clear()
+            if stop.is_set():
+                break
+            new, new_used = snapshot(match, source), used_files(graph)
+            if (new, new_used) == (current, used):
+                continue
+            while not stop.wait(debounce):  # Wait for the saves to settle.
+                settled = snapshot(match, source), used_files(graph)
+                if settled == (new, new_used):
+                    break
+                new, new_used = settled
+            xrefs = [name for name in new_used if used.get(name) != new_used[name]]
+            changed = affected(current, new) | (
+                deps.dependents(xrefs, graph) & picked(new)
+            )
+            current, used = new, new_used
+            if changed and not stop.is_set():
+                print(f"Changed: {', '.join(sorted(changed))}")
+                tools.forget_sheets(changed)
+                print(build())
+                graph = dependencies(source, picked(current))
+                used = used_files(graph)
+    finally:
+        tools.keep_sheets(None)
+        kept.cleanup()
+        if observer is not None:
+            observer.stop()
+            observer.join()
@@ -0,0 +1,183 @@
+# Shared folder work queue for plotting on several machines.
+# The coordinator stages each sheet's drawing and plot script in the queue folder
+# and writes a job file to pending/. Workers claim a job by renaming it into
+# claimed/ (only one rename can succeed), plot it locally and drop the PDF in
+# done/. Jobs that fail go to failed/ with the error.
+import json
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Iterable, Optional
+
+from src import metrics
+from src import tools as tools
+
+# Claimed jobs not finished in this many seconds are given to another worker.
+STALE_CLAIM = 15 * 60
+# A pack gives up on its sheets once no worker has taken or finished one of them
+# for this many seconds, see plot.
+IDLE = 10 * 60
+POLL = 1.0
+
+
+def folders(queue: Path) -> dict[str, Path]:
+    names = ("pending", "claimed", "done", "failed", "drawings")
+    paths = {name: queue / name for name in names}
+    for path in paths.values():
+        path.mkdir(parents=True, exist_ok=True)
+    return paths
+
+
+def plot(
+    queue: Path, sheets: Iterable[tuple[Path, Path]], idle: float = IDLE
+) -> dict[Path, str]:
+    """Plots each (drawing, scr) pair through the workers reading <queue>.
+
+    Blocks until every job is done or failed, or until <idle> seconds pass with
+    none of them being plotted or finished, when the rest are taken back out of
+    the queue. The PDFs are put where tools.make_pdf would have written them.
+    Returns why each sheet that failed wasn't plotted, by its PDF."""
+    paths = folders(queue)
+    jobs: dict[str, Path] = {}
+    errors: dict[Path, str] = {}
+    for drawing, scr in sheets:
+        job_id = uuid.uuid4().hex
+        staged = paths["drawings"] / job_id
+        staged.mkdir()
+        shutil.copyfile(drawing.with_suffix(".dwg"), staged / f"{drawing.stem}.dwg")
+        job = {
+            "id": job_id,
+            "drawing": f"{drawing.stem}.dwg",
+            # The script writes the drawing's deps list named after itself.
+            "scr": tools.script_path(scr).name,
+            "script": tools.script_path(scr).read_text(),
+        }
+        write_atomic(paths["pending"] / f"{job_id}.json", json.dumps(job))
+        jobs[job_id] = tools.pdf_name(drawing, scr)
+    progress = time.monotonic()
+    while jobs:
+        for job_id, pdf in list(jobs.items()):
+            done = paths["done"] / f"{job_id}.pdf"
+            failed = paths["failed"] / f"{job_id}.json"
+            if done.exists():
+                shutil.move(str(done), pdf)
+            elif failed.exists():
+                error = json.loads(failed.read_text()).get("error")
+                print(f"Could not plot {pdf.name}: {error}", file=sys.stderr)
+                errors[pdf] = f"Worker failed: {error}"
+                failed.unlink()
+            else:
+                if (paths["claimed"] / f"{job_id}.json").exists():
+                    progress = time.monotonic()
+                continue
+            shutil.rmtree(paths["drawings"] / job_id, ignore_errors=True)
+            del jobs[job_id]
+            progress = time.monotonic()
+        requeue_stale(paths)
+        if jobs and time.monotonic() - progress > idle:
+            for job_id, pdf in jobs.items():
+                (paths["pending"] / f"{job_id}.json").unlink(missing_ok=True)
+                shutil.rmtree(paths["drawings"] / job_id, ignore_errors=True)
+                errors[pdf] = f"No worker took it within {idle:.0f} seconds"
+                print(f"Could not plot {pdf.name}: {errors[pdf]}", file=sys.stderr)
+            break
+        if jobs:
+            time.sleep(POLL)
+    return errors
+
+
+def requeue_stale(paths: dict[str, Path]) -> None:
+    """Puts jobs claimed by workers that have gone quiet back in pending."""
+    for claimed in paths["claimed"].glob("*.json"):
+        try:
+            if time.time() - claimed.stat().st_mtime > STALE_CLAIM:
+                claimed.replace(paths["pending"] / claimed.name)
+                metrics.SHEETS_RETRIED.inc()
+        except FileNotFoundError:
+            continue
+
+
+def claim(paths: dict[str, Path]) -> Optional[dict[str, Any]]:
+    """Takes the oldest pending job, None if there are none left."""
+    pending = sorted(paths["pending"].glob("*.json"), key=modified)
+    for job_file in pending:
+        claimed = paths["claimed"] / job_file.name
+        try:
+            job_file.rename(claimed)
+        except (FileNotFoundError, FileExistsError, PermissionError):
+            continue  # Another worker got there first.
+        os.utime(claimed)  # Start the stale claim clock now.
+        return json.loads(claimed.read_text())
+    return None
+
+
+def modified(file: Path) -> float:
+    try:
+        return file.stat().st_mtime
+    except FileNotFoundError:
+        return 0
+
+
+def work(
+    queue: Path,
+    plotter: Optional[Callable[[Path, Path], None]] = None,
+    idle: Optional[float] = None,
+    stop: Optional[threading.Event] = None,
+) -> int:
+    """Claims and plots jobs from <queue>, returns how many were done.
+
+    Stops once <idle> seconds pass without a job (never if None) or <stop> is set.
+    <plotter> defaults to tools.make_pdf."""
+    paths = folders(queue)
+    count = 0
+    last_job = time.monotonic()
+    while not (stop and stop.is_set()):
+        job = claim(paths)
+        if job is None:
+            if idle is not None and time.monotonic() - last_job > idle:
+                break
+            time.sleep(POLL)
+            continue
+        run_job(paths, job, plotter or tools.make_pdf)
+        count += 1
+        last_job = time.monotonic()
+    return count
+
+
+def run_job(
+    paths: dict[str, Path], job: dict[str, Any], plotter: Callable[[Path, Path], None]
+) -> None:
+    """Plots the job in a local scratch folder and returns the PDF to the queue.
+    The claim is touched while it plots, see requeue_stale."""
+    claimed = paths["claimed"] / f"{job['id']}.json"
+    with tempfile.TemporaryDirectory() as scratch, tools.touched(claimed):
+        drawing = Path(scratch) / job["drawing"]
+        shutil.copyfile(paths["drawings"] / job["id"] / job["drawing"], drawing)
+        scr = Path(scratch) / job.get("scr", "job.scr")
+        scr.write_text(job["script"])
+        try:
+            plotter(drawing, scr)
+            pdf = tools.pdf_name(drawing, scr)
+            temp = paths["done"] / f".{job['id']}.{socket.gethostname()}"
+            shutil.copyfile(pdf, temp)
+            temp.replace(paths["done"] / f"{job['id']}.pdf")
+        except Exception as error:
+            result = {
+                "id": job["id"],
+                "host": socket.gethostname(),
+                "error": str(error),
+            }
+            write_atomic(paths["failed"] / claimed.name, json.dumps(result))
+    claimed.unlink(missing_ok=True)
+
+
+def write_atomic(file: Path, text: str) -> None:
+    temp = file.with_name(f".{file.name}.{os.getpid()}")
+    temp.write_text(text)
+    temp.replace(file)
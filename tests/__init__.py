@@ -1,4 +1,6 @@
+import os
 import sys
+import tempfile
 from pathlib import Path
 
 TESTS = Path(__file__).parent
@@ -6,3 +8,5 @@ PROJECT = TESTS.parent
 SRC = PROJECT / "src"
 
 sys.path.append(str(SRC.absolute()))
+# Keep the tests from reading or writing the user's cache.
+os.environ["DRAWING_PACK_CACHE"] = tempfile.mkdtemp(prefix="drawing_pack")
@@ -1,8 +1,11 @@
 import unittest
+import zipfile
 from pathlib import Path
+from typing import Any
 from unittest.mock import Mock, patch
 
-from src import app, layouts, model
+from src import app, layouts, model, preflight, scheduler, tools
+from src.records import PackResult
 
 
 class TestMain(unittest.TestCase):
@@ -15,11 +18,13 @@ class TestMain(unittest.TestCase):
         Path("5300221014-VWC-MS-DWG-00200-03-R0.dwg"),
         Path("5300221014-VWC-MS-DWG-00200-03-R1.dwg"),
     )
+    # Enough of a drawing to pass preflight.
+    header = b"AC1032" + bytes(preflight.HEADER_SIZE - 6)
 
     @classmethod
     def setUpClass(cls) -> None:
         for file in cls.files:
-            file.write_bytes(b"")
+            file.write_bytes(cls.header)
 
     @classmethod
     def tearDownClass(cls) -> None:
@@ -32,35 +37,133 @@ class TestMain(unittest.TestCase):
     def test_bad_paperspace(self) -> None:
         source = "FileDoesNotExist.txt"
         result = app.main("", Path(source))
-        self.assertEqual(result, f"Error: Could not find '{source}'")
+        self.assertFalse(result.ok)
+        self.assertEqual(str(result), f"Error: Could not find '{source}'")
 
     def test_no_match(self) -> None:
         search = "*PID*00200*.dwg"
         source = Path()
         result = app.main(search, source)
-        self.assertEqual(result, f"Error: No matching files for '*PID*00200*.dwg' in '.'")
+        self.assertEqual(
+            result.error, "Error: No matching files for '*PID*00200*.dwg' in '.'"
+        )
 
     @patch.object(
-        layouts, "main", return_value=Path("5300221014-VWC-MS-DWG-00200-01-R0.pdf")
+        layouts,
+        "main_many",
+        return_value=PackResult([Path("5300221014-VWC-MS-DWG-00200-01-R0.pdf")]),
     )
     def test_paperspace(self, mock_main: Mock) -> None:
         source = self.files[0]
-        with source.open("w+"):
-            pass
+        source.write_bytes(self.header)
         result = app.main("", source, latest=False, paper=True)
-        self.assertEqual(result, str(source.with_suffix(".pdf")))
+        self.assertEqual(str(result), str(source.with_suffix(".pdf")))
         mock_main.assert_called_once()
+        self.assertListEqual(
+            list(mock_main.call_args.kwargs["drawings"]), [(source, None)]
+        )
         source.unlink()
 
     @patch.object(
-        model, "main", return_value=Path("5300221014-VWC-MS-DWG-00200-01_03-R0.pdf")
+        model,
+        "main",
+        return_value=PackResult([Path("5300221014-VWC-MS-DWG-00200-01_03-R0.pdf")]),
     )
     def test_model(self, mock_main: Mock) -> None:
         match = "00200"
         source = Path()
         result = app.main(match, source)
         mock_main.assert_called_once()
-        self.assertEqual(result, "5300221014-VWC-MS-DWG-00200-01_03-R0.pdf")
+        self.assertEqual(str(result), "5300221014-VWC-MS-DWG-00200-01_03-R0.pdf")
+
+    @patch.object(model, "main")
+    def test_preflight(self, mock_main: Mock) -> None:
+        empty = self.files[6]  # The latest revision of sheet 03.
+        empty.write_bytes(b"")
+        try:
+            result = app.main("00200", Path(), strict=True)
+            mock_main.assert_not_called()
+            self.assertEqual(
+                str(result),
+                f"Error: 1 drawings failed preflight\n  {empty.name}: empty file",
+            )
+            mock_main.return_value = PackResult([Path("pack.pdf")])
+            result = app.main("00200", Path())
+            drawings = list(mock_main.call_args.kwargs["drawings"])
+            self.assertEqual(len(drawings), 2)
+            self.assertNotIn(empty.name, [drawing.name for drawing in drawings])
+            # Checked as model.main takes them, the skipped drawing is in the result.
+            self.assertDictEqual(result.skipped, {empty.name: "empty file"})
+            self.assertEqual(str(result), f"pack.pdf\nSkipped {empty.name}: empty file")
+        finally:
+            empty.write_bytes(self.header)
+
+    @patch.object(model, "main")
+    def test_archive(self, mock_main: Mock) -> None:
+        project = Path("project.zip")
+        with zipfile.ZipFile(project, "w") as zf:
+            for file in self.files:
+                zf.writestr(f"Drawings/{file.name}", self.header)
+            zf.writestr("Drawings/logo.png", b"")
+        self.addCleanup(project.unlink)
+        extracted = Path("pdfs") / self.files[0].name
+        extracted.parent.mkdir()
+        self.addCleanup(extracted.parent.rmdir)
+
+        def plot(**kwargs: Any) -> PackResult:
+            tools.copy_drawing(project / extracted.name, extracted)
+            self.assertTrue((extracted.parent / "logo.png").exists())
+            extracted.unlink()  # model.main releases its copies.
+            return PackResult()
+
+        mock_main.side_effect = plot
+        app.main("00200", project, dest=extracted.parent)
+        kwargs = mock_main.call_args.kwargs
+        self.assertEqual(kwargs["source"], project)
+        self.assertEqual(len(list(kwargs["drawings"])), 3)
+        # Support files extracted for the pack don't outlast it.
+        self.assertListEqual(list(extracted.parent.iterdir()), [])
+        mock_main.side_effect = None
+        app.main("00200", project)
+        self.assertEqual(mock_main.call_args.kwargs["dest"], Path())
+
+    def test_archive_same_names(self) -> None:
+        project = Path("project.zip")
+        with zipfile.ZipFile(project, "w") as zf:
+            zf.writestr(f"Drawings/{self.files[0].name}", self.header)
+            zf.writestr("Old/logo.png", b"")
+            zf.writestr("Older/logo.png", b"")
+        self.addCleanup(project.unlink)
+        # The drawing doesn't use either logo, so the pack isn't refused.
+        with patch.object(model, "main", return_value=PackResult()) as mock_main:
+            self.assertIsNone(app.main("00200", project).error)
+        mock_main.assert_called_once()
+
+    def test_plan_model(self) -> None:
+        result = app.plan("00200", Path())
+        assert not isinstance(result, str)
+        self.assertEqual(result.sheets, 3)
+        self.assertTrue(result.exact)
+        self.assertEqual(len(result.outputs), 1)
+        # The revision in the name is from whichever drawing is found first.
+        self.assertTrue(
+            result.outputs[0].name.startswith("5300221014-VWC-MS-DWG-00200-01_03-R")
+        )
+
+    @patch.object(layouts, "cached_layouts", side_effect=[["1-R0", "2-R0"], None])
+    def test_plan_paper(self, mock_cached: Mock) -> None:
+        result = app.plan("00200*R0", Path(), output="pack", paper=True, latest=False)
+        assert not isinstance(result, str)
+        self.assertEqual(mock_cached.call_count, 2)
+        self.assertEqual(result.sheets, 3)
+        self.assertFalse(result.exact)
+        self.assertListEqual(result.outputs, [Path("pack(1).pdf"), Path("pack.pdf")])
+
+    def test_plan_no_match(self) -> None:
+        result = app.plan("*PID*00200*.dwg", Path())
+        self.assertEqual(
+            result, "Error: No matching files for '*PID*00200*.dwg' in '.'"
+        )
 
     def test_get_output_files_no_name(self) -> None:
         files = list(app.get_output_files(4, Path(), None))
@@ -72,7 +175,24 @@ class TestMain(unittest.TestCase):
             files, ["file.pdf", "file(1).pdf", "file(2).pdf", "file(3).pdf"]
         )
 
-    def test_get_total(self) -> None:
-        total, paths = app.get_total((Path() for _ in range(2)))
-        self.assertEqual(total, 2)
-        self.assertEqual([".", "."], [str(path) for path in paths])
+    @patch.object(app, "main")
+    def test_batch(self, mock_main: Mock) -> None:
+        done = PackResult([Path("pack.pdf")])
+
+        def pack(match: str, source: Path) -> PackResult:
+            self.assertEqual(scheduler.PRIORITY.get(), scheduler.BATCH)
+            if match == "00300":
+                raise RuntimeError("accoreconsole crashed")
+            return done
+
+        mock_main.side_effect = pack
+        with scheduler.priority(scheduler.BATCH):
+            results = app.batch(
+                [
+                    dict(match="00200", source=Path()),
+                    dict(match="00300", source=Path()),
+                ],
+                workers=1,
+            )
+        self.assertIs(results[0], done)
+        self.assertEqual(str(results[1]), "Error: accoreconsole crashed")
@@ -0,0 +1,68 @@
+import unittest
+import zipfile
+
+from src import archive, preflight
+
+from tests import TESTS
+
+
+class TestArchive(unittest.TestCase):
+    drawing = "5300221014-VWC-MS-DWG-00200-01-R0.dwg"
+    header = b"AC1032" + bytes(preflight.HEADER_SIZE - 6)
+
+    def setUp(self) -> None:
+        self.archive = TESTS / "project.zip"
+        self.dest = TESTS / "extracted"
+        self.dest.mkdir(exist_ok=True)
+        with zipfile.ZipFile(self.archive, "w", zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr(f"Drawings/{self.drawing}", self.header)
+            zf.writestr("Xrefs/title-block.dwg", b"AC1032")
+            zf.writestr("Xrefs/", b"")
+            zf.writestr("Issued/old.pdf", b"%PDF")
+        self.addCleanup(self.archive.unlink)
+        self.addCleanup(self.dest.rmdir)
+
+    def test_members(self) -> None:
+        self.assertListEqual(
+            sorted(archive.members(self.archive)),
+            [self.drawing, "old.pdf", "title-block.dwg"],
+        )
+        self.assertTrue(archive.is_archive(self.archive))
+        self.assertFalse(archive.is_archive(TESTS))
+        with self.assertRaises(FileNotFoundError):
+            archive.member(self.archive / "missing.dwg")
+
+    def test_glob(self) -> None:
+        self.assertListEqual(
+            archive.glob("*DWG*00200*.dwg", self.archive), [self.archive / self.drawing]
+        )
+
+    def test_read(self) -> None:
+        self.assertEqual(archive.read(self.archive / self.drawing, 6), b"AC1032")
+        self.assertTrue(preflight.check(self.archive / self.drawing).ok)
+
+    def test_extract(self) -> None:
+        dest = self.dest / self.drawing
+        self.addCleanup(dest.unlink, missing_ok=True)
+        self.assertEqual(archive.extract(self.archive, self.drawing, dest), dest)
+        self.assertEqual(dest.read_bytes(), self.header)
+        info = archive.member(self.archive / self.drawing)
+        self.assertEqual(dest.stat().st_mtime_ns, archive.mtime_ns(info))
+        self.assertListEqual(list(self.dest.iterdir()), [dest])
+
+    def test_same_names(self) -> None:
+        with zipfile.ZipFile(self.archive, "a") as zf:
+            zf.writestr("Old/title-block.dwg", b"AC1027")
+        # Only the names a drawing needs have to be unique.
+        self.assertEqual(
+            archive.members(self.archive)["title-block.dwg"].filename,
+            "Xrefs/title-block.dwg",
+        )
+        self.assertListEqual(
+            archive.glob("*DWG*00200*.dwg", self.archive), [self.archive / self.drawing]
+        )
+        archive.unique(self.archive, [self.drawing, "old.pdf"])
+        with self.assertRaises(FileExistsError) as error:
+            archive.unique(self.archive, [self.drawing, "title-block.dwg"])
+        message = str(error.exception)
+        self.assertIn("Xrefs/title-block.dwg, Old/title-block.dwg", message)
@@ -1,12 +1,24 @@
+import subprocess
+import sys
+import tempfile
+import threading
+import time
 import unittest
+from pathlib import Path
 from unittest.mock import Mock, patch
 
 from click.testing import CliRunner
-from src import app, cli
+from src import app, cli, client, history, index, server, workqueue
+from src.records import PackResult, SheetJob, Usage
+from tests import PROJECT
 
 
 class TestCLI(unittest.TestCase):
-    @patch.object(app, "main", return_value="5300000000-VWC-MS-DWG-00200-01_10-R0.dwg")
+    @patch.object(
+        app,
+        "main",
+        return_value=PackResult([Path("5300000000-VWC-MS-DWG-00200-01_10-R0.dwg")]),
+    )
     def test_cli_args(self, mock_main: Mock) -> None:
         args = [
             "00200*R0",
@@ -25,3 +37,147 @@ class TestCLI(unittest.TestCase):
         res = runner.invoke(cli.main, args)  # pyright: ignore[reportUnknownMemberType]
         mock_main.assert_called_once()
         assert res.output == "5300000000-VWC-MS-DWG-00200-01_10-R0.dwg\n"
+
+    @patch.object(app, "main", return_value=PackResult([Path("pack.pdf")]))
+    def test_autotune(self, mock_main: Mock) -> None:
+        runner = CliRunner()
+        res = runner.invoke(  # pyright: ignore[reportUnknownMemberType]
+            cli.main, ["00200", ".", "--autotune"]
+        )
+        mock_main.assert_called_once()
+        self.assertEqual(res.output.splitlines()[0], "pack.pdf")
+        self.assertIn("Plot workers:", res.output)
+
+    def test_usage(self) -> None:
+        sheet = SheetJob(Path("a.dwg"), Path("a.scr"), "Model", usage=Usage(cpu=12))
+        runner = CliRunner()
+        with patch.object(
+            app, "main", return_value=PackResult([Path("a.pdf")], [sheet])
+        ):
+            res = runner.invoke(  # pyright: ignore[reportUnknownMemberType]
+                cli.main, ["00200", "."]
+            )
+        self.assertEqual(res.output, "a.pdf\nPlotting used CPU 12.0s\n")
+
+    @patch.object(app, "main", return_value=PackResult([Path("a.pdf")]))
+    def test_metrics(self, mock_main: Mock) -> None:
+        file = Path(tempfile.mkdtemp()) / "drawing_pack.prom"
+        runner = CliRunner()
+        runner.invoke(  # pyright: ignore[reportUnknownMemberType]
+            cli.main, ["00200", ".", "--metrics", str(file)]
+        )
+        self.assertIn("drawing_pack_plot_seconds_count", file.read_text())
+
+    def test_stats(self) -> None:
+        slow = history.SheetStats("00200-01", "Model", 4, 21, 45, usual=10)
+        runner = CliRunner()
+        with patch.object(history, "slowest", return_value=[slow]), patch.object(
+            history, "regressions", return_value=[slow]
+        ):
+            res = runner.invoke(  # pyright: ignore[reportUnknownMemberType]
+                cli.main, ["stats"]
+            )
+        lines = res.output.splitlines()
+        self.assertEqual(lines[1].split(), ["00200-01", "Model", "4", "21s", "45s"])
+        self.assertEqual(
+            lines[2], "Slower: 00200-01 Model took 45s, usually 10s (4.5x)"
+        )
+
+    @patch.object(app, "plan", return_value="Error: Could not find 'x'")
+    @patch.object(app, "main")
+    def test_cli_plan(self, mock_main: Mock, mock_plan: Mock) -> None:
+        runner = CliRunner()
+        res = runner.invoke(  # pyright: ignore[reportUnknownMemberType]
+            cli.main, ["00200", ".", "--plan", "--json"]
+        )
+        mock_plan.assert_called_once()
+        mock_main.assert_not_called()
+        assert res.output == "Error: Could not find 'x'\n"
+
+    @patch.object(workqueue, "work", return_value=3)
+    def test_cli_worker(self, mock_work: Mock) -> None:
+        runner = CliRunner()
+        res = runner.invoke(  # pyright: ignore[reportUnknownMemberType]
+            cli.main, ["worker", "queue", "-i", "5"]
+        )
+        mock_work.assert_called_once_with(Path("queue"), idle=5.0)
+        assert res.output == "Plotted 3 sheets.\n"
+
+    @patch.object(index, "refresh")
+    def test_cli_find(self, mock_refresh: Mock) -> None:
+        found = index.Found(
+            "Caustic", Path("Caustic"), ["5300221014-VWC-MS-DWG-00205-01-R1.dwg"]
+        )
+        runner = CliRunner()
+        with patch.object(index, "search", return_value=[found]):
+            res = runner.invoke(  # pyright: ignore[reportUnknownMemberType]
+                cli.main, ["find", "205", "-r", "."]
+            )
+        mock_refresh.assert_called_once_with(Path("."))
+        self.assertEqual(
+            res.output, "Caustic\n  5300221014-VWC-MS-DWG-00205-01-R1.dwg\n"
+        )
+        with patch.object(index, "search", return_value=[]):
+            res = runner.invoke(  # pyright: ignore[reportUnknownMemberType]
+                cli.main, ["find", "205", "-r", ".", "-c"]
+            )
+        mock_refresh.assert_called_once()
+        self.assertTrue(res.output.startswith("Error: No drawings matching '205'"))
+
+
+class TestServer(unittest.TestCase):
+    def setUp(self) -> None:
+        self.server = server.PackServer(port=0, packs=1)
+        self.url = f"http://{server.HOST}:{self.server.server_address[1]}"
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        patcher = patch.object(client, "POLL", 0.01)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @patch.object(app, "main", return_value=PackResult([Path("pack.pdf")]))
+    def test_pack(self, mock_main: Mock) -> None:
+        runner = CliRunner()
+        res = runner.invoke(  # pyright: ignore[reportUnknownMemberType]
+            cli.main, ["00200", ".", "--server", self.url, "--strict"]
+        )
+        self.assertEqual(res.output, "pack.pdf\n")
+        self.assertTrue(mock_main.call_args.kwargs["strict"])
+
+    def test_refused(self) -> None:
+        result = client.run(self.url, match="", source=".", colour="red")
+        self.assertEqual(result.error, "Error: Bad job arguments: ['colour']")
+
+
+class TestStartup(unittest.TestCase):
+    # Seconds allowed for a scripted call that does no plotting.
+    BUDGET = 2.0
+
+    def run_cli(self, *args: str) -> tuple[float, str]:
+        """Runs drawing_pack, returns the wall time and the modules it imported."""
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "drawing_pack.py", *args],
+            cwd=PROJECT,
+            capture_output=True,
+            text=True,
+        )
+        elapsed = time.perf_counter() - start
+        self.assertEqual(result.returncode, 0, result.stderr)
+        return elapsed, result.stderr
+
+    def check(self, *args: str) -> None:
+        elapsed, imports = self.run_cli(*args)
+        for module in ("PySide6", "PyPDF3"):
+            self.assertNotIn(f" {module}", imports)
+        self.assertLess(elapsed, self.BUDGET)
+
+    def test_help(self) -> None:
+        self.check("--help")
+
+    def test_noop_plan(self) -> None:
+        with tempfile.TemporaryDirectory() as source:
+            self.check("00200", source, "--plan")
@@ -0,0 +1,41 @@
+import os
+import unittest
+
+from src import deps
+
+from tests import SRC, TESTS
+
+
+class TestDeps(unittest.TestCase):
+    def setUp(self) -> None:
+        self.drawing = TESTS / "deps.dwg"
+        self.xref = TESTS / "deps-xref.dwg"
+        self.scr = TESTS / "deps-scr0.scr"
+        self.xref.write_bytes(b"AC1032")
+        for file in (self.drawing, self.xref, deps.sidecar(self.drawing, self.scr)):
+            self.addCleanup(file.unlink, missing_ok=True)
+
+    def test_collect(self) -> None:
+        file = deps.sidecar(self.drawing, self.scr)
+        self.assertEqual(file.name, "deps.dwg.deps-scr0.deps")
+        self.assertIsNone(deps.collect(self.drawing, self.scr, "deps-test"))
+        file.write_text(f"{self.xref}\n\n{self.xref}\n")
+        self.assertListEqual(
+            deps.collect(self.drawing, self.scr, "deps-test"), [str(self.xref)]
+        )
+        self.assertFalse(file.exists())
+        self.assertListEqual(deps.load("deps-test"), [str(self.xref)])
+        self.assertIsNone(deps.load("never-plotted"))
+
+    def test_model_script(self) -> None:
+        scr = SRC / "pdfgen11x17model.scr"
+        self.assertIn(f'".{scr.stem}{deps.SIDECAR}"', scr.read_text())
+
+    def test_digest(self) -> None:
+        before = deps.digest([str(self.xref)])
+        self.assertEqual(deps.digest([str(self.xref)]), before)
+        os.utime(self.xref, ns=(0, 0))
+        changed = deps.digest([str(self.xref)])
+        self.assertNotEqual(changed, before)
+        self.xref.unlink()
+        self.assertNotEqual(deps.digest([str(self.xref)]), changed)
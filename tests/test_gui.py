@@ -1,14 +1,19 @@
 # pyright: reportUnknownMemberType=false, reportGeneralTypeIssues=false
 
 import os
+import shutil
 import sys
+import tempfile
+import threading
 import unittest
 from pathlib import Path
+from typing import Any
 from unittest.mock import Mock, patch
 
 from PySide6.QtTest import QTest
 
-from src import app, gui
+from src import app, gui, index
+from src.records import PackResult
 from tests import PROJECT
 
 
@@ -41,31 +46,64 @@ class TestGUI(unittest.TestCase):
         self.app.console("Test Text")
         self.assertEqual("Test Text", self.app.status.toPlainText().split("\n")[-1])
         sys.stderr.write("Test Error")
+        self.assertEqual("Test Text", self.app.status.toPlainText().split("\n")[-1])
+        self.app.stderr.emit_pending()
         self.assertEqual("Test Error", self.app.status.toPlainText().split("\n")[-1])
 
+    def test_log_batched_and_bounded(self) -> None:
+        with patch.object(self.app, "console") as mock_console:
+            self.app.stderr.textWritten.disconnect()
+            self.app.stderr.textWritten.connect(mock_console)
+            for idx in range(3):
+                sys.stderr.write(f"warning {idx}\n")
+            self.app.stderr.emit_pending()
+            mock_console.assert_called_once_with("warning 0\nwarning 1\nwarning 2")
+        self.app.status.append("\n".join(str(idx) for idx in range(gui.LOG_LINES * 2)))
+        self.assertEqual(self.app.status.blockCount(), gui.LOG_LINES)
+        self.assertEqual(len(self.app.status.records), gui.LOG_LINES)
+
+    def test_log_filter_and_save(self) -> None:
+        self.app.console("PyPDF3 warning\nError: accoreconsole crashed")
+        self.app.log_level.setCurrentText("Errors")
+        self.assertEqual(self.app.status.toPlainText(), "Error: accoreconsole crashed")
+        self.app.status.append("Success! pack.pdf created.")
+        self.assertEqual(self.app.status.toPlainText(), "Error: accoreconsole crashed")
+        self.app.log_level.setCurrentText("Warnings")
+        self.assertEqual(
+            self.app.status.toPlainText(),
+            "PyPDF3 warning\nError: accoreconsole crashed",
+        )
+        log = Path(tempfile.mkdtemp()) / "status.log"
+        self.app.status.save(log)
+        lines = log.read_text().splitlines()
+        self.assertEqual(lines[0], "INFO: Ready")
+        self.assertListEqual(
+            lines[-3:],
+            [
+                "WARNING: PyPDF3 warning",
+                "ERROR: Error: accoreconsole crashed",
+                "INFO: Success! pack.pdf created.",
+            ],
+        )
+        shutil.rmtree(log.parent)
+
     def test_restore_stderr(self) -> None:
         self.app.__del__()
         self.assertEqual(sys.stderr, sys.__stderr__)
 
     def test_open_file(self) -> None:
-        self.app.latest_file = Path("Test File.pdf")
         with patch.object(os, "startfile") as mock_startfile:
-            self.app.open_file()
+            self.app.open_file(Path("Test File.pdf"))
             mock_startfile.assert_called_once_with(Path("Test File.pdf"))
-            self.assertFalse(self.app.open.isVisible())
-
-    def test_set_latest(self) -> None:
-        files = "file1.pdf\nfile2.pdf"
-        self.app.set_latest(files)
-        self.assertEqual(self.app.latest_file, Path("file1.pdf"))
 
-    @patch.object(app, "main", return_value="Test File.pdf")
+    @patch.object(app, "main", return_value=PackResult([Path("Test File.pdf")]))
     def test_paperspace(self, mock_main: Mock) -> None:
         self.app.source.setText(self.source)
         self.app.dest.setText(self.dest)
         self.app.layouts.setChecked(True)
         self.app.layouts.clicked.emit()
-        self.app.process()
+        job = self.app.process()
+        self.assertTrue(self.app.jobs.wait(job, 5))  # type: ignore
         mock_main.assert_called_once_with(
             match="",
             source=Path(self.source),
@@ -82,8 +120,105 @@ class TestGUI(unittest.TestCase):
         self.app.match.setText("00200")
         self.app.rev.setText("R0")
         self.app.source.setText(str(PROJECT))
-        self.app.process()
+        job = self.app.process()
+        self.assertTrue(self.app.jobs.wait(job, 5))  # type: ignore
+        self.app.update_jobs()
+        self.assertEqual(self.app.job_table.item(0, 2).text(), "failed")
         self.assertEqual(
             f"Error: No matching files for '00200*R0' in '{PROJECT}'",
             self.app.status.toPlainText().split("\n")[-1],
         )
+
+    @patch.object(app, "main", return_value=PackResult([Path("Test File.pdf")]))
+    def test_find_source(self, mock_main: Mock) -> None:
+        found = index.Found("Caustic", Path("Caustic"), ["dwg-R1.dwg"])
+        self.app.match.setText("205")
+        with patch.object(self.app.finder, "find") as mock_find:
+            self.assertIsNone(self.app.process())
+            mock_find.assert_called_once_with("205")
+        with patch.object(index, "search", return_value=[found]) as mock_search:
+            self.app.finder.run("205")  # As the search thread does.
+            mock_search.assert_called_once_with("205", index.CONTRACT)
+        self.assertTrue(self.app.jobs.wait(self.app.job_rows[-1], 5))
+        self.assertEqual(self.app.source.text(), "Caustic")
+        self.assertEqual(mock_main.call_args.kwargs["source"], Path("Caustic"))
+
+    @patch.object(app, "main")
+    def test_find_several_projects(self, mock_main: Mock) -> None:
+        found = index.Found("Caustic", Path("Caustic"), ["dwg-R1.dwg"])
+        self.app.match.setText("205")
+        with patch.object(self.app.finder, "find"):
+            self.assertIsNone(self.app.process())
+        with patch.object(index, "search", return_value=[found, found]):
+            self.app.finder.run("205")
+        mock_main.assert_not_called()
+        self.assertEqual(self.app.source.text(), "")
+
+    def test_find_changed_number(self) -> None:
+        found = index.Found("Caustic", Path("Caustic"), ["dwg-R1.dwg"])
+        self.app.match.setText("206")
+        self.app.found_drawing("205", [found])
+        self.assertEqual(self.app.source.text(), "")
+
+    def test_preview(self) -> None:
+        names = [
+            "5300221014-VWC-MS-DWG-00205-01-R0.dwg",
+            "5300221014-VWC-MS-DWG-00205-01-R1.dwg",
+            "5300221014-VWC-MS-DWG-00206-01-R0.dwg",
+        ]
+        self.app.source.setText("Caustic")
+        self.app.listed("Caustic", names)
+        self.assertListEqual(self.app.numbers.stringList(), ["00205", "00206"])
+        self.app.match.setText("205")
+        self.assertEqual(
+            self.app.preview.text(),
+            "2 matching, 1 used: 5300221014-VWC-MS-DWG-00205-01-R1.dwg",
+        )
+        self.app.rev.setText("0")
+        self.assertEqual(self.app.preview.text(), f"1 matching, 1 used: {names[0]}")
+        self.app.match.setText("300")
+        self.assertEqual(self.app.preview.text(), "No matching files")
+
+    def test_listing_changed_source(self) -> None:
+        folder = Path(tempfile.mkdtemp())
+        (folder / "5300221014-VWC-MS-DWG-00205-01-R0.dwg").write_bytes(b"")
+        self.app.source.setText(str(folder))
+        self.app.listing.run(str(PROJECT))
+        self.assertListEqual(self.app.names, [])
+        self.app.listing.run(str(folder))
+        self.assertListEqual(self.app.names, ["5300221014-VWC-MS-DWG-00205-01-R0.dwg"])
+        shutil.rmtree(folder)
+
+    @patch.object(app, "main")
+    def test_job_queue(self, mock_main: Mock) -> None:
+        started = threading.Event()
+        release = threading.Event()
+
+        def pack(**kwargs: Any) -> str:
+            if kwargs["match"] == "00205":
+                started.set()
+                release.wait(5)
+            return PackResult([Path(f"{kwargs['match']}.pdf")])
+
+        mock_main.side_effect = pack
+        self.app.source.setText(self.source)
+        self.app.match.setText("205")
+        slow = self.app.process()
+        started.wait(5)
+        self.app.match.setText("206")
+        fast = self.app.process()
+        self.assertTrue(self.app.jobs.wait(fast, 5))  # type: ignore
+        self.app.update_jobs()
+        self.assertEqual(self.app.job_table.item(0, 2).text(), "running")
+        self.assertEqual(self.app.job_table.item(1, 2).text(), "done")
+        self.assertIsNotNone(self.app.job_table.cellWidget(1, 4))
+        self.assertEqual(
+            self.app.status.toPlainText().split("\n")[-1], "Success! 00206.pdf created."
+        )
+        release.set()
+        self.assertTrue(self.app.jobs.wait(slow, 5))  # type: ignore
+        self.app.update_jobs()
+        self.assertEqual(self.app.job_table.item(0, 2).text(), "done")
+        with patch.object(os, "startfile", create=True) as mock_startfile:
+            self.app.job_table.cellWidget(0, 4).click()
+            mock_startfile.assert_called_once_with(Path("00205.pdf"))
@@ -0,0 +1,42 @@
+import unittest
+from unittest.mock import patch
+
+from src import history
+
+
+class TestHistory(unittest.TestCase):
+    def setUp(self) -> None:
+        store = patch.object(history, "HISTORY", history.CACHE / f"{self.id()}.db")
+        store.start()
+        self.addCleanup(store.stop)
+
+    def plots(self, drawing: str, sheet: str, *durations: float) -> None:
+        for duration in durations:
+            history.record(drawing, sheet, duration, 0, 1000, 200)
+
+    def test_empty(self) -> None:
+        self.assertListEqual(history.slowest(), [])
+        self.assertListEqual(history.regressions(), [])
+
+    def test_slowest(self) -> None:
+        self.plots("00200-01", "Model", 10, 12)
+        self.plots("00201-01", "A1", 30, 20)
+        slowest = history.slowest(1)
+        self.assertEqual(len(slowest), 1)
+        self.assertEqual(slowest[0].drawing, "00201-01")
+        self.assertEqual(slowest[0].runs, 2)
+        self.assertEqual(slowest[0].mean, 25)
+        self.assertEqual(slowest[0].latest, 20)
+
+    def test_regressions(self) -> None:
+        self.plots("00200-01", "Model", 10, 11, 9, 45)
+        self.plots("00201-01", "Model", 10, 11, 9, 12)
+        self.plots("00202-01", "Model", 10, 50)  # Too few plots to compare.
+        found = history.regressions()
+        self.assertListEqual([stats.drawing for stats in found], ["00200-01"])
+        self.assertEqual(found[0].usual, 10)
+        self.assertEqual(found[0].slowdown, 4.5)
+
+    def test_record_errors_ignored(self) -> None:
+        with patch.object(history, "connect", side_effect=history.sqlite3.Error):
+            history.record("00200-01", "Model", 1, 0, None, None)
@@ -0,0 +1,52 @@
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from src import index
+
+
+class TestIndex(unittest.TestCase):
+    def setUp(self) -> None:
+        self.root = Path(tempfile.mkdtemp())
+        self.caustic = self.root / "5300221014 Caustic"
+        self.dosing = self.root / "5300600002 Dosing"
+        for folder in (self.caustic, self.dosing):
+            folder.mkdir()
+        for rev in ("R0", "R1"):
+            (self.caustic / f"5300221014-VWC-MS-DWG-00205-01-{rev}.dwg").write_bytes(
+                b""
+            )
+        (self.dosing / "5300600002-VWC-MS-DWG-00300-01-R0.dwg").write_bytes(b"")
+        (self.dosing / "notes.txt").write_bytes(b"")
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.root)
+
+    def test_search(self) -> None:
+        found = index.search("205", self.root)
+        self.assertEqual(len(found), 1)
+        self.assertEqual(found[0].project, "5300221014 Caustic")
+        self.assertEqual(found[0].source, self.caustic)
+        self.assertListEqual(found[0].latest, ["5300221014-VWC-MS-DWG-00205-01-R1.dwg"])
+        self.assertListEqual(index.search("999", self.root), [])
+
+    def test_refresh_changed_only(self) -> None:
+        self.assertEqual(index.refresh(self.root), 2)
+        self.assertEqual(index.refresh(self.root), 0)
+        (self.dosing / "5300600002-VWC-MS-DWG-00205-01-R0.dwg").write_bytes(b"")
+        os.utime(self.dosing, ns=(0, self.dosing.stat().st_mtime_ns + 1))
+        self.assertEqual(index.refresh(self.root), 1)
+        with patch("os.scandir") as mock_scandir:
+            found = index.search("00205", self.root)
+            mock_scandir.assert_not_called()
+        self.assertListEqual(
+            [project.source for project in found], [self.caustic, self.dosing]
+        )
+
+    def test_missing_root(self) -> None:
+        self.assertEqual(index.refresh(self.root / "missing"), 0)
+        index.start_refresh(self.root).join()
+        self.assertIsNotNone(index.load_shard(self.caustic))
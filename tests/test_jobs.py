@@ -0,0 +1,35 @@
+import unittest
+from pathlib import Path
+from unittest.mock import Mock
+
+from src import jobs, scheduler
+from src.records import PackResult
+
+
+class TestJobQueue(unittest.TestCase):
+    def test_run(self) -> None:
+        runner = Mock(return_value=PackResult([Path("pack.pdf")]))
+        queue = jobs.JobQueue(packs=1, runner=runner)
+        job = queue.submit(dict(match="00200", source=".", dest=None))
+        self.assertTrue(queue.wait(job, 5))
+        runner.assert_called_once_with(match="00200", source=Path("."), dest=None)
+        self.assertEqual(job.status, "done")
+        self.assertEqual(job.result, "pack.pdf")
+        self.assertIs(queue.get(job.id), job)
+        self.assertListEqual(queue.all(), [job])
+
+    def test_failed(self) -> None:
+        queue = jobs.JobQueue(runner=Mock(side_effect=OSError("share is offline")))
+        job = queue.submit(dict(match="", source=".", priority=scheduler.BATCH))
+        self.assertTrue(queue.wait(job, 5))
+        self.assertEqual(job.status, "failed")
+        self.assertEqual(job.result, "Error: share is offline")
+        self.assertEqual(job.to_dict()["priority"], scheduler.BATCH)
+
+    def test_bad_args(self) -> None:
+        queue = jobs.JobQueue(runner=Mock())
+        with self.assertRaises(ValueError):
+            queue.submit(dict(match="", source=".", colour="red"))
+        with self.assertRaises(ValueError):
+            queue.submit(dict(match="", source=".", priority="urgent"))
+        self.assertListEqual(queue.all(), [])
@@ -1,10 +1,12 @@
 import os
-import shutil
+import threading
 import unittest
+from concurrent.futures import Future
 from pathlib import Path
 from unittest.mock import Mock, call, patch
 
-from src import layouts
+from src import layouts, scheduler, tools
+from src.records import SheetJob
 from tests import PROJECT, SRC, TESTS
 
 BASE = (SRC / "pdfgen11x17layout.scr").read_text().splitlines()
@@ -14,6 +16,9 @@ sheet_names = [
 ]
 sheets = ["-01-R0", "-02-R0", "-03-R0"]
 single_file = TESTS / "5300221014-VWC-MS-DWG-00200-01-R0.dwg"
+jobs = [
+    SheetJob(multi_file, TESTS / f"scr{i}.scr", sheet) for i, sheet in enumerate(sheets)
+]
 
 
 class TestLayouts(unittest.TestCase):
@@ -30,42 +35,75 @@ class TestLayouts(unittest.TestCase):
 
     @patch("src.tools.make_pdf")
     def test_process_sheets(self, mock_make_pdf: Mock) -> None:
-        layouts.process_sheets(sheets, PROJECT, TESTS, BASE)
+        mock_make_pdf.side_effect = lambda drawing, scr: [
+            drawing.with_name(f"{drawing.stem}-{sheet}.pdf").write_bytes(b"")
+            for sheet in sheets
+        ]
+        jobs = layouts.process_sheets(sheets, multi_file, TESTS, BASE)
         self.assertEqual(3, mock_make_pdf.call_count)
+        self.assertListEqual([job.sheet for job in jobs], sheets)
+        self.assertListEqual([job.status for job in jobs], ["done"] * 3)
+        self.assertEqual(
+            jobs[0].pdf, multi_file.with_name(f"{multi_file.stem}--01-R0.pdf")
+        )
 
         # Clean up files made by test
+        for job in jobs:
+            tools.release_file(job.pdf)
         for file in TESTS.iterdir():
             if "scr" in file.name:
                 file.unlink()
 
+    def test_write_scripts(self) -> None:
+        written = layouts.write_scripts(sheets[:2], multi_file, TESTS, BASE)
+        for job in written:
+            self.addCleanup(job.scr.unlink)
+            script = job.scr.read_text()
+            self.assertIn(f'"{job.sheet}"', script)
+            # Sheets of a drawing plot at once, each lists its files separately.
+            self.assertIn(f'".{job.scr.stem}.deps"', script)
+        self.assertNotEqual(written[0].scr, written[1].scr)
+
     def test_bad_sheet_name(self) -> None:
         self.assertEqual(layouts.clean_sheet_name("A"), "")
 
     def test_rename_file(self) -> None:
-        scr = BASE
-        scr[2] = f'"1-R0"\n'
-        test_scr = TESTS / "test.scr"
-        test_scr.write_text("\n".join(scr))
         sheet_names[0].write_bytes(b"")
-        result = layouts.rename_file(multi_file, test_scr, 2)
+        job = SheetJob(multi_file, TESTS / "missing.scr", "1-R0")
+        result = layouts.rename_file(job, 2)
+        self.assertEqual(result, TESTS / "5300221014-VWC-MS-DWG-00200-01-R0.pdf")
         self.assertTrue(result.exists())
-        test_scr.unlink()
-        result.unlink()
+        self.assertFalse(sheet_names[0].exists())
+        tools.release_file(result)
 
+    @patch.object(tools, "get_accore", return_value="accoreconsole.exe")
     @patch("subprocess.run")
-    def test_get_layouts(self, mock_subprocess: Mock) -> None:
-        layouts_file = SRC / "layouts.txt"
+    def test_get_layouts(self, mock_subprocess: Mock, mock_accore: Mock) -> None:
+        layouts_file = SRC / f"layouts-{threading.get_ident()}.txt"
         layouts_file.write_text("Model\n-01-R0\n-02-R0\n-03-R0")
         _sheets, qty = layouts.get_layouts(multi_file)
         self.assertListEqual(list(_sheets), sheets)
         self.assertEqual(qty, 3)
 
+    @patch("subprocess.run")
+    def test_cached_layouts(self, mock_subprocess: Mock) -> None:
+        drawing = TESTS / "cached.dwg"
+        drawing.write_bytes(b"")
+        self.assertIsNone(layouts.cached_layouts(drawing))
+        layouts.store_layouts(drawing, sheets)
+        _sheets, qty = layouts.get_layouts(drawing)
+        mock_subprocess.assert_not_called()
+        self.assertListEqual(list(_sheets), sheets)
+        self.assertEqual(qty, 3)
+        drawing.unlink()
+        self.assertIsNone(layouts.cached_layouts(drawing))
+
     @patch.object(layouts, "remove_temp")
     @patch.object(layouts, "merge")
     @patch.object(layouts, "rename_file", side_effect=sheet_names)
-    @patch.object(layouts, "process_sheets", return_value=[f"scr{i}" for i in range(3)])
+    @patch.object(layouts, "process_sheets", return_value=jobs)
     @patch.object(layouts, "get_layouts", return_value=(sheets, 3))
-    @patch.object(shutil, "copyfile")
+    @patch.object(tools.COPY_POOL, "submit")
     def test_main_with_dest_and_output(
         self,
         mock_copy_file: Mock,
@@ -77,6 +115,9 @@ class TestLayouts(unittest.TestCase):
     ) -> None:
         output = TESTS / "5300221014-VWC-MS-DWG-00200-01_03-R0.pdf"
         base_scr = (SRC / "pdfgen11x17layout.scr").read_text().splitlines()
+        copy: "Future[Path]" = Future()
+        copy.set_result(multi_file)
+        mock_copy_file.return_value = copy
         result = layouts.main(
             source=PROJECT / "5300221014-VWC-MS-DWG-00200-01_03-R0.dwg",
             destination=TESTS,
@@ -85,15 +126,18 @@ class TestLayouts(unittest.TestCase):
             del_source=False,
             keep_individual=False,
         )
-        mock_copy_file.assert_called_once()
-        mock_get_layouts.assert_called_once_with(multi_file)
-        mock_process_sheets.assert_called_once_with(sheets, multi_file, TESTS, base_scr)
+        self.assertFalse(tools.own_claim(multi_file).exists())  # Released.
+        source = PROJECT / "5300221014-VWC-MS-DWG-00200-01_03-R0.dwg"
+        mock_copy_file.assert_called_once_with(tools.copy_drawing, source, multi_file)
+        mock_get_layouts.assert_called_once_with(source)
+        mock_process_sheets.assert_called_once_with(
+            sheets, multi_file, TESTS, base_scr, mock_copy_file.return_value, None
+        )
         self.assertEqual(3, mock_rename_file.call_count)
         mock_merge.assert_called_once_with(sheet_names, output)
         remove_temp_call_args = [
-            call((TESTS / "5300221014-VWC-MS-DWG-00200-01_03-R0.dwg",)),
             call(sheet_names),
-            call([f"scr{i}" for i in range(3)]),
+            call([job.scr for job in jobs]),
         ]
         self.assertListEqual(remove_temp_call_args, mock_remove_temp.call_args_list)
         self.assertEqual(output, result)
@@ -102,7 +146,7 @@ class TestLayouts(unittest.TestCase):
     @patch.object(layouts, "remove_temp")
     @patch.object(layouts, "merge")
     @patch.object(layouts, "rename_file", side_effect=sheet_names)
-    @patch.object(layouts, "process_sheets", return_value=[f"scr{i}" for i in range(3)])
+    @patch.object(layouts, "process_sheets", return_value=jobs)
     @patch.object(layouts, "get_layouts", return_value=(sheets, 3))
     def test_main_no_dest_or_output(
         self,
@@ -124,9 +168,110 @@ class TestLayouts(unittest.TestCase):
             keep_individual=True,
         )
         mock_get_layouts.assert_called_once_with(multi_file)
-        mock_process_sheets.assert_called_once_with(sheets, multi_file, TESTS, base_scr)
+        mock_process_sheets.assert_called_once_with(
+            sheets, multi_file, TESTS, base_scr, None, None
+        )
         self.assertEqual(3, mock_rename_file.call_count)
         mock_merge.assert_called_once_with(sheet_names, output)
-        mock_remove_temp.assert_called_once_with([f"scr{i}" for i in range(3)])
+        mock_remove_temp.assert_called_once_with([job.scr for job in jobs])
         mock_startfile.assert_called_once_with(output)
         self.assertEqual(output, result)
+
+
+class TestMainMany(unittest.TestCase):
+    def setUp(self) -> None:
+        self.drawings = [
+            TESTS / f"5300221014-VWC-MS-DWG-0020{i}-01-R0.dwg" for i in (1, 2)
+        ]
+        patcher = patch.object(scheduler, "_scheduler", scheduler.Scheduler(2))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @patch.object(layouts, "remove_temp")
+    # A merge only starts once its sheets are plotted, so one merge thread is enough.
+    @patch.object(layouts, "MERGERS", 1)
+    @patch.object(layouts, "merge")
+    @patch.object(layouts, "rename_file", side_effect=lambda job, fill: job.scr)
+    @patch.object(layouts, "get_layouts", return_value=(sheets, 3))
+    def test_merged_independently(
+        self,
+        mock_get_layouts: Mock,
+        mock_rename_file: Mock,
+        mock_merge: Mock,
+        mock_remove_temp: Mock,
+    ) -> None:
+        merged = threading.Event()
+        mock_merge.side_effect = lambda files, output: merged.set()
+
+        def plot(job: SheetJob, copy: None) -> None:
+            # The first drawing's last sheet is held until the other is merged.
+            if job.drawing == self.drawings[0] and job.scr.name.endswith("scr2.scr"):
+                self.assertTrue(merged.wait(5))
+
+        with patch.object(layouts, "plot", side_effect=plot) as mock_plot:
+            result = layouts.main_many(
+                [(drawing, None) for drawing in self.drawings], None
+            )
+        self.assertListEqual(
+            result.outputs, [drawing.with_suffix(".pdf") for drawing in self.drawings]
+        )
+        self.assertEqual(len(result.sheets), 6)
+        for job in result.sheets:
+            self.assertGreaterEqual(job.queue_wait, 0)  # type: ignore[arg-type]
+        self.assertEqual(mock_get_layouts.call_count, 2)
+        self.assertEqual(mock_plot.call_count, 6)
+        self.assertListEqual(
+            [call.args[1] for call in mock_merge.call_args_list],
+            [
+                self.drawings[1].with_suffix(".pdf"),
+                self.drawings[0].with_suffix(".pdf"),
+            ],
+        )
+        scrs = {scr for args in mock_remove_temp.call_args_list for scr in args.args[0]}
+        self.assertIn(TESTS / f"{self.drawings[0].stem}-scr0.scr", scrs)
+        self.assertIn(TESTS / f"{self.drawings[1].stem}-scr0.scr", scrs)
+        for scr in scrs:
+            scr.unlink()
+
+    @patch.object(layouts, "merge")
+    @patch.object(layouts, "plot")
+    @patch.object(layouts, "get_layouts", return_value=(sheets, 3))
+    def test_copy_fails(
+        self, mock_get_layouts: Mock, mock_plot: Mock, mock_merge: Mock
+    ) -> None:
+        missing = PROJECT / "5300221014-VWC-MS-DWG-00209-01-R0.dwg"
+        result = layouts.main_many([(missing, None)], TESTS)
+        self.assertFalse(result.ok)
+        self.assertEqual(
+            result.error,
+            f"Error: Could not copy 1 drawings\n  {missing.name}: "
+            f"[Errno 2] No such file or directory: '{missing}'",
+        )
+        mock_merge.assert_not_called()
+        self.assertFalse(tools.own_claim(TESTS / missing.name).exists())
+        self.assertListEqual(list(TESTS.glob(f"{missing.stem}*")), [])
+
+    @patch.object(layouts, "merge")
+    @patch.object(layouts, "get_layouts", return_value=(sheets[:2], 2))
+    @patch("src.tools.make_pdf")
+    def test_sheet_not_plotted(
+        self, mock_make_pdf: Mock, mock_get_layouts: Mock, mock_merge: Mock
+    ) -> None:
+        drawing = self.drawings[0]
+
+        def plot(source: Path, scr: Path) -> None:
+            if scr.stem.endswith("scr0"):  # The second sheet writes no PDF.
+                source.with_name(f"{source.stem}-{sheets[0]}.pdf").write_bytes(b"")
+
+        mock_make_pdf.side_effect = plot
+        result = layouts.main_many([(drawing, None)], None)
+        self.assertTrue(result.ok)
+        self.assertListEqual([job.status for job in result.sheets], ["done", "failed"])
+        self.assertEqual(len(mock_merge.call_args.args[0]), 1)
+        self.assertListEqual(result.outputs, [drawing.with_suffix(".pdf")])
+        self.assertEqual(
+            str(result),
+            f"{drawing.with_suffix('.pdf')}\n"
+            f"Failed {drawing.stem}-{sheets[1]}.pdf: No PDF was written",
+        )
+        self.assertListEqual(list(TESTS.glob(f"*{drawing.stem}*")), [])
@@ -0,0 +1,93 @@
+import shutil
+import tempfile
+import unittest
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+from unittest.mock import patch
+
+from PyPDF3 import PdfFileReader, PdfFileWriter
+
+from src import merge
+
+
+def make_sheet(path: Path, width: int) -> Path:
+    """Single blank page PDF, the width is used to identify the page later."""
+    writer = PdfFileWriter()
+    writer.addBlankPage(width, 100)
+    with path.open("wb") as f:
+        writer.write(f)
+    return path
+
+
+class TestMerge(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp = Path(tempfile.mkdtemp())
+        self.sheets = [
+            (make_sheet(self.temp / f"sheet{idx}.pdf", 100 + idx), f"Sheet {idx}")
+            for idx in range(7)
+        ]
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.temp)
+
+    def check_output(self, output: Path) -> None:
+        with output.open("rb") as f:
+            reader = PdfFileReader(f)
+            widths = [
+                int(reader.getPage(idx).mediaBox.getWidth())
+                for idx in range(reader.getNumPages())
+            ]
+            titles = [bookmark.title for bookmark in reader.getOutlines()]
+        self.assertListEqual(widths, [100 + idx for idx in range(7)])
+        self.assertListEqual(titles, [title for _, title in self.sheets])
+
+    def test_merge_single_chunk(self) -> None:
+        output = merge.merge(self.sheets, self.temp / "out.pdf")
+        self.check_output(output)
+
+    def test_merge_tree(self) -> None:
+        output = merge.merge(self.sheets, self.temp / "out.pdf", chunk_size=2)
+        self.check_output(output)
+        self.assertListEqual(
+            sorted(
+                file.name for file in self.temp.iterdir() if "sheet" not in file.name
+            ),
+            ["out.pdf"],
+        )
+
+    def test_open_inputs_bounded(self) -> None:
+        open_pdf = merge.open_pdf
+        opened = []
+
+        @contextmanager
+        def counted(file: Path) -> Iterator[PdfFileReader]:
+            opened.append(1)
+            self.assertLessEqual(sum(opened), 3)
+            try:
+                with open_pdf(file) as reader:
+                    yield reader
+            finally:
+                opened.append(-1)
+
+        parts = [(file, [(title, 0)]) for file, title in self.sheets]
+        output = self.temp / "out.pdf"
+        with patch.object(merge, "open_pdf", counted):
+            bookmarks = merge.write_merged(parts, output, max_open=3)
+        self.check_output(output)
+        self.assertListEqual(
+            bookmarks, [(title, idx) for idx, (_, title) in enumerate(self.sheets)]
+        )
+        self.assertListEqual(sorted(file.name for file in self.temp.glob("tmp*")), [])
+
+    def test_empty_sheet(self) -> None:
+        empty = self.temp / "empty.pdf"
+        empty.touch()
+        sheets = self.sheets[:3] + [(empty, "Empty")] + self.sheets[3:]
+        output = merge.merge(sheets, self.temp / "out.pdf")
+        self.check_output(output)
+
+    def test_open_pdf_releases_input(self) -> None:
+        with merge.open_pdf(self.sheets[0][0]) as reader:
+            self.assertEqual(reader.getNumPages(), 1)
+        self.assertTrue(reader.stream.closed)
@@ -0,0 +1,64 @@
+import threading
+import unittest
+from unittest.mock import patch
+
+from src import metrics
+
+from tests import TESTS
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self) -> None:
+        registry = patch.object(metrics, "REGISTRY", [])
+        registry.start()
+        self.addCleanup(registry.stop)
+        self.file = TESTS / "metrics.prom"
+        self.addCleanup(self.file.unlink, missing_ok=True)
+
+    def test_counter(self) -> None:
+        counter = metrics.Counter("plots_total", "Plots.")
+        counter.inc()
+        counter.inc(2)
+        self.assertEqual(
+            metrics.render(),
+            "# HELP plots_total Plots.\n# TYPE plots_total counter\nplots_total 3\n",
+        )
+
+    def test_gauge(self) -> None:
+        active = metrics.Gauge("active", "Running.")
+        with active.tracking():
+            self.assertIn("active 1\n", metrics.render())
+        self.assertIn("active 0\n", metrics.render())
+        metrics.Gauge("depth", "Waiting.", lambda: 7)
+        self.assertIn("depth 7\n", metrics.render())
+
+    def test_histogram(self) -> None:
+        seconds = metrics.Histogram("plot_seconds", "Plot time.", (1, 5))
+        for value in (0.5, 3, 3, 10):
+            seconds.observe(value)
+        lines = metrics.render().splitlines()[2:]
+        self.assertListEqual(
+            lines,
+            [
+                'plot_seconds_bucket{le="1"} 1',
+                'plot_seconds_bucket{le="5"} 3',
+                'plot_seconds_bucket{le="+Inf"} 4',
+                "plot_seconds_sum 16.5",
+                "plot_seconds_count 4",
+            ],
+        )
+
+    def test_exporting(self) -> None:
+        counter = metrics.Counter("plots_total", "Plots.")
+        with metrics.exporting(self.file, interval=0.05):
+            counter.inc()
+            threading.Event().wait(0.2)
+            self.assertIn("plots_total 1\n", self.file.read_text())
+            counter.inc()
+        self.assertIn("plots_total 2\n", self.file.read_text())
+        self.assertListEqual(list(TESTS.glob(".metrics.prom.*")), [])
+
+    def test_not_exporting(self) -> None:
+        with metrics.exporting(None):
+            pass
+        self.assertFalse(self.file.exists())
@@ -1,10 +1,13 @@
 import os
-import shutil
 import unittest
+from concurrent.futures import Future
 from pathlib import Path
+from threading import Event, Thread
+from typing import Iterator
 from unittest.mock import Mock, call, patch
 
-from src import model
+from src import model, tools
+from src.records import SheetJob
 from tests import PROJECT, TESTS
 
 
@@ -14,11 +17,57 @@ class TestModel(unittest.TestCase):
         Path("5300221014-VWC-MS-DWG-00200-02-R0.dwg"),
         Path("5300221014-VWC-MS-DWG-00200-03-R0.dwg"),
     ]
+    jobs = [SheetJob(TESTS / file, Path("scr"), "Model") for file in files]
 
-    @patch.object(shutil, "copy")
-    def test_create_temp_files(self, mock_copy: Mock) -> None:
-        model.create_temp_files(self.files, PROJECT, TESTS)
-        self.assertEqual(mock_copy.call_count, 3)
+    def tearDown(self) -> None:
+        for job in self.jobs:
+            tools.release_file(job.pdf)  # Claimed by plot.
+
+    @patch("src.tools.copy_drawing")
+    def test_start_copy(self, mock_copy: Mock) -> None:
+        model.start_copy(self.files[0], PROJECT, TESTS).result()
+        mock_copy.assert_called_once_with(
+            PROJECT / self.files[0], TESTS / self.files[0]
+        )
+        self.assertTrue(tools.own_claim(TESTS / self.files[0]).exists())
+        tools.release_file(TESTS / self.files[0])
+        self.assertFalse(tools.own_claim(TESTS / self.files[0]).exists())
+
+    @patch("src.tools.make_pdf")
+    def test_process_sheets_copy_fails(self, mock_make_pdf: Mock) -> None:
+        (PROJECT / self.files[0]).write_bytes(b"")  # The second one is missing.
+        self.addCleanup((PROJECT / self.files[0]).unlink)
+        copied = TESTS / self.files[0]
+        with self.assertRaises(FileNotFoundError):
+            model.process_sheets(iter(self.files[:2]), TESTS, PROJECT)
+        self.assertFalse(copied.exists())
+        with patch.object(model, "merge_pdf") as mock_merge:
+            result = model.main(self.files[:2], PROJECT, dest=TESTS)
+        mock_merge.assert_not_called()
+        self.assertFalse(result.ok)
+        self.assertIn(self.files[1].name, str(result))
+
+    @patch("src.tools.make_pdf")
+    def test_plot_waits_for_copy(self, mock_make_pdf: Mock) -> None:
+        copy: "Future[Path]" = Future()
+        job = SheetJob(TESTS / self.files[0], Path("scr"), "Model")
+        mock_make_pdf.side_effect = lambda drawing, scr: job.pdf.write_bytes(b"")
+        t = Thread(target=model.plot, args=(job, copy))
+        t.start()
+        t.join(0.1)
+        mock_make_pdf.assert_not_called()
+        copy.set_result(TESTS / self.files[0])
+        t.join()
+        mock_make_pdf.assert_called_once_with(TESTS / self.files[0], Path("scr"))
+        self.assertEqual(job.status, "done")
+
+    @patch("src.tools.make_pdf", return_value=None)
+    def test_plot_no_pdf(self, mock_make_pdf: Mock) -> None:
+        job = SheetJob(TESTS / self.files[0], Path("scr"), "Model")
+        model.plot(job)
+        mock_make_pdf.assert_called_once()
+        self.assertEqual(job.status, "failed")
+        self.assertEqual(job.error, "No PDF was written")
 
     def test_remove_temp(self) -> None:
         temp: list[Path] = []
@@ -41,16 +90,33 @@ class TestModel(unittest.TestCase):
 
     @patch("src.tools.make_pdf")
     def test_process_sheets(self, mock_make_pdf: Mock) -> None:
-        model.process_sheets(self.files, TESTS)
+        jobs = model.process_sheets(iter(self.files), TESTS)
         self.assertEqual(3, mock_make_pdf.call_count)
+        self.assertListEqual(
+            [job.drawing for job in jobs], [TESTS / file for file in self.files]
+        )
+        self.assertEqual(jobs[0].pdf, TESTS / f"{self.files[0].stem}-Model.pdf")
+        for job in jobs:
+            self.assertGreaterEqual(job.queue_wait, 0)  # type: ignore[arg-type]
+
+    @patch("src.tools.make_pdf")
+    def test_process_sheets_streams(self, mock_make_pdf: Mock) -> None:
+        plotted = Event()
+        mock_make_pdf.side_effect = lambda drawing, scr: plotted.set()
+
+        def walk() -> Iterator[Path]:
+            yield self.files[0]
+            # The rest of the folder is still being read when the first plot starts.
+            self.assertTrue(plotted.wait(5))
+            yield from self.files[1:]
+
+        self.assertEqual(len(model.process_sheets(walk(), TESTS)), 3)
 
     @patch.object(model, "remove_temp")
     @patch.object(model, "merge_pdf")
-    @patch.object(model, "process_sheets")
-    @patch.object(model, "create_temp_files")
+    @patch.object(model, "process_sheets", return_value=jobs)
     def test_main_with_dest_and_output(
         self,
-        mock_create_temp_files: Mock,
         mock_process_sheets: Mock,
         mock_merge_pdf: Mock,
         mock_remove_temp: Mock,
@@ -65,16 +131,18 @@ class TestModel(unittest.TestCase):
             view=False,
             remove_dwg=False,
         )
-        mock_create_temp_files.assert_called_once_with(self.files, PROJECT, TESTS)
-        mock_process_sheets.assert_called_once_with(self.files, TESTS)
+        drawings, dest, source, queue = mock_process_sheets.call_args.args
+        self.assertListEqual(list(drawings), self.files)
+        self.assertEqual((dest, source, queue), (TESTS, PROJECT, None))
         mock_merge_pdf.assert_called_once_with(self.files, TESTS, output)
         mock_remove_temp.assert_called_once_with(self.files, TESTS, True)
-        self.assertEqual(result, output)
+        self.assertListEqual(result.outputs, [output])
+        self.assertListEqual(result.sheets, self.jobs)
 
     @patch.object(os, "startfile")
     @patch.object(model, "remove_temp")
     @patch.object(model, "merge_pdf")
-    @patch.object(model, "process_sheets")
+    @patch.object(model, "process_sheets", return_value=jobs)
     def test_main_no_dest_or_output(
         self,
         mock_process_sheets: Mock,
@@ -86,14 +154,13 @@ class TestModel(unittest.TestCase):
         result = model.main(
             drawings=self.files,
             source=PROJECT,
-            sht_count=3,
             dest=None,
             output=None,
             view=True,
             remove_dwg=False,
         )
-        mock_process_sheets.assert_called_once_with(self.files, PROJECT)
+        self.assertEqual(mock_process_sheets.call_args.args[1:], (PROJECT, None, None))
         mock_merge_pdf.assert_called_once_with(self.files, PROJECT, output)
         mock_remove_temp.assert_called_once_with(self.files, PROJECT, False)
         mock_view.assert_called_once_with(output)
-        self.assertEqual(result, output)
+        self.assertListEqual(result.outputs, [output])
@@ -0,0 +1,50 @@
+import json
+import time
+import unittest
+from pathlib import Path
+
+from src import plan
+
+
+class TestPlan(unittest.TestCase):
+    def setUp(self) -> None:
+        self.plan = plan.Plan(
+            match="00200",
+            source=Path("source"),
+            dest=Path("dest"),
+            paper=True,
+            drawings=[
+                plan.PlannedDrawing(Path("a.dwg"), Path("dest/a.pdf"), ["1", "2"]),
+                plan.PlannedDrawing(Path("b.dwg"), Path("dest/b.pdf"), None),
+            ],
+            sheet_time=10,
+        )
+
+    def test_totals(self) -> None:
+        self.assertEqual(self.plan.sheets, 3)
+        self.assertFalse(self.plan.exact)
+        self.assertEqual(self.plan.estimate, 30)
+        self.assertListEqual(
+            self.plan.outputs, [Path("dest/a.pdf"), Path("dest/b.pdf")]
+        )
+
+    def test_table(self) -> None:
+        lines = self.plan.table().split("\n")
+        self.assertEqual(lines[1].split(), ["a.dwg", "2", "a.pdf"])
+        self.assertEqual(lines[2].split(), ["b.dwg", "?", "b.pdf"])
+        self.assertEqual(lines[3], "2 drawings, ~3 sheets")
+        self.assertEqual(lines[4], "Estimated time: 30s")
+
+    def test_json(self) -> None:
+        data = json.loads(self.plan.to_json())
+        self.assertEqual(data["sheets"], 3)
+        self.assertEqual(data["drawings"][0]["layouts"], ["1", "2"])
+
+    def test_record_timing(self) -> None:
+        plan.TIMINGS.unlink(missing_ok=True)
+        self.assertIsNone(plan.sheet_time(False))
+        plan.record_timing(False, 2, time.perf_counter() - 10)
+        self.assertAlmostEqual(plan.sheet_time(False) or 0, 5, places=1)
+        plan.record_timing(False, 1, time.perf_counter() - 15)
+        self.assertAlmostEqual(plan.sheet_time(False) or 0, 8, places=1)
+        self.assertIsNone(plan.sheet_time(True))
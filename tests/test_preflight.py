@@ -0,0 +1,64 @@
+import unittest
+
+from src import preflight
+
+from tests import TESTS
+
+
+def drawing_bytes(size: int, section_map: int, version: bytes = b"AC1032") -> bytes:
+    """A DWG header whose section map ends at <section_map> + 0x100, padded out
+    to <size> bytes."""
+    plain = bytearray(0x6C)
+    plain[:12] = preflight.R2004_MAGIC
+    plain[0x54:0x5C] = section_map.to_bytes(8, "little")
+    header = version + bytes(0x80 - 6) + preflight.decrypt_header(bytes(plain))
+    return header + bytes(size - len(header))
+
+
+class TestPreflight(unittest.TestCase):
+    def setUp(self) -> None:
+        self.drawing = TESTS / "preflight.dwg"
+        self.addCleanup(self.drawing.unlink, missing_ok=True)
+
+    def check(self, data: bytes) -> preflight.Checked:
+        self.drawing.write_bytes(data)
+        return preflight.check(self.drawing)
+
+    def test_ok(self) -> None:
+        result = self.check(drawing_bytes(0x2000, 0x1000))
+        self.assertTrue(result.ok)
+        self.assertEqual(result.version, "AutoCAD 2018")
+        self.assertTrue(self.check(b"AC1015" + bytes(0x200)).ok)
+
+    def test_problems(self) -> None:
+        self.assertEqual(self.check(b"").problem, "empty file")
+        self.assertEqual(self.check(b"%PDF-1.4" * 40).problem, "not a DWG file")
+        self.assertEqual(
+            self.check(b"AC1099" + bytes(0x200)).problem,
+            "unsupported DWG version AC1099",
+        )
+        self.assertEqual(
+            self.check(b"AC1032" + bytes(10)).problem,
+            "truncated, shorter than its header",
+        )
+        self.assertEqual(
+            self.check(drawing_bytes(0x1000, 0x1000)).problem,
+            "truncated, 4096 bytes of at least 4352",
+        )
+        self.assertIn("can't be read", preflight.check(TESTS / "missing.dwg").problem)
+
+    def test_locked(self) -> None:
+        lock = self.drawing.with_suffix(".dwl")
+        lock.write_bytes(b"")
+        self.addCleanup(lock.unlink)
+        result = self.check(drawing_bytes(0x2000, 0x1000))
+        self.assertEqual(result.problem, "open in AutoCAD (.dwl lock file)")
+
+    def test_check_all(self) -> None:
+        self.drawing.write_bytes(b"")
+        missing = TESTS / "missing.dwg"
+        results = preflight.check_all([missing, self.drawing])
+        self.assertListEqual(
+            [result.drawing for result in results], [missing, self.drawing]
+        )
+        self.assertFalse(any(result.ok for result in results))
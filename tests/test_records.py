@@ -0,0 +1,63 @@
+import unittest
+from pathlib import Path
+
+from src.records import PackResult, SheetJob, Usage
+from tests import TESTS
+
+
+class TestRecords(unittest.TestCase):
+    def setUp(self) -> None:
+        self.job = SheetJob(Path("dest/a-R0.dwg"), Path("dest/a-R0-scr0.scr"), "1")
+
+    def test_pdf(self) -> None:
+        self.assertEqual(self.job.pdf, Path("dest/a-R0-1.pdf"))
+
+    def test_running(self) -> None:
+        job = SheetJob(TESTS / "a-R0.dwg", TESTS / "a-R0-scr0.scr", "1")
+        with job.running():
+            self.assertEqual(job.status, "running")
+            job.pdf.write_bytes(b"%PDF")
+        job.pdf.unlink()
+        self.assertEqual(job.status, "done")
+        self.assertGreaterEqual(job.elapsed, 0)  # type: ignore[arg-type]
+
+    def test_running_no_pdf(self) -> None:
+        with self.job.running():
+            pass  # accoreconsole exited without writing the sheet.
+        self.assertEqual(self.job.status, "failed")
+        self.assertEqual(self.job.error, "No PDF was written")
+
+    def test_running_failed(self) -> None:
+        with self.assertRaises(OSError):
+            with self.job.running():
+                raise OSError("No plotter")
+        self.assertEqual(self.job.status, "failed")
+        self.assertEqual(self.job.error, "No plotter")
+        self.assertIsNotNone(self.job.finished)
+
+    def test_collected(self) -> None:
+        self.job.collected("No worker took it within 600 seconds")
+        self.assertEqual(self.job.status, "failed")
+        self.assertEqual(self.job.error, "No worker took it within 600 seconds")
+
+    def test_round_trip(self) -> None:
+        self.job.usage = Usage(1.0, 2, 3, 4)
+        self.job.queue_wait = 0.5
+        result = PackResult([Path("pack.pdf")], [self.job]).done()
+        self.assertEqual(PackResult.from_dict(result.to_dict()), result)
+
+    def test_usage(self) -> None:
+        other = SheetJob(Path("b.dwg"), Path("b.scr"), "Model", usage=Usage(2, 10))
+        result = PackResult(sheets=[self.job, other])
+        self.assertEqual(result.usage, Usage(2, 10))
+        self.job.usage = Usage(1.5, 20, 5)
+        self.assertEqual(result.usage, Usage(3.5, 20, 5))
+        self.assertIsNone(PackResult().usage)
+
+    def test_str(self) -> None:
+        result = PackResult([Path("a.pdf"), Path("b.pdf")])
+        self.assertEqual(str(result), "a.pdf\nb.pdf")
+        self.assertTrue(result.ok)
+        failed = PackResult.failed("Error: No drawings")
+        self.assertEqual(str(failed), "Error: No drawings")
+        self.assertFalse(failed.ok)
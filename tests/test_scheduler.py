@@ -0,0 +1,95 @@
+import threading
+import time
+import unittest
+from unittest.mock import Mock, patch
+
+from src import scheduler
+
+
+class TestScheduler(unittest.TestCase):
+    def test_submit(self) -> None:
+        pool = scheduler.Scheduler(2)
+        futures = [pool.submit(pow, 2, idx) for idx in range(5)]
+        self.assertListEqual([future.result() for future in futures], [1, 2, 4, 8, 16])
+        self.assertEqual(len(pool.threads), 2)
+
+    def test_workers_limit(self) -> None:
+        pool = scheduler.Scheduler(2)
+        release = threading.Event()
+        running: list[int] = []
+        futures = [
+            pool.submit(lambda idx: running.append(idx) or release.wait(), idx)
+            for idx in range(4)
+        ]
+        time.sleep(0.1)
+        self.assertLessEqual(len(running), 2)
+        self.assertGreaterEqual(pool.queued, 2)
+        release.set()
+        scheduler.wait(futures)
+        self.assertEqual(len(running), 4)
+
+    def test_configure_lowers_workers(self) -> None:
+        pool = scheduler.Scheduler(3)
+        release = threading.Event()
+        running: list[int] = []
+        with patch.object(scheduler, "_scheduler", pool):
+            first = [pool.submit(release.wait) for _ in range(3)]
+            time.sleep(0.05)
+            scheduler.configure(1)
+            futures = [
+                pool.submit(lambda idx: running.append(idx) or time.sleep(0.2), idx)
+                for idx in range(3)
+            ]
+            release.set()
+            time.sleep(0.08)
+            self.assertEqual(len(running), 1)  # One at a time now.
+            scheduler.wait(first + futures)
+            self.assertEqual(pool.completed, 6)
+            scheduler.configure(4)
+            self.assertEqual(len(pool.threads), 4)
+
+    def run_in_order(self, levels: list[str]) -> list[str]:
+        """Queues jobs behind a blocked single worker and returns the run order."""
+        pool = scheduler.Scheduler(1)
+        release = threading.Event()
+        order: list[str] = []
+        blocker = pool.submit(release.wait, priority=scheduler.BATCH)
+        time.sleep(0.05)
+        futures = [
+            pool.submit(order.append, f"{level}{idx}", priority=level)
+            for idx, level in enumerate(levels)
+        ]
+        release.set()
+        scheduler.wait([blocker] + futures)
+        for future in futures:
+            self.assertIsNotNone(future.queue_wait)
+        return order
+
+    def test_interactive_first(self) -> None:
+        order = self.run_in_order([scheduler.BATCH] * 2 + [scheduler.INTERACTIVE] * 2)
+        self.assertListEqual(
+            order, ["interactive2", "interactive3", "batch0", "batch1"]
+        )
+
+    def test_batch_share(self) -> None:
+        order = self.run_in_order([scheduler.BATCH] * 2 + [scheduler.INTERACTIVE] * 6)
+        self.assertListEqual(
+            [name.rstrip("0123456789") for name in order],
+            ["interactive"] * 3 + ["batch"] + ["interactive"] * 3 + ["batch"],
+        )
+
+    def test_priority_context(self) -> None:
+        with scheduler.priority(scheduler.BATCH):
+            future = scheduler.submit(int, "1")
+        self.assertEqual(future.priority, scheduler.BATCH)
+        self.assertEqual(scheduler.submit(int, "1").priority, scheduler.INTERACTIVE)
+        with self.assertRaises(ValueError):
+            with scheduler.priority("urgent"):
+                pass
+
+    @patch("traceback.print_exception")
+    def test_wait_reports_errors(self, mock_print: Mock) -> None:
+        future = scheduler.submit(int, "not a number")
+        scheduler.wait([future])
+        mock_print.assert_called_once()
+        self.assertIsInstance(mock_print.call_args[0][1], ValueError)
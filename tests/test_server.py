@@ -0,0 +1,61 @@
+import threading
+import time
+import unittest
+import urllib.error
+from pathlib import Path
+from unittest.mock import Mock, patch
+
+from src import app, client, server
+from src.records import PackResult, SheetJob
+
+
+class TestServer(unittest.TestCase):
+    def setUp(self) -> None:
+        self.server = server.PackServer(port=0, packs=2)
+        self.url = f"http://{server.HOST}:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+        self.patcher = patch.object(client, "POLL", 0.01)
+        self.patcher.start()
+
+    def tearDown(self) -> None:
+        self.patcher.stop()
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    @patch.object(app, "main", return_value=PackResult([Path("pack.pdf")]))
+    def test_run(self, mock_main: Mock) -> None:
+        mock_main.return_value.sheets = [SheetJob(Path("a.dwg"), Path("a.scr"), "1")]
+        result = client.run(self.url, match="00200", source=Path("."), dest=None)
+        self.assertListEqual(result.outputs, [Path("pack.pdf")])
+        self.assertEqual(result.sheets[0].pdf, Path("a-1.pdf"))
+        mock_main.assert_called_once_with(match="00200", source=Path("."), dest=None)
+
+    @patch.object(
+        app, "main", return_value=PackResult.failed("Error: Could not find 'x'")
+    )
+    def test_failed_status(self, mock_main: Mock) -> None:
+        job_id = client.submit(self.url, match="", source="x")
+        while client.status(self.url, job_id)["status"] in ("queued", "running"):
+            time.sleep(0.01)
+        job = client.status(self.url, job_id)
+        self.assertEqual(job["status"], "failed")
+        self.assertEqual(job["result"], "Error: Could not find 'x'")
+        self.assertIn(job_id, [job["id"] for job in client.request(f"{self.url}/jobs")])
+
+    @patch.object(app, "main", return_value=PackResult([Path("pack.pdf")]))
+    def test_batch_priority(self, mock_main: Mock) -> None:
+        result = client.run(self.url, match="", source=".", priority="batch")
+        self.assertEqual(str(result), "pack.pdf")
+        job = client.request(f"{self.url}/jobs")[0]
+        self.assertEqual(job["priority"], "batch")
+        self.assertGreaterEqual(job["queue_wait"], 0)
+
+    def test_bad_job(self) -> None:
+        with self.assertRaises(urllib.error.HTTPError) as error:
+            client.submit(self.url, match="", source=".", colour="red")
+        self.assertEqual(error.exception.code, 400)
+        with self.assertRaises(urllib.error.HTTPError) as error:
+            client.status(self.url, "missing")
+        self.assertEqual(error.exception.code, 404)
@@ -1,11 +1,19 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
 import unittest
+import zipfile
 from pathlib import Path
-from typing import Generator
+from typing import Any, Generator
 from unittest.mock import Mock, patch
 
 from src import tools
+from src.records import Usage
 
-from tests import PROJECT
+from tests import PROJECT, SRC, TESTS
 
 
 class TestProcessMatch(unittest.TestCase):
@@ -71,6 +79,25 @@ class TestGetFiles(unittest.TestCase):
         with patch.object(Path, "glob", return_value=self.full_generator()):
             self.assertEqual(tools.get_file_count(self.match, self.source), 8)
 
+    def test_cached_listings(self) -> None:
+        source = TESTS / "listing"
+        source.mkdir(exist_ok=True)
+        (source / "5300221014-VWC-MS-DWG-00200-01-R0.dwg").write_bytes(b"")
+        tools.cache_listings(True)
+        try:
+            self.assertEqual(tools.get_file_count("*DWG*00200*.dwg", source), 1)
+            with patch.object(Path, "iterdir") as mock_iterdir:
+                self.assertEqual(tools.get_file_count("*DWG*00200*.dwg", source), 1)
+                mock_iterdir.assert_not_called()
+            (source / "5300221014-VWC-MS-DWG-00200-02-R0.dwg").write_bytes(b"")
+            os.utime(source, ns=(0, source.stat().st_mtime_ns + 1))
+            self.assertEqual(tools.get_file_count("*DWG*00200*.dwg", source), 2)
+        finally:
+            tools.cache_listings(False)
+            for file in source.iterdir():
+                file.unlink()
+            source.rmdir()
+
     def test_get_latest(self) -> None:
         files = self.full_generator()
         expected = [
@@ -81,6 +108,17 @@ class TestGetFiles(unittest.TestCase):
         actual = tools.get_latest(files)
         self.assertListEqual(expected, list(actual))
 
+    def test_parse_revisions(self) -> None:
+        names = [str(file) for file in self.full_generator()]
+        revisions = tools.parse_revisions(names)
+        self.assertEqual(len(revisions.names), 7)  # 00205-03-R1.dwg is not a drawing.
+        self.assertListEqual(
+            sorted(revisions.latest()),
+            [str(file) for file in tools.get_latest(self.full_generator())],
+        )
+        self.assertListEqual(revisions.ranks(), [1, 2, 3, 2, 1, 2, 1])
+        self.assertListEqual(tools.parse_revisions([]).latest(), [])
+
 
 class TestAutoCad(unittest.TestCase):
     @patch.object(
@@ -88,11 +126,13 @@ class TestAutoCad(unittest.TestCase):
         "get_accore",
         return_value="C:/Program Files/Autodesk/AutoCAD 2019/accoreconsole.exe",
     )
-    @patch("subprocess.run")
+    @patch.object(
+        tools.usage, "run", return_value=(subprocess.CompletedProcess("", 0), None)
+    )
     def test_make_pdf(self, mock_run: Mock, mock_accore: Mock) -> None:
         source = Path("test_drawing.dwg")
         src = Path("test_scr.scr")
-        tools.make_pdf(source, src)
+        self.assertIsNone(tools.make_pdf(source, src))
         mock_accore.assert_called_once()
         mock_run.assert_called_once_with(
             '"C:/Program Files/Autodesk/AutoCAD 2019/accoreconsole.exe" /i "test_drawing.dwg" /s "test_scr.scr" /l "en-US"'
@@ -112,3 +152,289 @@ class TestAutoCad(unittest.TestCase):
         tools.remove_plot_logs()
         self.assertFalse(plot.exists())
         self.assertFalse(hardcopy.exists())
+
+
+class TestCopy(unittest.TestCase):
+    def setUp(self) -> None:
+        self.source = PROJECT / "copy_source.dwg"
+        self.dest = TESTS / "copy_source.dwg"
+        self.source.write_bytes(b"AC1032" * 1000)
+
+    def tearDown(self) -> None:
+        for file in (self.source, self.dest):
+            if file.exists():
+                file.unlink()
+
+    def test_copy_drawing(self) -> None:
+        tools.copy_drawing(self.source, self.dest)
+        self.assertEqual(self.dest.read_bytes(), self.source.read_bytes())
+        self.assertEqual(self.dest.stat().st_mtime_ns, self.source.stat().st_mtime_ns)
+
+    def test_copy_drawing_skips_current(self) -> None:
+        tools.copy_drawing(self.source, self.dest)
+        with patch.object(tools, "fast_copy") as mock_copy:
+            tools.copy_drawing(self.source, self.dest)
+            mock_copy.assert_not_called()
+
+    def test_fast_copy_fallback(self) -> None:
+        with patch.object(os, "copy_file_range", side_effect=OSError, create=True):
+            with patch.object(os, "sendfile", side_effect=OSError, create=True):
+                tools.copy_drawing(self.source, self.dest)
+        self.assertEqual(self.dest.read_bytes(), self.source.read_bytes())
+
+    def test_release_file_claimed_elsewhere(self) -> None:
+        tools.copy_drawing(self.source, self.dest)
+        tools.claim_file(self.dest)
+        tools.claim_file(self.dest)
+        tools.release_file(self.dest)
+        self.assertTrue(self.dest.exists())  # Still used by another run here.
+        other = tools.own_claim(self.dest).with_name("0")
+        other.touch()
+        tools.release_file(self.dest)
+        self.assertTrue(self.dest.exists())  # Still used by another process.
+        self.assertFalse(tools.own_claim(self.dest).exists())
+        other.unlink()
+        tools.release_file(self.dest)
+        self.assertFalse(self.dest.exists())
+        self.assertFalse(other.parent.exists())
+
+
+class TestExtract(unittest.TestCase):
+    drawing = "5300221014-VWC-MS-DWG-00200-01-R0.dwg"
+    other = "5300221014-VWC-MS-DWG-00201-01-R0.dwg"
+
+    def setUp(self) -> None:
+        self.archive = PROJECT / "extract.zip"
+        with zipfile.ZipFile(self.archive, "w") as zf:
+            for name in (self.drawing, self.other, "title-block.dwg", "logo.png"):
+                zf.writestr(f"Project/{name}", b"AC1032")
+            zf.writestr("Other/stamp.png", b"")
+        self.addCleanup(self.archive.unlink)
+        for name in self.extracted_names():
+            self.addCleanup((TESTS / name).unlink, missing_ok=True)
+
+    def extracted_names(self) -> tuple[str, ...]:
+        return (self.drawing, self.other, "title-block.dwg", "logo.png", "stamp.png")
+
+    def extracted(self) -> list[str]:
+        names = self.extracted_names()
+        return sorted(file.name for file in TESTS.iterdir() if file.name in names)
+
+    def test_never_plotted(self) -> None:
+        source = self.archive / self.drawing
+        self.assertEqual(
+            tools.copy_drawing(source, TESTS / self.drawing), TESTS / self.drawing
+        )
+        self.assertListEqual(
+            self.extracted(), [self.drawing, "logo.png", "title-block.dwg"]
+        )
+        self.assertEqual(
+            tools.fingerprint(source), tools.fingerprint(TESTS / self.drawing)
+        )
+
+    def test_known_dependencies(self) -> None:
+        source = self.archive / self.drawing
+        key = tools.fingerprint(source)
+        self.addCleanup((tools.deps.DEPS / f"{key}.json").unlink)
+        tools.deps.store(key, source, ["C:\\Project\\Xrefs\\title-block.dwg"])
+        tools.copy_drawing(source, TESTS / self.drawing)
+        self.assertListEqual(self.extracted(), [self.drawing, "title-block.dwg"])
+
+    def test_same_names(self) -> None:
+        with zipfile.ZipFile(self.archive, "a") as zf:
+            zf.writestr("Old/stamp.png", b"")
+        tools.copy_drawing(self.archive / self.drawing, TESTS / self.drawing)
+        self.assertListEqual(
+            self.extracted(), [self.drawing, "logo.png", "title-block.dwg"]
+        )
+        for name in self.extracted():
+            (TESTS / name).unlink()
+        with zipfile.ZipFile(self.archive, "a") as zf:
+            zf.writestr("Old/logo.png", b"")
+        with self.assertRaises(FileExistsError) as error:
+            tools.copy_drawing(self.archive / self.drawing, TESTS / self.drawing)
+        self.assertIn("Project/logo.png, Old/logo.png", str(error.exception))
+        self.assertListEqual(self.extracted(), [])
+
+    def test_staged(self) -> None:
+        kept = TESTS / "logo.png"
+        kept.write_bytes(b"mine")
+        with tools.staged(TESTS):
+            with tools.staged(TESTS):  # Another run here extracting the same.
+                tools.copy_drawing(self.archive / self.drawing, TESTS / self.drawing)
+            self.assertTrue((TESTS / "title-block.dwg").exists())
+            (TESTS / self.drawing).unlink()  # Released by the pack.
+        # The drawing's own support files don't outlast the run, the one that was
+        # there already is left alone.
+        self.assertListEqual(self.extracted(), ["logo.png"])
+        self.assertFalse(tools.own_claim(TESTS / "title-block.dwg").parent.exists())
+
+    def test_staged_claimed_elsewhere(self) -> None:
+        other = tools.own_claim(TESTS / "title-block.dwg").with_name("0")
+        with tools.staged(TESTS):
+            tools.copy_drawing(self.archive / self.drawing, TESTS / self.drawing)
+            other.touch()  # Another process extracted it too.
+        self.assertTrue((TESTS / "title-block.dwg").exists())
+        other.unlink()
+        other.parent.rmdir()
+
+    def test_get_files(self) -> None:
+        files = tools.get_files("*DWG*00200*.dwg", self.archive)
+        self.assertListEqual(list(files or []), [self.archive / self.drawing])
+
+
+@patch.object(tools, "get_accore", return_value="accoreconsole.exe")
+class TestSingleFlight(unittest.TestCase):
+    def setUp(self) -> None:
+        self.drawing = TESTS / "5300221014-VWC-MS-DWG-00300-01-R0.dwg"
+        self.drawing.write_bytes(b"AC1032")
+        self.scr = SRC / "pdfgen11x17model.scr"
+        self.pdf = TESTS / "5300221014-VWC-MS-DWG-00300-01-R0-Model.pdf"
+
+    def tearDown(self) -> None:
+        for file in (self.drawing, self.pdf):
+            file.unlink(missing_ok=True)
+
+    def plot(self, *args: Any) -> tuple[subprocess.CompletedProcess[bytes], Usage]:
+        time.sleep(0.1)
+        self.pdf.write_bytes(b"%PDF")
+        return subprocess.CompletedProcess(args, 0), Usage(cpu=0.1)
+
+    def test_concurrent_requests_plot_once(self, mock_accore: Mock) -> None:
+        shared = tools.metrics.SHEETS_SHARED.value
+        plotted = tools.metrics.SHEETS_PLOTTED.value
+        with patch.object(tools.usage, "run", side_effect=self.plot) as mock_run:
+            threads = [
+                threading.Thread(target=tools.make_pdf, args=(self.drawing, self.scr))
+                for _ in range(3)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            mock_run.assert_called_once()
+        self.assertEqual(self.pdf.read_bytes(), b"%PDF")
+        self.assertEqual(tools.metrics.SHEETS_SHARED.value, shared + 2)
+        self.assertEqual(tools.metrics.SHEETS_PLOTTED.value, plotted + 1)
+        self.assertListEqual(list(TESTS.glob(".*.pdf")), [])
+
+    def test_plots_again_once_finished(self, mock_accore: Mock) -> None:
+        with patch.object(tools.usage, "run", side_effect=self.plot) as mock_run:
+            tools.make_pdf(self.drawing, self.scr)
+            tools.make_pdf(self.drawing, self.scr)
+            self.assertEqual(mock_run.call_count, 2)
+        self.assertDictEqual(tools._inflight, {})
+        self.assertListEqual(list(TESTS.glob(".*.wait")), [])
+        self.assertListEqual(list(TESTS.glob(".*.pdf")), [])
+
+    def test_plot_recorded(self, mock_accore: Mock) -> None:
+        with patch.object(tools.history, "record") as mock_record:
+            with patch.object(tools.usage, "run", side_effect=self.plot):
+                self.assertEqual(tools.make_pdf(self.drawing, self.scr), Usage(0.1))
+        mock_record.assert_called_once()
+        kwargs = mock_record.call_args.kwargs
+        self.assertEqual(kwargs["drawing"], "5300221014-VWC-MS-DWG-00300-01")
+        self.assertEqual(kwargs["sheet"], "Model")
+        self.assertEqual(kwargs["status"], 0)
+        self.assertEqual((kwargs["dwg_size"], kwargs["pdf_size"]), (6, 4))
+
+    def test_deps_collected(self, mock_accore: Mock) -> None:
+        xref = TESTS / "title-block.dwg"
+
+        def plot(*args: Any) -> tuple[subprocess.CompletedProcess[bytes], Usage]:
+            tools.deps.sidecar(self.drawing, self.scr).write_text(f"{xref}\n")
+            return self.plot(*args)
+
+        with patch.object(tools.usage, "run", side_effect=plot):
+            tools.make_pdf(self.drawing, self.scr)
+        self.assertFalse(tools.deps.sidecar(self.drawing, self.scr).exists())
+        key = tools.fingerprint(self.drawing)
+        self.assertListEqual(tools.deps.load(key) or [], [str(xref)])
+
+    def test_waits_for_other_process(self, mock_accore: Mock) -> None:
+        key = tools.plot_key(self.drawing, self.scr)
+        lock_file = TESTS / f".{key}.lock"
+        lock_file.write_text("")
+        with patch.object(tools.usage, "run", side_effect=self.plot) as mock_run:
+            thread = threading.Thread(
+                target=tools.make_pdf, args=(self.drawing, self.scr)
+            )
+            thread.start()
+            time.sleep(0.3)
+            mock_run.assert_not_called()
+            self.assertEqual(len(list(TESTS.glob(f".{key}.*.wait"))), 1)
+            # The other process saw it waiting and left its PDF.
+            (TESTS / f".{key}.pdf").write_bytes(b"%PDF other")
+            lock_file.unlink()
+            thread.join()
+            mock_run.assert_not_called()
+        self.assertEqual(self.pdf.read_bytes(), b"%PDF other")
+        self.assertFalse((TESTS / f".{key}.pdf").exists())
+
+    def test_inflight_folder(self, mock_accore: Mock) -> None:
+        folder = TESTS / "inflight"
+        folder.mkdir()
+        self.addCleanup(folder.rmdir)
+        key = tools.plot_key(self.drawing, self.scr)
+
+        def plot(*args: Any) -> tuple[subprocess.CompletedProcess[bytes], Usage]:
+            self.assertTrue((folder / f".{key}.lock").exists())
+            return self.plot(*args)
+
+        with patch.object(tools, "INFLIGHT", str(folder)):
+            with patch.object(tools.usage, "run", side_effect=plot):
+                tools.make_pdf(self.drawing, self.scr)
+        self.assertListEqual(list(folder.iterdir()), [])
+
+    def test_reuses_claimed_pdf(self, mock_accore: Mock) -> None:
+        self.pdf.write_bytes(b"%PDF first")
+        tools.claim_file(self.pdf)  # By the run that plotted it, still merging.
+        tools.claim_file(self.pdf)
+        with patch.object(tools.usage, "run", side_effect=self.plot) as mock_run:
+            self.assertIsNone(tools.make_pdf(self.drawing, self.scr))
+            mock_run.assert_not_called()
+            self.assertEqual(self.pdf.read_bytes(), b"%PDF first")
+            tools.release_file(self.pdf)
+            # Only this run claims it now, it is plotted again.
+            tools.make_pdf(self.drawing, self.scr)
+            mock_run.assert_called_once()
+        tools.release_file(self.pdf)
+        self.assertFalse(self.pdf.exists())
+
+    def test_kept_sheets(self, mock_accore: Mock) -> None:
+        folder = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, folder)
+        kept = tools.metrics.SHEETS_KEPT.value
+        with patch.object(tools, "SHEETS", folder):
+            with patch.object(tools.usage, "run", side_effect=self.plot) as mock_run:
+                tools.make_pdf(self.drawing, self.scr)
+                self.pdf.unlink()
+                self.assertIsNone(tools.make_pdf(self.drawing, self.scr))
+                mock_run.assert_called_once()
+                self.assertEqual(self.pdf.read_bytes(), b"%PDF")
+                self.assertEqual(tools.metrics.SHEETS_KEPT.value, kept + 1)
+                tools.forget_sheets([self.drawing.name])
+                tools.make_pdf(self.drawing, self.scr)
+                self.assertEqual(mock_run.call_count, 2)
+
+
+class TestLocked(unittest.TestCase):
+    def test_heartbeat(self) -> None:
+        lock_file = TESTS / ".heartbeat.lock"
+        taken = threading.Event()
+
+        def take() -> None:
+            with tools.locked(lock_file):
+                taken.set()
+
+        with patch.object(tools, "STALE_LOCK", 0.3):
+            with patch.object(tools, "_heartbeat", None):
+                with patch.object(tools, "HEARTBEAT", 0.05):
+                    with tools.locked(lock_file):
+                        thread = threading.Thread(target=take)
+                        thread.start()
+                        # Held for longer than STALE_LOCK but kept fresh.
+                        self.assertFalse(taken.wait(0.8))
+                    thread.join()
+        self.assertTrue(taken.is_set())
+        self.assertFalse(lock_file.exists())
@@ -0,0 +1,55 @@
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from src import scheduler, tune
+
+
+class TestAutotuner(unittest.TestCase):
+    def setUp(self) -> None:
+        tuning = patch.object(tune, "TUNING", tune.CACHE / f"{self.id()}.json")
+        tuning.start()
+        self.addCleanup(tuning.stop)
+
+    def test_hill_climb(self) -> None:
+        tuner = tune.Autotuner(scheduler.Scheduler(2), 2, ceiling=4)
+        self.assertEqual(tuner.adjust(10.0), 3)
+        self.assertEqual(tuner.adjust(14.0), 4)
+        self.assertEqual(tuner.adjust(12.0), 3)  # Slower, turn back.
+        self.assertEqual(tuner.adjust(13.0), 2)
+        self.assertEqual(tuner.best, 3)
+
+    def test_bounds(self) -> None:
+        tuner = tune.Autotuner(scheduler.Scheduler(1), 1, ceiling=1)
+        self.assertEqual(tuner.adjust(5.0), 1)
+        self.assertEqual(tuner.best, 1)
+        self.assertEqual(tune.Autotuner(scheduler.Scheduler(8), 8, 2).workers, 2)
+
+    def test_save_workers(self) -> None:
+        source = Path("drawings")
+        tune.save_workers(source, 5)
+        self.assertEqual(tune.best_workers(source), 5)
+        self.assertIn(tune.tuning_key(source), tune.load_tuning())
+
+    def test_autotune(self) -> None:
+        pool = scheduler.Scheduler(1)
+        source = Path("tuned")
+        with patch.object(scheduler, "_scheduler", pool):
+            with tune.autotune(source, ceiling=3, window=0.1) as tuner:
+                futures = [pool.submit(time.sleep, 0.02) for _ in range(40)]
+                scheduler.wait(futures)
+            self.assertTrue(tuner.rates)
+            self.assertEqual(pool.workers, tuner.best)
+        self.assertEqual(tune.best_workers(source), tuner.best)
+        self.assertIn("autotuned", tuner.summary())
+
+    def test_short_run_not_saved(self) -> None:
+        source = Path("short")
+        with patch.object(scheduler, "_scheduler", scheduler.Scheduler(2)):
+            with tune.autotune(source, window=10) as tuner:
+                pass
+        self.assertIsNone(tune.best_workers(source))
+        self.assertEqual(tuner.summary(), "Plot workers: 2 (run too short to tune)")
+        self.assertFalse(any(t.name == "autotune" for t in threading.enumerate()))
@@ -0,0 +1,59 @@
+import os
+import subprocess
+import sys
+import unittest
+from types import SimpleNamespace
+from typing import Any
+from unittest.mock import patch
+
+from src import usage
+
+MEMORY = "x = bytearray(64 * 1024 * 1024); x[::4096] = b'1' * len(x[::4096])"
+
+
+class FakePsutil:
+    """Just enough of psutil for sample, reading a fixed process."""
+
+    Error = OSError
+
+    def __init__(self, pid: int) -> None:
+        self.pid = pid
+
+    def Process(self, pid: int) -> Any:
+        assert pid == self.pid
+        return SimpleNamespace(
+            oneshot=lambda: open(os.devnull),
+            cpu_times=lambda: SimpleNamespace(user=1.5, system=0.5),
+            memory_info=lambda: SimpleNamespace(rss=10, peak_wset=20),
+            io_counters=lambda: SimpleNamespace(read_bytes=30, write_bytes=40),
+        )
+
+
+class TestUsage(unittest.TestCase):
+    @unittest.skipUnless(hasattr(os, "wait4"), "Needs wait4")
+    def test_reap(self) -> None:
+        with patch.dict(sys.modules, {"psutil": None}):
+            process, used = usage.run([sys.executable, "-c", MEMORY])
+        self.assertEqual(process.returncode, 0)
+        assert used is not None
+        self.assertGreater(used.cpu or 0, 0)
+        self.assertGreaterEqual(used.peak_rss or 0, 64 * 1024 * 1024)
+
+    @unittest.skipUnless(hasattr(os, "wait4"), "Needs wait4")
+    def test_exit_status(self) -> None:
+        with patch.dict(sys.modules, {"psutil": None}):
+            process, _ = usage.run([sys.executable, "-c", "raise SystemExit(3)"])
+        self.assertEqual(process.returncode, 3)
+
+    def test_sample(self) -> None:
+        process = subprocess.Popen([sys.executable, "-c", "pass"])
+        used = usage.sample(process, FakePsutil(process.pid))
+        self.assertEqual(process.returncode, 0)
+        self.assertEqual(used, usage.Usage(2.0, 20, 30, 40))
+
+    def test_sample_exited(self) -> None:
+        process = subprocess.Popen([sys.executable, "-c", "pass"])
+        process.wait()
+        psutil = FakePsutil(process.pid)
+        with patch.object(psutil, "Process", side_effect=OSError("No such process")):
+            self.assertIsNone(usage.sample(process, psutil))
@@ -0,0 +1,79 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import Mock, patch
+
+from src import deps, tools, watch
+
+
+class TestWatch(unittest.TestCase):
+    def setUp(self) -> None:
+        self.source = Path(tempfile.mkdtemp())
+        self.r0 = self.source / "5300221014-VWC-MS-DWG-00200-01-R0.dwg"
+        self.r0.write_bytes(b"")
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.source)
+
+    def test_snapshot(self) -> None:
+        (self.source / "5300221014-VWC-MS-DWG-00200-01-R0-Model.pdf").write_bytes(b"")
+        self.assertListEqual(list(watch.snapshot("00200", self.source)), [self.r0.name])
+
+    def test_affected(self) -> None:
+        before = watch.snapshot("00200", self.source)
+        r1 = self.source / "5300221014-VWC-MS-DWG-00200-01-R1.dwg"
+        r1.write_bytes(b"")
+        after = watch.snapshot("00200", self.source)
+        self.assertSetEqual(watch.affected(before, after), {self.r0.name, r1.name})
+        # Saving an old revision does not change the pack.
+        os.utime(self.r0, ns=(0, 0))
+        self.assertSetEqual(
+            watch.affected(after, watch.snapshot("00200", self.source)), set()
+        )
+
+    def test_watch_rebuilds_after_burst(self) -> None:
+        build = Mock(return_value="pack.pdf")
+        stop = threading.Event()
+        thread = threading.Thread(
+            target=watch.watch,
+            args=("00200", self.source, build, 0.05, 0.2, stop, False),
+        )
+        thread.start()
+        time.sleep(0.1)
+        self.assertEqual(build.call_count, 1)
+        for rev in range(1, 4):  # A burst of saves is one rebuild.
+            (self.source / f"5300221014-VWC-MS-DWG-00200-01-R{rev}.dwg").write_bytes(
+                b""
+            )
+            time.sleep(0.05)
+        time.sleep(0.6)
+        stop.set()
+        thread.join()
+        self.assertEqual(build.call_count, 2)
+
+    def test_xref_change_rebuilds(self) -> None:
+        xref = self.source / "title-block.dwg"
+        xref.write_bytes(b"")
+        deps.store(tools.fingerprint(self.r0), self.r0, [str(xref)])
+        build = Mock(return_value="pack.pdf")
+        stop = threading.Event()
+        thread = threading.Thread(
+            target=watch.watch,
+            args=("00200", self.source, build, 0.05, 0.1, stop, False),
+        )
+        with patch.object(tools, "forget_sheets") as mock_forget:
+            thread.start()
+            time.sleep(0.1)
+            self.assertIsNotNone(tools.SHEETS)
+            xref.write_bytes(b"AC1032")
+            time.sleep(0.4)
+            stop.set()
+            thread.join()
+        self.assertEqual(build.call_count, 2)
+        # Only the sheets of the drawing using the xref are plotted again.
+        mock_forget.assert_called_once_with({self.r0.name})
+        self.assertIsNone(tools.SHEETS)
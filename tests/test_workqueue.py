@@ -0,0 +1,134 @@
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import Mock, patch
+
+from src import tools, workqueue
+from tests import SRC
+
+
+def fake_plot(drawing: Path, scr: Path) -> None:
+    """Stands in for accoreconsole, the PDF records which process made it."""
+    drawing.with_name(f"{drawing.stem}-Model.pdf").write_text(str(os.getpid()))
+
+
+def named_plot(drawing: Path, scr: Path) -> None:
+    """Checks deps.collect on the worker looks for the list the script writes."""
+    suffix = tools.deps.sidecar(drawing, scr).name[len(drawing.name) :]
+    if f'"{suffix}"' not in scr.read_text():
+        raise RuntimeError(f"The script doesn't write {suffix}")
+    fake_plot(drawing, scr)
+
+
+def broken_plot(drawing: Path, scr: Path) -> None:
+    raise RuntimeError("accoreconsole crashed")
+
+
+class TestWorkQueue(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp = Path(tempfile.mkdtemp())
+        self.queue = self.temp / "queue"
+        self.drawings = [self.temp / f"drawing{idx}.dwg" for idx in range(6)]
+        for drawing in self.drawings:
+            drawing.write_bytes(b"")
+        self.scr = SRC / "pdfgen11x17model.scr"
+        self.patcher = patch.object(workqueue, "POLL", 0.05)
+        self.patcher.start()
+
+    def tearDown(self) -> None:
+        self.patcher.stop()
+        shutil.rmtree(self.temp)
+
+    def test_several_workers(self) -> None:
+        workers = [
+            multiprocessing.Process(
+                target=workqueue.work, args=(self.queue, fake_plot, 1.0)
+            )
+            for _ in range(3)
+        ]
+        for worker in workers:
+            worker.start()
+        workqueue.plot(self.queue, ((drawing, self.scr) for drawing in self.drawings))
+        for worker in workers:
+            worker.join()
+        for drawing in self.drawings:
+            self.assertTrue(drawing.with_name(f"{drawing.stem}-Model.pdf").exists())
+        for folder in ("pending", "claimed", "done", "drawings"):
+            self.assertListEqual(list((self.queue / folder).iterdir()), [])
+
+    def test_claim_once(self) -> None:
+        paths = workqueue.folders(self.queue)
+        job = {"id": "job", "drawing": "drawing0.dwg", "script": ""}
+        (paths["pending"] / "job.json").write_text(json.dumps(job))
+        self.assertEqual(workqueue.claim(paths), job)
+        self.assertIsNone(workqueue.claim(paths))
+
+    def test_requeue_stale(self) -> None:
+        paths = workqueue.folders(self.queue)
+        claimed = paths["claimed"] / "job.json"
+        claimed.write_text("{}")
+        os.utime(claimed, (0, 0))
+        workqueue.requeue_stale(paths)
+        self.assertTrue((paths["pending"] / "job.json").exists())
+
+    def test_deps_named(self) -> None:
+        stop = threading.Event()
+        worker = threading.Thread(
+            target=workqueue.work, args=(self.queue, named_plot, None, stop)
+        )
+        worker.start()
+        errors = workqueue.plot(self.queue, [(self.drawings[0], self.scr)])
+        stop.set()
+        worker.join()
+        self.assertDictEqual(errors, {})
+
+    @patch.object(tools, "_heartbeat", None)
+    @patch.object(tools, "HEARTBEAT", 0.05)
+    def test_claim_touched(self) -> None:
+        paths = workqueue.folders(self.queue)
+        claimed = paths["claimed"] / "job.json"
+        claimed.write_text("{}")
+        (paths["drawings"] / "job").mkdir()
+        (paths["drawings"] / "job" / "drawing0.dwg").write_bytes(b"")
+        job = {"id": "job", "drawing": "drawing0.dwg", "script": ""}
+
+        def slow_plot(drawing: Path, scr: Path) -> None:
+            os.utime(claimed, (0, 0))
+            time.sleep(0.3)
+            # Still fresh, requeue_stale leaves it with this worker.
+            self.assertLess(time.time() - claimed.stat().st_mtime, 1)
+
+        with patch.object(tools, "pdf_name", side_effect=RuntimeError("no PDF")):
+            workqueue.run_job(paths, job, slow_plot)
+        failed = json.loads((paths["failed"] / "job.json").read_text())
+        self.assertEqual(failed["error"], "no PDF")
+
+    @patch("builtins.print")
+    def test_failed_job(self, mock_print: Mock) -> None:
+        stop = threading.Event()
+        worker = threading.Thread(
+            target=workqueue.work, args=(self.queue, broken_plot, None, stop)
+        )
+        worker.start()
+        errors = workqueue.plot(self.queue, [(self.drawings[0], self.scr)])
+        stop.set()
+        worker.join()
+        pdf = self.temp / "drawing0-Model.pdf"
+        self.assertFalse(pdf.exists())
+        self.assertIn("accoreconsole crashed", mock_print.call_args[0][0])
+        self.assertDictEqual(errors, {pdf: "Worker failed: accoreconsole crashed"})
+
+    @patch("builtins.print")
+    def test_no_workers(self, mock_print: Mock) -> None:
+        errors = workqueue.plot(self.queue, [(self.drawings[0], self.scr)], idle=0.1)
+        pdf = self.temp / "drawing0-Model.pdf"
+        self.assertDictEqual(errors, {pdf: "No worker took it within 0 seconds"})
+        mock_print.assert_called_once()
+        for folder in ("pending", "claimed", "drawings"):
+            self.assertListEqual(list((self.queue / folder).iterdir()), [])